@@ -1,23 +1,47 @@
 import shutil
 import os
+import sys
 import json
 import math
-import requests
 import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from init_check import Initial_Check, Reallocate
+from init_check import SALAD_MACHINE_ID, Start_Initial_Check, Finish_Initial_Check, Reallocate, Get_GPU_List, Get_Driver_Version, Get_CPU_Model, Get_CUDA_Version
+from gpu_scheduler import visible_gpus, gpu_env, run_on_gpus, summarize_gpu_scores
+from run_stats import RunController, WARMUP_RUNS, MIN_RUNS, MAX_RUNS, TARGET_REL_CI, RUN_TIME_BUDGET_S
+from reporting import Reporter
+from kernel_cache import KernelCache
+from results_store import ResultsStore, RESULTS_TTL_S, settings_hash
+from sweep import SWEEP, load_matrix, run_sweep
+from devices import DEVICE_MIX, DEVICE_MIX_SCENES, DEVICE_MIX_WARMUP_RUNS, DEVICE_MIX_RUNS, available_configs, config_env, benchmark_configs
+from cpu_scaling import CPU_SCALING, CPU_SCALING_SCENE, CPU_SCALING_THREADS, CPU_SCALING_RESOLUTION, CPU_SCALING_SAMPLES, cpu_topology, cgroup_cpu_quota, run_scaling
+from journal import Journal, result_delta, read_files, write_files
+from pipeline import PIPELINE, Pipeline
+from worker import close_worker, close_workers
+from staging import Manifest, stage_scene
+from validation import VALIDATE, Validator
+from tracing import tracer
+from prescreen import PRESCREEN, PRESCREEN_SCENE, MIN_PREDICTED_SCORE, PRESCREEN_TIME_LIMIT, load_calibration_points, evaluate
 from helper import list_devices, run_blender_benchmark, \
                    compute_blender_score, \
                    list_main_blend_with_folder, \
                    get_blend_settings, \
-                   render_scene
+                   render_scene, \
+                   warm_up_kernels, \
+                   render_time_boxed, \
+                   render_sequence, \
+                   render_with_overrides, \
+                   render_pinned, \
+                   get_blender_version
 
 
 OUTPUT_FILE_CUDA = "benchmark_results_cuda.json" # CUDA, the original benchmark results file from 'benchmark-launcher-cli'.
 OUTPUT_FILE_CPU  = "benchmark_results_cpu.json"  # CPU, the original benchmark results file from 'benchmark-launcher-cli'.
-NUM_RUNS = 1 # Number of runs per scene
 DEVICE =  os.getenv("DEVICE","CUDA") # Custom Benchmark: "CUDA" or "CPU" ( "OPTIX" is not supported)
+WARMUP_SCENE = os.getenv("WARMUP_SCENE", "monster") # The scene rendered tiny to compile the kernels
+SEQUENCE_FRAMES = int(os.getenv("SEQUENCE_FRAMES", "0")) # Custom Benchmark: also render frames 1 to N of each scene in one Blender process, "0" to disable
+SEQUENCE_PERSISTENT_DATA = os.getenv("SEQUENCE_PERSISTENT_DATA", "0") == "1" # Keep the scene data between the frames of the sequence
+MULTI_GPU = os.getenv("MULTI_GPU", "1") == "1" # Benchmark every GPU of a multi-GPU node concurrently, "0" for the default device only
 
 
 # Access to the Job Reporting System
@@ -28,28 +52,244 @@ benchmark_auth_header = os.getenv("REPORTING_AUTH_HEADER", "")
 benchmark_auth_value = os.getenv("REPORTING_API_KEY", "")
 benchmark_headers = { benchmark_auth_header: benchmark_auth_value }
 
+# The rendered frames are compared with reference frames in worker processes (validation.py), the score is gated on them.
+# Created first: its workers are forked, which is only safe before any other thread or child process is started.
+g_Validator = Validator() if VALIDATE else None
 
-g_Start = time.perf_counter()
+# Results are spooled to disk and posted with timeouts and retries; reports left over by a previous run (e.g. before a restart) are resent in the background.
+g_Reporter = Reporter(benchmark_headers).start() if benchmark_url != "" else None
 
 
-# To keep the final results for report and analysis
-g_Result = Initial_Check()
+g_Start = time.perf_counter()
+
+# Spans of the phases, probes, renders and reports (tracing.py): Chrome trace in TRACE_FILE, summary in g_Result['trace']
+tracer.phase("startup")
+
+
+# Pre-flight checks (network bandwidth and latency, GPU/CUDA queries) run in the background, overlapped with the warm-up.
+g_Preflight = Start_Initial_Check()
+
+
+# On multi-GPU nodes, every GPU runs its own benchmark processes concurrently; the first GPU's results are the node's default results.
+g_GPUs = visible_gpus(Get_GPU_List())
+g_MultiGPU = MULTI_GPU and len(g_GPUs) > 1
+
+
+# Completed phases are journaled, so that a restart resumes at the first incomplete phase; a phase is run again if the parts of this
+# fingerprint it depends on changed (journal.PHASE_RULES), e.g. a new driver or GPU.
+g_Fingerprint = { "blender_version": get_blender_version(),
+                  "driver_version": Get_Driver_Version(),
+                  "gpus": [gpu['gpu_uuid'] for gpu in g_GPUs],
+                  "gpu_types": sorted({ gpu['gpu_type'] for gpu in g_GPUs }),
+                  "cpu_model": Get_CPU_Model(),
+                  "device": DEVICE,
+                  "multi_gpu": g_MultiGPU }
+g_Journal = Journal(SALAD_MACHINE_ID, g_Fingerprint)
+
+
+# Results of completed benchmarks are stored locally; a fresh result of the same machine, configuration and run settings (RESULTS_TTL_S) is reused instead
+# of rerunning. Looked up before the warm-up, so that a node with a fresh result doesn't compile kernels for nothing; only the pre-flight checks are waited for.
+def run_settings_hash():
+    try:
+        scenes = [[scene['scene'], os.path.getsize(scene['main_blend_path'])] for scene in list_main_blend_with_folder()]
+    except FileNotFoundError: # Not downloaded yet
+        scenes = None
+    return settings_hash({ "scenes": scenes,
+                           "runs": [WARMUP_RUNS, MIN_RUNS, MAX_RUNS, TARGET_REL_CI, RUN_TIME_BUDGET_S],
+                           "sequence": [SEQUENCE_FRAMES, SEQUENCE_PERSISTENT_DATA],
+                           "phases": [VALIDATE, SWEEP, CPU_SCALING, DEVICE_MIX] })
+
+g_Store = ResultsStore()
+g_Identity = { "salad_machine_id": SALAD_MACHINE_ID,
+               "gpu_type": g_GPUs[0]['gpu_type'] if g_GPUs else None,
+               "cuda_version": Get_CUDA_Version(),
+               "driver_version": g_Fingerprint['driver_version'],
+               "blender_version": g_Fingerprint['blender_version'],
+               "device": DEVICE,
+               "multi_gpu": g_MultiGPU,
+               "settings_hash": run_settings_hash() }
+g_Reused = g_Store.fresh(RESULTS_TTL_S, **g_Identity) if RESULTS_TTL_S > 0 else None
+if g_Reused is not None:
+    tracer.phase("preflight_wait")
+    g_Result = Finish_Initial_Check(g_Preflight)
+if g_Reused is not None and g_Result['pass'] != "False":
+    g_Result = g_Reused | g_Result # The benchmark results are reused, the pre-flight checks are the current ones
+    g_Result['test_duration_s'] = "{:.3f}".format(time.perf_counter() - g_Start)
+    g_Result['timestamp_pdt'] = datetime.now(ZoneInfo("America/Los_Angeles")).strftime("%Y-%m-%d %H:%M:%S")
+    tracer.phase(None)
+    g_Result['trace'] = tracer.summary()
+    print()
+    print(60 * '-' + f" The final result (reused, {g_Result['reused_result_age_s']:.0f}s old):")
+    print(json.dumps(g_Result, indent=4))
+    if benchmark_url != "":
+        g_Reporter.post(f"{benchmark_url}/{benchmark_id}", g_Result)
+    g_Journal.clear()
+    print(60 * '-' + " The end")
+    Reallocate("Changing nodes for test")
+    sys.exit(0) # Reallocate() returns on SaladCloud: the benchmark must not run again
 
 
 try: 
+    tracer.phase("warmup")
     # List devices ("CPU", "OPTIX", "CUDA")
     # list_devices()
 
     # Warm up only
     # If PTX needs to be compiled dynamically, the first benchmark will be slower.
+    # The kernel cache is kept per Blender version + driver + GPU model; a tiny render per device compiles the kernels only if the cache isn't valid yet.
+    # A node whose pre-flight checks already failed is rejected by the pre-screen: its warm-up is skipped, checked again before each device.
     print("\n" + 60 * "-" + " Warming up...")
-    run_blender_benchmark(output_file=OUTPUT_FILE_CUDA, device_type="CUDA")
+    g_KernelCache = KernelCache(g_Fingerprint['blender_version'], g_Fingerprint['driver_version'], ",".join(g_Fingerprint['gpu_types']))
+    os.environ.update(g_KernelCache.env()) # Inherited by all Blender and 'benchmark-launcher-cli' processes
+    print(f"Kernel cache: {g_KernelCache.path}")
+    g_Warmup = g_Journal.get("warmup") # Kernel warm-up per device: compile time, or a cache hit
+    if g_Warmup is None:
+        g_Warmup = {}
+        warmup_scenes = list_main_blend_with_folder()
+        warmup_scene = next((scene for scene in warmup_scenes if scene['scene'] == WARMUP_SCENE), warmup_scenes[0])
+        for device in sorted({ "CUDA", DEVICE } - { "CPU" }):
+            if g_KernelCache.valid(device):
+                print(f"Kernel cache valid for {device}, skipping the warm-up")
+                g_Warmup[device] = { "cache_hit": True }
+                continue
+            if PRESCREEN and g_Preflight is not None and g_Preflight.failed():
+                print(f"Pre-flight checks failed, skipping the warm-up of {device}")
+                g_Warmup[device] = { "cache_hit": False, "skipped": True }
+                continue
+            g_Warmup[device] = { "cache_hit": False } | warm_up_kernels(warmup_scene['main_blend_path'], f"output/warmup_{device.lower()}", device)
+            g_KernelCache.mark(device, g_Warmup[device])
+        if not any(warmup.get("skipped") for warmup in g_Warmup.values()):
+            g_Journal.record("warmup", g_Warmup)
+        close_workers() # The kernels are cached on disk; an idle worker would hold RAM and VRAM during the benchmarks
+
+except Exception as e:
+    g_Result = Finish_Initial_Check(g_Preflight)
+    g_End = time.perf_counter()
+    g_Result['test_time'] = "{:.3f}".format(g_End - g_Start)  
+    g_Result['error'] = f"An error occurred: {e}"
+    print(g_Result)
+    if benchmark_url != "":
+        g_Reporter.post(f"{benchmark_url}/{benchmark_sl_id}", g_Result)
+    Reallocate(e)
+
+
+# To keep the final results for report and analysis
+tracer.phase("preflight_wait")
+g_Result = Finish_Initial_Check(g_Preflight)
+g_Result['kernel_cache_key'] = g_KernelCache.key
+g_Result['kernel_warmup'] = g_Warmup
+g_Result['kernel_compile_s'] = sum(warmup.get('kernel_compile_s', 0.0) for warmup in g_Warmup.values())
+g_Series = {} # Telemetry time series (TELEMETRY_SERIES=1), posted with the final result only
+
+
+# Remove the previous output of a scene
+def reset_dir(path):
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path, exist_ok=True)
+
+
+# Validate the frame of a scene, and those of the other GPUs on multi-GPU nodes, in a worker process while the next scene renders
+def validate_scene(validator, scene_name, output_dir):
+    validator.submit(scene_name, os.path.join(output_dir, "frame_00001.png"))
+    if g_MultiGPU and DEVICE == "CUDA":
+        for gpu in g_GPUs[1:]:
+            validator.submit(f"{scene_name}_gpu{gpu['gpu_index']}", os.path.join(f"{output_dir}_gpu{gpu['gpu_index']}", "frame_00001.png"), scene_name)
+
+
+# Per-GPU results file of 'benchmark-launcher-cli', e.g. benchmark_results_cuda_gpu1.json
+def gpu_output_file(output_file, gpu):
+    return output_file.replace(".json", f"_gpu{gpu['gpu_index']}.json")
+
 
+try: 
+    tracer.phase("prescreen")
+    # Pre-screen: reject nodes failing the network checks, or whose score predicted from a short time-boxed render is too low, before the full benchmark.
+    # On multi-GPU nodes, the first GPU is rendered on, like the calibration data of single GPUs.
+    # Without a score threshold (MIN_PREDICTED_SCORE), the render could never reject the node: only the network checks are evaluated.
+    if PRESCREEN:
+        print("\n" + 60 * "-" + " Pre-screening ...")
+        samples_per_minute = None
+        if g_Result['pass'] != "False" and MIN_PREDICTED_SCORE > 0:
+            prescreen_scenes = list_main_blend_with_folder()
+            prescreen_scene = next((scene for scene in prescreen_scenes if scene['scene'] == PRESCREEN_SCENE), prescreen_scenes[0])
+            phases = render_time_boxed(prescreen_scene['scene'], prescreen_scene['main_blend_path'], "output/prescreen", "CUDA", PRESCREEN_TIME_LIMIT,
+                                       env=gpu_env(g_GPUs[0]) if g_MultiGPU else None)
+            samples_per_minute = phases.get('samples_per_minute')
+            close_workers()
+        g_Result['prescreen'] = evaluate(g_Result['pass'], samples_per_minute, load_calibration_points())
+        if g_Result['prescreen']['predicted_score'] is not None:
+            print(f"Predicted Blender OpenData Score - CUDA: {g_Result['prescreen']['predicted_score']:.2f}")
+
+except Exception as e:
+    g_End = time.perf_counter()
+    g_Result['test_time'] = "{:.3f}".format(g_End - g_Start)  
+    g_Result['error'] = f"An error occurred: {e}"
+    print(g_Result)
+    if benchmark_url != "":
+        g_Reporter.post(f"{benchmark_url}/{benchmark_sl_id}", g_Result)
+    Reallocate(e)
+
+if PRESCREEN and g_Result.get('prescreen', {}).get('rejected'): # No pre-screen result if it failed: already reported
+    g_End = time.perf_counter()
+    g_Result['test_time'] = "{:.3f}".format(g_End - g_Start)  
+    g_Result['error'] = g_Result['prescreen']['rejected']
+    print(g_Result)
+    if benchmark_url != "":
+        g_Reporter.post(f"{benchmark_url}/{benchmark_sl_id}", g_Result)
+    g_Journal.clear() # Rejected for cause: a restart measures again
+    Reallocate(g_Result['prescreen']['rejected'])
+
+
+try: 
+    tracer.phase("standard_benchmark")
     # Run the Blender benchmark using 'benchmark-launcher-cli': CPU and CUDA   
     # https://opendata.blender.org/
     print("\n" + 60 * "-" + " Start standard benchmarking ...")
-    run_blender_benchmark(output_file=OUTPUT_FILE_CPU,  device_type="CPU")
-    run_blender_benchmark(output_file=OUTPUT_FILE_CUDA, device_type="CUDA") # Override the previous results
+    # The GPU/CPU telemetry summary of each run goes to g_Result, e.g. 'standard_cuda_telemetry'
+    # A journaled run is resumed with its results files and its g_Result entries.
+    resumed = g_Journal.get("standard_cpu")
+    if resumed is not None:
+        write_files(resumed['files'])
+        g_Result |= resumed['result']
+    else:
+        before = dict(g_Result)
+        report = {}
+        run_blender_benchmark(output_file=OUTPUT_FILE_CPU,  device_type="CPU", report=report)
+        g_Result['standard_cpu_telemetry'] = report.get('telemetry')
+        if 'telemetry_series' in report:
+            g_Series['standard_cpu'] = report['telemetry_series']
+        g_Journal.record("standard_cpu", { "result": result_delta(before, g_Result), "files": read_files([OUTPUT_FILE_CPU]) })
+
+    resumed = g_Journal.get("standard_cuda")
+    if resumed is not None:
+        write_files(resumed['files'])
+        g_Result |= resumed['result']
+    elif g_MultiGPU:
+        before = dict(g_Result)
+        def benchmark_job(gpu, env):
+            report = {}
+            run_blender_benchmark(output_file=gpu_output_file(OUTPUT_FILE_CUDA, gpu), device_type="CUDA", env=env, report=report)
+            return report
+        results = run_on_gpus(benchmark_job, g_GPUs)
+        errors = [f"GPU {index}: {result['error']}" for index, result in results.items() if 'error' in result]
+        if errors:
+            raise RuntimeError(", ".join(errors))
+        for index, result in results.items():
+            g_Result[f'gpu{index}_standard_cuda_telemetry'] = result['result'].get('telemetry')
+            if 'telemetry_series' in result['result']:
+                g_Series[f'gpu{index}_standard_cuda'] = result['result']['telemetry_series']
+        shutil.copyfile(gpu_output_file(OUTPUT_FILE_CUDA, g_GPUs[0]), OUTPUT_FILE_CUDA) # Override the previous results
+        g_Journal.record("standard_cuda", { "result": result_delta(before, g_Result),
+                                            "files": read_files([OUTPUT_FILE_CUDA] + [gpu_output_file(OUTPUT_FILE_CUDA, gpu) for gpu in g_GPUs]) })
+    else:
+        before = dict(g_Result)
+        report = {}
+        run_blender_benchmark(output_file=OUTPUT_FILE_CUDA, device_type="CUDA", report=report) # Override the previous results
+        g_Result['standard_cuda_telemetry'] = report.get('telemetry')
+        if 'telemetry_series' in report:
+            g_Series['standard_cuda'] = report['telemetry_series']
+        g_Journal.record("standard_cuda", { "result": result_delta(before, g_Result), "files": read_files([OUTPUT_FILE_CUDA]) })
 
 except Exception as e:
     g_End = time.perf_counter()
@@ -57,17 +297,23 @@ except Exception as e:
     g_Result['error'] = f"An error occurred: {e}"
     print(g_Result)
     if benchmark_url != "":
-        requests.post( f"{benchmark_url}/{benchmark_sl_id}",json=g_Result, headers=benchmark_headers)
+        g_Reporter.post(f"{benchmark_url}/{benchmark_sl_id}", g_Result)
     Reallocate(e)
 
 
 try: 
+    tracer.phase("scores")
     # Compute the Blender OpenData Score from the JSON results file, which is the sum of the samples_per_minute values for all three scenes.
     # https://opendata.blender.org/about/#benchmark-score
     temp = compute_blender_score(json_file_path=OUTPUT_FILE_CUDA)
     print(f"Standard Blender OpenData Score - CUDA: {temp:.2f}")
     g_Result["standard_blender_opendata_score_cuda"] = temp
 
+    if g_MultiGPU: # Per-GPU scores, the node throughput and the GPUs much slower than their identical siblings
+        scores = { gpu['gpu_index']: compute_blender_score(json_file_path=gpu_output_file(OUTPUT_FILE_CUDA, gpu)) for gpu in g_GPUs }
+        g_Result |= summarize_gpu_scores(scores, g_GPUs, "standard_blender_opendata_score_cuda")
+        print(f"Standard Blender OpenData Score - CUDA, node ({len(g_GPUs)} GPUs): {g_Result['node_standard_blender_opendata_score_cuda']:.2f}")
+
     temp = compute_blender_score(json_file_path=OUTPUT_FILE_CPU)
     print(f"Standard Blender OpenData Score - CPU: {temp:.2f}")
     g_Result["standard_blender_opendata_score_cpu"] = temp
@@ -78,11 +324,12 @@ except Exception as e:
     g_Result['error'] = f"An error occurred: {e}"
     print(g_Result)
     if benchmark_url != "":
-        requests.post( f"{benchmark_url}/{benchmark_sl_id}",json=g_Result, headers=benchmark_headers)
+        g_Reporter.post(f"{benchmark_url}/{benchmark_sl_id}", g_Result)
     Reallocate(e)
 
 
 try: 
+    tracer.phase("custom_benchmark")
     # Get meaningful real-world metrics from a typical case (scene, samples and resolution), including scene loading and any necessary pre-processing.
     # - the samples per min
     # - the time required to render 1st frame
@@ -98,15 +345,87 @@ try:
     total_blender_score = 0
     time_list = []
     samples_per_minute_list = []
+    gpu_scores = { gpu['gpu_index']: 0 for gpu in g_GPUs }
+
+    # The CPU-side preparation of the next scene to render (output directory cleanup, asset staging, settings extraction) runs while the
+    # current scene renders (pipeline.py), outside the timed region. Only the next scene is scheduled, so that the preparation never runs
+    # during more than one render; with DEVICE=CPU, it would compete with the render for cores and memory bandwidth: it runs serially.
+    # Journaled scenes are resumed, not prepared.
+    # Staging verifies the scene files, measures their cold and warm read throughput (disk cost, reported apart from the render cost),
+    # optionally copies them to tmpfs, and pre-warms the page cache (staging.py); the scene is rendered from where it was staged.
+    g_Pipeline = Pipeline(enabled=PIPELINE and DEVICE != "CPU")
+    g_Manifest = Manifest()
+    scene_journal = {}
+    for single_scene in scenes:
+        scene_name, blend_file = single_scene['scene'], single_scene['main_blend_path']
+
+        # A journaled scene is resumed unless its .blend file or the run settings changed
+        scene_depends = { "blend_file": [os.path.getsize(blend_file), os.path.getmtime(blend_file)],
+                          "runs": [WARMUP_RUNS, MIN_RUNS, MAX_RUNS, TARGET_REL_CI, RUN_TIME_BUDGET_S, SEQUENCE_FRAMES, SEQUENCE_PERSISTENT_DATA] }
+        scene_journal[scene_name] = (scene_depends, g_Journal.get(f"scene:{scene_name}", scene_depends))
+    scenes_to_render = [single_scene for single_scene in scenes if scene_journal[single_scene['scene']][1] is None]
+
+    def prepare_scene(single_scene):
+        scene_name, output_dir = single_scene['scene'], f"output/{single_scene['scene']}"
+        g_Pipeline.add(f"cleanup:{scene_name}", lambda: reset_dir(output_dir))
+        g_Pipeline.add(f"stage:{scene_name}", lambda: stage_scene(single_scene, g_Manifest))
+        g_Pipeline.add(f"settings:{scene_name}",
+                       lambda: get_blend_settings(g_Pipeline.result(f"stage:{scene_name}")['main_blend_path'], DEVICE, use_worker=False),
+                       depends=[f"stage:{scene_name}"])
+
+    if scenes_to_render:
+        prepare_scene(scenes_to_render[0])
 
     for single_scene in scenes: # for each scene
         scene_name, blend_file, output_dir = single_scene['scene'], single_scene['main_blend_path'], f"output/{single_scene['scene']}"
-        if os.path.exists(output_dir):
-            shutil.rmtree(output_dir)
-        os.makedirs(output_dir, exist_ok=True)
 
-        temp1 = get_blend_settings(single_scene['main_blend_path']) # Extract scene settings from the .blend file.
-        temp2 = render_scene(scene_name, blend_file, output_dir, NUM_RUNS, DEVICE) # Render scene and return geometric mean of render times.
+        scene_depends, resumed = scene_journal[scene_name]
+        if resumed is not None:
+            if VALIDATE:
+                validate_scene(g_Validator, scene_name, output_dir)
+            g_Result |= resumed['result']
+            time_list.append(resumed['time_s_per_frame'])
+            samples_per_minute_list.append(resumed['samples_per_minute'])
+            total_blender_score += resumed['samples_per_minute']
+            for index, score in resumed['gpu_scores'].items():
+                gpu_scores[int(index)] += score
+            continue
+        before = dict(g_Result)
+        scene_gpu_scores = {}
+
+        g_Pipeline.result(f"cleanup:{scene_name}")
+        staged = g_Pipeline.result(f"stage:{scene_name}")
+        blend_file = staged['main_blend_path']
+        g_Result[scene_name + '_staging'] = staged['staging'] # Checksum, cold and warm read throughput of the scene files
+        temp1 = g_Pipeline.result(f"settings:{scene_name}") # Extract scene settings from the .blend file, prepared while the previous scene rendered
+        next_index = scenes_to_render.index(single_scene) + 1
+        if next_index < len(scenes_to_render):
+            prepare_scene(scenes_to_render[next_index]) # Prepared while this scene renders
+        controller = RunController.from_env() # Runs per scene: WARMUP_RUNS, then MIN_RUNS to MAX_RUNS until the CI is within TARGET_REL_CI or RUN_TIME_BUDGET_S is spent
+        render_report = {}
+        with g_Pipeline.span(f"render:{scene_name}"):
+            if g_MultiGPU and DEVICE == "CUDA": # Render the scene on every GPU concurrently, the first GPU writes to 'output_dir'
+                def render_job(gpu, env):
+                    gpu_dir = output_dir if gpu is g_GPUs[0] else f"{output_dir}_gpu{gpu['gpu_index']}"
+                    if os.path.exists(gpu_dir):
+                        shutil.rmtree(gpu_dir)
+                    os.makedirs(gpu_dir, exist_ok=True)
+                    report = render_report if gpu is g_GPUs[0] else {}
+                    return render_scene(scene_name, blend_file, gpu_dir, RunController.from_env(), DEVICE, report=report, env=env)
+
+                results = run_on_gpus(render_job, g_GPUs)
+                errors = [f"GPU {index}: {result['error']}" for index, result in results.items() if 'error' in result]
+                if errors:
+                    raise RuntimeError(", ".join(errors))
+                for index, result in results.items():
+                    g_Result[f"gpu{index}_{scene_name}_time_s_per_frame"] = result['result']
+                    scene_gpu_scores[index] = temp1["samples"] * 60 / result['result']
+                    gpu_scores[index] += scene_gpu_scores[index]
+                temp2 = results[g_GPUs[0]['gpu_index']]['result']
+            else:
+                temp2 = render_scene(scene_name, blend_file, output_dir, controller, DEVICE, report=render_report) # Render scene and return geometric mean of render times.
+        if VALIDATE:
+            validate_scene(g_Validator, scene_name, output_dir)
         
         samples_per_minute  = temp1["samples"] * 60 / temp2
 
@@ -115,11 +434,55 @@ try:
         g_Result[scene_name + '_time_s_per_frame'] = temp2
         time_list.append(temp2)
 
+        if 'load_time_s' in render_report: # Persistent Blender worker: scene loading and rendering are timed separately
+            g_Result[scene_name + '_load_time_s'] = render_report['load_time_s']
+            g_Result[scene_name + '_render_time_s'] = render_report['render_time_s']
+
+        # Run statistics of the time per frame: run count, mean, geometric mean, stddev, 95% confidence interval
+        g_Result[scene_name + '_runs'] = render_report['runs']
+
+        if 'telemetry' in render_report: # GPU/CPU state during the render: utilization, peak VRAM, throttling, temperature
+            g_Result[scene_name + '_telemetry'] = render_report['telemetry']
+        if 'telemetry_series' in render_report:
+            g_Series[scene_name] = render_report['telemetry_series']
+
+        if 'phases' in render_report: # Phase breakdown from Blender's output: kernels, sync, BVH, sampling, save
+            g_Result[scene_name + '_phases'] = render_report['phases']
+            if 'time_to_first_sample_s' in render_report['phases']:
+                g_Result[scene_name + '_time_to_first_sample_s'] = render_report['phases']['time_to_first_sample_s']
+            if 'samples_per_minute' in render_report['phases']: # Sampling loop only, comparable to 'stats.samples_per_minute' of the standard benchmark
+                g_Result[scene_name + '_sampling_samples_per_min'] = render_report['phases']['samples_per_minute']
+
         g_Result[scene_name + '_samples_per_min' ] = samples_per_minute 
         samples_per_minute_list.append(samples_per_minute)
 
+        if SEQUENCE_FRAMES > 1: # Frame range in one Blender process: first-frame latency vs. steady-state throughput
+            sequence_dir = f"{output_dir}_sequence"
+            if os.path.exists(sequence_dir):
+                shutil.rmtree(sequence_dir)
+            os.makedirs(sequence_dir, exist_ok=True)
+            sequence = render_sequence(scene_name, blend_file, sequence_dir, DEVICE, SEQUENCE_FRAMES, SEQUENCE_PERSISTENT_DATA,
+                                       env=gpu_env(g_GPUs[0]) if g_MultiGPU and DEVICE == "CUDA" else None)
+            g_Result[scene_name + '_sequence'] = sequence
+            g_Result[scene_name + '_first_frame_latency_s'] = sequence['first_frame_latency_s']
+            g_Result[scene_name + '_steady_frames_per_min'] = sequence.get('steady_frames_per_min')
+            g_Result[scene_name + '_amortized_time_s_per_frame'] = sequence['amortized_time_s_per_frame']
+
         total_blender_score += samples_per_minute
 
+        g_Journal.record(f"scene:{scene_name}", { "result": result_delta(before, g_Result), "time_s_per_frame": temp2,
+                                                   "samples_per_minute": samples_per_minute, "gpu_scores": scene_gpu_scores }, scene_depends)
+
+    g_Pipeline.close()
+    close_workers() # Including the per-GPU workers of multi-GPU nodes
+    g_Result['pipeline'] = g_Pipeline.summary() # Wall-clock time saved by preparing the scenes while rendering, vs. the serial path
+    g_Result['pipeline_saved_s'] = g_Result['pipeline']['saved_s']
+    print(f"\nPipeline: {g_Result['pipeline']['saved_s']:.2f}s saved ({g_Result['pipeline']['serial_s']:.2f}s serial, {g_Result['pipeline']['wall_s']:.2f}s wall-clock)")
+
+    if VALIDATE:
+        g_Result['frame_validation'] = g_Validator.results()
+        g_Result['frames_valid'] = all(result['passed'] for result in g_Result['frame_validation'].values())
+
     geom_mean_time = math.prod(time_list) ** (1 / len(time_list))
     print(f"\nGeometric Mean Time(second) per frame: {geom_mean_time:.2f}")
     g_Result['geometric_mean_time_s_per_frame'] = geom_mean_time 
@@ -132,26 +495,161 @@ try:
     print(f"\nCustom Blender OpenData Score: {total_blender_score:.2f}")
     g_Result["custom_blender_opendata_score"] = total_blender_score
 
+    if g_MultiGPU and DEVICE == "CUDA":
+        g_Result |= summarize_gpu_scores(gpu_scores, g_GPUs, "custom_blender_opendata_score")
+        print(f"Custom Blender OpenData Score, node ({len(g_GPUs)} GPUs): {g_Result['node_custom_blender_opendata_score']:.2f}")
+
 except Exception as e:
     g_End = time.perf_counter()
     g_Result['test_time'] = "{:.3f}".format(g_End - g_Start)  
     g_Result['error'] = f"An error occurred: {e}"
     print(g_Result)
     if benchmark_url != "":
-        requests.post( f"{benchmark_url}/{benchmark_sl_id}",json=g_Result, headers=benchmark_headers)
+        g_Reporter.post(f"{benchmark_url}/{benchmark_sl_id}", g_Result)
     Reallocate(e)
 
 
+# A node rendering wrong images (black, NaN-speckled or corrupted frames, e.g. a faulty GPU or driver) is rejected, however fast it is.
+# Not checked if the custom benchmark failed: it was already reported, and Reallocate() returns on SaladCloud.
+if VALIDATE and 'frames_valid' in g_Result and not g_Result['frames_valid']:
+    g_End = time.perf_counter()
+    g_Result['test_time'] = "{:.3f}".format(g_End - g_Start)  
+    g_Result['error'] = "Frame validation failed: " + "; ".join(f"{name}: {', '.join(result['failed'])}" for name, result in g_Result['frame_validation'].items() if not result['passed'])
+    print(g_Result)
+    if benchmark_url != "":
+        g_Reporter.post(f"{benchmark_url}/{benchmark_sl_id}", g_Result)
+    g_Journal.clear() # Rejected for cause: a restart renders the scenes again
+    Reallocate(g_Result['error'])
+
+
+try: 
+    tracer.phase("sweep")
+    # Parameter sweep: how the render time scales with resolution, samples, adaptive sampling, denoising, tile size, ... (sweep.py)
+    # The fitted model (time ≈ a + b · pixels · samples) and the curves of each scene go to g_Result, e.g. 'monster_sweep'.
+    if SWEEP:
+        print("\n" + 60 * "-" + " Start parameter sweep ...")
+        sweep_matrix = load_matrix()
+        for single_scene in list_main_blend_with_folder():
+            scene_name, blend_file = single_scene['scene'], single_scene['main_blend_path']
+            if sweep_matrix['scenes'] is not None and scene_name not in sweep_matrix['scenes']:
+                continue
+            sweep_depends = { "blend_file": [os.path.getsize(blend_file), os.path.getmtime(blend_file)], "matrix": sweep_matrix }
+            sweep = g_Journal.get(f"sweep:{scene_name}", sweep_depends)
+            if sweep is None:
+                sweep_env = gpu_env(g_GPUs[0]) if g_MultiGPU and DEVICE == "CUDA" else None
+                sweep = run_sweep(scene_name, get_blend_settings(blend_file, DEVICE),
+                                  lambda overrides: render_with_overrides(scene_name, blend_file, f"output/sweep_{scene_name}", DEVICE, overrides, env=sweep_env),
+                                  sweep_matrix)
+                g_Journal.record(f"sweep:{scene_name}", sweep, sweep_depends)
+            g_Result[scene_name + '_sweep'] = sweep
+        close_workers()
+
+except Exception as e:
+    g_End = time.perf_counter()
+    g_Result['test_time'] = "{:.3f}".format(g_End - g_Start)  
+    g_Result['error'] = f"An error occurred: {e}"
+    print(g_Result)
+    if benchmark_url != "":
+        g_Reporter.post(f"{benchmark_url}/{benchmark_sl_id}", g_Result)
+    Reallocate(e)
+
+
+try: 
+    tracer.phase("cpu_scaling")
+    # CPU thread scaling: render with 'blender -t N' pinned to N CPUs along a thread ladder (cpu_scaling.py), to tell real cores from SMT
+    # siblings and cgroup-throttled quotas. The parallel efficiency, SMT gain and optimal thread count go to g_Result, e.g. 'cpu_optimal_threads'.
+    if CPU_SCALING:
+        print("\n" + 60 * "-" + " Start CPU thread scaling ...")
+        scaling_scenes = list_main_blend_with_folder()
+        scaling_scene = next((scene for scene in scaling_scenes if scene['scene'] == CPU_SCALING_SCENE), scaling_scenes[0])
+        scaling_overrides = { "resolution_percentage": CPU_SCALING_RESOLUTION, "samples": CPU_SCALING_SAMPLES, "time_limit": 0,
+                              "use_adaptive_sampling": False, "use_denoising": False }
+        scaling_topology = cpu_topology()
+        scaling_depends = { "blend_file": [os.path.getsize(scaling_scene['main_blend_path']), os.path.getmtime(scaling_scene['main_blend_path'])],
+                            "cpus": [cpu['cpu'] for cpu in scaling_topology], "quota": cgroup_cpu_quota(),
+                            "settings": [CPU_SCALING_THREADS, scaling_overrides] }
+        scaling = g_Journal.get("cpu_scaling", scaling_depends)
+        if scaling is None:
+            scaling = run_scaling(lambda threads, cpus: render_pinned(scaling_scene['scene'], scaling_scene['main_blend_path'], "output/cpu_scaling",
+                                                                      threads, cpus, scaling_overrides),
+                                  CPU_SCALING_SAMPLES, scaling_topology)
+            g_Journal.record("cpu_scaling", scaling, scaling_depends)
+        g_Result['cpu_scaling'] = scaling
+        g_Result['cpu_optimal_threads'] = scaling['optimal_threads']
+        g_Result['cpu_packing_threads'] = scaling['packing_threads']
+        g_Result['cpu_smt_gain'] = scaling.get('smt_gain')
+
+except Exception as e:
+    g_End = time.perf_counter()
+    g_Result['test_time'] = "{:.3f}".format(g_End - g_Start)  
+    g_Result['error'] = f"An error occurred: {e}"
+    print(g_Result)
+    if benchmark_url != "":
+        g_Reporter.post(f"{benchmark_url}/{benchmark_sl_id}", g_Result)
+    Reallocate(e)
+
+
+try: 
+    tracer.phase("device_mix")
+    # Device configurations: CPU, CUDA, OPTIX, with the CPU (+CPU) and single GPUs of multi-GPU nodes (devices.py), rendered on each scene.
+    # The samples per minute of each configuration and the best one go to g_Result, e.g. 'monster_devices' and 'monster_best_device'.
+    if DEVICE_MIX:
+        print("\n" + 60 * "-" + " Start device configuration benchmarking ...")
+        g_Result['devices'] = list_devices()
+        device_configs = available_configs(g_Result['devices'], g_GPUs)
+        print(f"Device configurations: {[config['name'] for config in device_configs]}")
+        for single_scene in list_main_blend_with_folder():
+            scene_name, blend_file = single_scene['scene'], single_scene['main_blend_path']
+            if DEVICE_MIX_SCENES and scene_name not in DEVICE_MIX_SCENES.split(","):
+                continue
+            devices_depends = { "blend_file": [os.path.getsize(blend_file), os.path.getmtime(blend_file)],
+                                "configs": [config['name'] for config in device_configs], "runs": [DEVICE_MIX_WARMUP_RUNS, DEVICE_MIX_RUNS] }
+            scene_devices = g_Journal.get(f"devices:{scene_name}", devices_depends)
+            if scene_devices is None:
+                def render_config(config): # The worker of a configuration is closed once it is measured, before the next one starts
+                    env = config_env(config, g_GPUs)
+                    try:
+                        return render_scene(scene_name, blend_file, f"output/devices_{scene_name}",
+                                            RunController(DEVICE_MIX_WARMUP_RUNS, DEVICE_MIX_RUNS, DEVICE_MIX_RUNS), config['cycles_device'], env=env)
+                    finally:
+                        close_worker(config['cycles_device'], env)
+
+                scene_samples = get_blend_settings(blend_file, DEVICE, use_worker=False)['samples']
+                scene_devices = benchmark_configs(scene_name, scene_samples, device_configs, render_config, default=DEVICE)
+                g_Journal.record(f"devices:{scene_name}", scene_devices, devices_depends)
+            g_Result[scene_name + '_devices'] = scene_devices
+            g_Result[scene_name + '_best_device'] = scene_devices['best']
+
+except Exception as e:
+    g_End = time.perf_counter()
+    g_Result['test_time'] = "{:.3f}".format(g_End - g_Start)  
+    g_Result['error'] = f"An error occurred: {e}"
+    print(g_Result)
+    if benchmark_url != "":
+        g_Reporter.post(f"{benchmark_url}/{benchmark_sl_id}", g_Result)
+    Reallocate(e)
+
+
+tracer.phase("finish")
+g_Result['resumed_phases'] = g_Journal.resumed # Phases taken from the journal of a previous, interrupted run
+
+# Rank the node among the stored runs of the same GPU model, then store this run
+g_Result |= g_Store.rank(g_Result, g_Identity['gpu_type'])
+g_Identity['settings_hash'] = run_settings_hash() # The scenes may have been downloaded by the standard benchmark
+g_Store.add(g_Result, [OUTPUT_FILE_CUDA, OUTPUT_FILE_CPU], **g_Identity)
 g_End = time.perf_counter()
 g_Result['test_duration_s']  = "{:.3f}".format(g_End - g_Start)  
 g_Result['timestamp_pdt'] = datetime.now(ZoneInfo("America/Los_Angeles")).strftime("%Y-%m-%d %H:%M:%S")
+tracer.phase(None)
+g_Result['trace'] = tracer.summary()
 
 
 print()
 print(60 * '-' + " The final result:")
 print(json.dumps(g_Result, indent=4))
 if benchmark_url != "":
-    requests.post( f"{benchmark_url}/{benchmark_id}",json=g_Result,headers=benchmark_headers)
+    g_Reporter.post(f"{benchmark_url}/{benchmark_id}", g_Result | ({ "telemetry_series": g_Series } if g_Series else {}))
+g_Journal.clear() # Completed: the next run starts over
 print(60 * '-' + " The end")
 
 Reallocate("Changing nodes for test")
\ No newline at end of file
@@ -0,0 +1,298 @@
+import mmap
+import gzip
+import struct
+
+
+# Read scene settings straight from a .blend file, without launching Blender.
+# https://developer.blender.org/docs/features/core/blend_file/
+#
+# A .blend file is a header followed by blocks; each block has a header (BHead) with its code, size, the address it had in memory ('old' pointer),
+# the index of its struct in the SDNA and the number of structs it holds. The "DNA1" block (SDNA) describes the layout of every struct,
+# so fields are located by name and the reader keeps working across Blender versions, pointer sizes and endianness.
+#
+# Supported: 32/64-bit pointers, little/big endian, the legacy 12-byte header and the 17-byte header of Blender 5.0+ (64-bit block sizes),
+# uncompressed files (memory-mapped), gzip (Blender < 3.0) and zstd (Blender >= 3.0, needs the 'zstandard' package or Python 3.14+) compressed files.
+
+
+class BlendReadError(Exception):
+    pass
+
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+
+PRIMITIVES = {            # SDNA type name -> struct format
+    "char": "b", "uchar": "B", "int8_t": "b", "uint8_t": "B",
+    "short": "h", "ushort": "H", "int16_t": "h", "uint16_t": "H",
+    "int": "i", "uint": "I", "int32_t": "i", "uint32_t": "I",
+    "float": "f", "double": "d",
+    "int64_t": "q", "uint64_t": "Q", "long": "q", "ulong": "Q",
+}
+
+# ID property types (DNA_ID.h)
+IDP_INT, IDP_FLOAT, IDP_GROUP, IDP_DOUBLE, IDP_BOOLEAN = 1, 2, 6, 8, 10
+
+# Cycles settings are Python-defined properties: they are only written to the file once changed from their default.
+# Defaults of Blender >= 3.0 (Cycles X); other versions are left unresolved.
+CYCLES_DEFAULTS = {"samples": 4096, "time_limit": 0.0}
+
+
+def _decompress_zstd(f):
+    try:
+        from compression import zstd # Python 3.14+
+        return zstd.decompress(f.read())
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise BlendReadError("zstd compressed .blend file, but the 'zstandard' package is not installed")
+    # Blender writes multiple zstd frames (seekable format)
+    with zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True) as reader:
+        return reader.read()
+
+
+class BlendFile:
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._open()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _open(self):
+        magic = self._file.read(4)
+        self._file.seek(0)
+        if magic == ZSTD_MAGIC:
+            self.data = _decompress_zstd(self._file)
+        elif magic[:2] == GZIP_MAGIC:
+            self.data = gzip.decompress(self._file.read())
+        else:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.compressed = magic == ZSTD_MAGIC or magic[:2] == GZIP_MAGIC
+
+        self._read_header()
+        self._index_blocks()
+        self._read_sdna()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Legacy: "BLENDER" + '_'|'-' (4/8-byte pointers) + 'v'|'V' (little/big endian) + "405"
+    # Blender 5.0+: "BLENDER" + "17" (header size) + '-' + "01" (file format version) + 'v'|'V' + "0500"
+    def _read_header(self):
+        header = bytes(self.data[:17])
+        if header[:7] != b"BLENDER":
+            raise BlendReadError(f"Not a .blend file: {self.path}")
+        if header[7:9] == b"17":
+            if header[9:12] != b"-01":
+                raise BlendReadError(f"Unsupported .blend file format: {header!r}")
+            self.pointer_size, self.large_bhead = 8, True
+            endian, version, self.header_size = header[12:13], header[13:17], 17
+        else:
+            self.pointer_size, self.large_bhead = {b"_": 4, b"-": 8}[header[7:8]], False
+            endian, version, self.header_size = header[8:9], header[9:12], 12
+        self.endian = "<" if endian == b"v" else ">"
+        self.version = int(version)
+        self.pointer_format = "I" if self.pointer_size == 4 else "Q"
+
+        if self.large_bhead:   # code, SDNAnr, old, len, nr
+            fmt, self._bhead_order = self.endian + "4siQqq", (0, 3, 2, 1, 4)
+        else:                  # code, len, old, SDNAnr, nr
+            fmt, self._bhead_order = self.endian + "4si" + self.pointer_format + "ii", (0, 1, 2, 3, 4)
+        self._bhead = struct.Struct(fmt)
+
+    # Build the block index: old pointer -> block, and code -> blocks
+    def _index_blocks(self):
+        self.blocks = {}
+        self.blocks_by_code = {}
+        offset, size = self.header_size, len(self.data)
+        unpack_bhead, bhead_size, order = self._bhead.unpack_from, self._bhead.size, self._bhead_order
+        while offset + bhead_size <= size:
+            fields = unpack_bhead(self.data, offset)
+            code, length, old, sdna_index, count = (fields[i] for i in order)
+            data_offset = offset + bhead_size
+            if code == b"ENDB":
+                break
+            block = (code, data_offset, length, sdna_index, count)
+            self.blocks[old] = block
+            self.blocks_by_code.setdefault(code.rstrip(b"\0"), []).append(block)
+            offset = data_offset + length
+        if b"DNA1" not in self.blocks_by_code:
+            raise BlendReadError(f"No SDNA block found: {self.path}")
+
+    def _read_sdna(self):
+        _, offset, length, _, _ = self.blocks_by_code[b"DNA1"][0]
+        dna = bytes(self.data[offset:offset + length])
+        pos = 8 # "SDNA" "NAME"
+
+        def read_strings(pos):
+            count = struct.unpack_from(self.endian + "i", dna, pos)[0]
+            pos += 4
+            strings = []
+            for _ in range(count):
+                end = dna.index(b"\0", pos)
+                strings.append(dna[pos:end].decode("ascii", "replace"))
+                pos = end + 1
+            return strings, (pos + 3) & ~3
+
+        names, pos = read_strings(pos)
+        types, pos = read_strings(pos + 4) # "TYPE"
+        pos += 4                           # "TLEN"
+        lengths = struct.unpack_from(f"{self.endian}{len(types)}H", dna, pos)
+        pos = (pos + 2 * len(types) + 3) & ~3
+        pos += 4                           # "STRC"
+        struct_count = struct.unpack_from(self.endian + "i", dna, pos)[0]
+        pos += 4
+
+        self.types = types
+        self.type_lengths = dict(zip(types, lengths))
+        self.structs = {}       # struct name -> {field name: (offset, type name, is pointer, array length)}
+        self.struct_names = []  # SDNA index -> struct name
+        for _ in range(struct_count):
+            type_index, field_count = struct.unpack_from(self.endian + "hh", dna, pos)
+            pos += 4
+            fields, field_offset = {}, 0
+            for _ in range(field_count):
+                field_type, field_name = struct.unpack_from(self.endian + "hh", dna, pos)
+                pos += 4
+                name, is_pointer, array_length = self._parse_name(names[field_name])
+                size = self.pointer_size if is_pointer else lengths[field_type]
+                fields[name] = (field_offset, types[field_type], is_pointer, array_length)
+                field_offset += size * array_length
+            self.structs[types[type_index]] = fields
+            self.struct_names.append(types[type_index])
+
+    # "*next" -> pointer, "name[64]" -> array of 64, "(*func)()" -> function pointer, "mat[4][4]" -> array of 16
+    @staticmethod
+    def _parse_name(raw):
+        is_pointer = raw.startswith("*") or raw.startswith("(*")
+        name = raw.lstrip("(*").split(")")[0].split("[")[0]
+        array_length = 1
+        for dim in raw.split("[")[1:]:
+            array_length *= int(dim.split("]")[0])
+        return name, is_pointer, array_length
+
+    # Locate a (possibly nested) field, e.g. field_location("Scene", "r.xsch") -> (offset within Scene, type name, is pointer, array length)
+    def field_location(self, struct_name, path):
+        offset = 0
+        for part in path.split("."):
+            fields = self.structs.get(struct_name)
+            if fields is None or part not in fields:
+                raise BlendReadError(f"Field not found: {struct_name}.{part}")
+            field_offset, struct_name, is_pointer, array_length = fields[part]
+            offset += field_offset
+        return offset, struct_name, is_pointer, array_length
+
+    def has_field(self, struct_name, path):
+        try:
+            self.field_location(struct_name, path)
+            return True
+        except BlendReadError:
+            return False
+
+    # Read a primitive or pointer field of the struct stored at 'base' (absolute offset in the file data)
+    def read_field(self, base, struct_name, path):
+        offset, type_name, is_pointer, array_length = self.field_location(struct_name, path)
+        if is_pointer:
+            return struct.unpack_from(self.endian + self.pointer_format, self.data, base + offset)[0]
+        if type_name == "char" and array_length > 1: # C string
+            raw = bytes(self.data[base + offset:base + offset + array_length])
+            return raw.split(b"\0", 1)[0].decode("utf-8", "replace")
+        if type_name not in PRIMITIVES:
+            raise BlendReadError(f"Not a primitive field: {struct_name}.{path} ({type_name})")
+        return struct.unpack_from(self.endian + PRIMITIVES[type_name], self.data, base + offset)[0]
+
+    def read_raw(self, base, struct_name, path, size):
+        offset = self.field_location(struct_name, path)[0]
+        return bytes(self.data[base + offset:base + offset + size])
+
+    # Absolute offset of the data an old pointer points to, or None
+    def resolve(self, pointer):
+        block = self.blocks.get(pointer) if pointer else None
+        return block[1] if block else None
+
+    # The scene Blender makes active on load: FileGlobal.curscene, else the first scene
+    def active_scene(self):
+        for glob in self.blocks_by_code.get(b"GLOB", []):
+            if self.has_field("FileGlobal", "curscene"):
+                offset = self.resolve(self.read_field(glob[1], "FileGlobal", "curscene"))
+                if offset is not None:
+                    return offset
+        scenes = self.blocks_by_code.get(b"SC")
+        if not scenes:
+            raise BlendReadError(f"No scene found: {self.path}")
+        return scenes[0][1]
+
+    # Iterate over the (name, type, offset) of the children of an IDP_GROUP ID property
+    def idproperty_children(self, group):
+        child = self.resolve(self.read_field(group, "IDProperty", "data.group.first"))
+        while child is not None:
+            yield self.read_field(child, "IDProperty", "name"), self.read_field(child, "IDProperty", "type"), child
+            child = self.resolve(self.read_field(child, "IDProperty", "next"))
+
+    def idproperty_value(self, prop, prop_type):
+        if prop_type in (IDP_INT, IDP_BOOLEAN):
+            return self.read_field(prop, "IDProperty", "data.val")
+        if prop_type == IDP_FLOAT:
+            return struct.unpack(self.endian + "f", self.read_raw(prop, "IDProperty", "data.val", 4))[0]
+        if prop_type == IDP_DOUBLE: # stored across 'val' and 'val2'
+            return struct.unpack(self.endian + "d", self.read_raw(prop, "IDProperty", "data.val", 8))[0]
+        raise BlendReadError(f"Unsupported ID property type: {prop_type}")
+
+    # Find a top-level ID property group of an ID, e.g. "cycles" of a scene.
+    # Blender 5.0+ stores Python-defined properties in 'system_properties', older versions in 'properties'.
+    def id_property_group(self, id_offset, struct_name, name):
+        for path in ("id.system_properties", "id.properties"):
+            if not self.has_field(struct_name, path):
+                continue
+            root = self.resolve(self.read_field(id_offset, struct_name, path))
+            if root is None:
+                continue
+            for child_name, child_type, child in self.idproperty_children(root):
+                if child_name == name and child_type == IDP_GROUP:
+                    return child
+        return None
+
+
+# Read the same settings as helper.get_blend_settings() from a .blend file.
+# Returns a dictionary with keys: resolution_x, resolution_y, percentage, samples, time_limit; fields that can't be resolved are None.
+# Raises BlendReadError if the file can't be read at all.
+def read_blend_settings(blend_file):
+    settings = dict.fromkeys(["resolution_x", "resolution_y", "percentage", "samples", "time_limit"])
+    try:
+        with BlendFile(blend_file) as blend:
+            scene = blend.active_scene()
+            for key, path in (("resolution_x", "r.xsch"), ("resolution_y", "r.ysch"), ("percentage", "r.size")):
+                if blend.has_field("Scene", path):
+                    settings[key] = blend.read_field(scene, "Scene", path)
+
+            cycles = {}
+            group = blend.id_property_group(scene, "Scene", "cycles")
+            if group is not None:
+                for name, prop_type, prop in blend.idproperty_children(group):
+                    if name in CYCLES_DEFAULTS:
+                        try:
+                            cycles[name] = blend.idproperty_value(prop, prop_type)
+                        except BlendReadError:
+                            pass
+            if blend.version >= 300:
+                cycles = CYCLES_DEFAULTS | cycles
+            if "samples" in cycles:
+                settings["samples"] = int(cycles["samples"])
+            if "time_limit" in cycles:
+                settings["time_limit"] = int(cycles["time_limit"])
+    except (OSError, ValueError, KeyError, IndexError, struct.error) as e:
+        raise BlendReadError(f"Failed to read {blend_file}: {e}")
+    return settings
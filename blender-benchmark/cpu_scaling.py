@@ -0,0 +1,178 @@
+import os
+import glob
+import math
+
+
+CPU_SCALING = os.getenv("CPU_SCALING", "0") == "1"                                 # Run the CPU thread-scaling benchmark after the custom benchmark
+CPU_SCALING_SCENE = os.getenv("CPU_SCALING_SCENE", "monster")                      # The scene rendered at each step of the thread ladder
+CPU_SCALING_THREADS = os.getenv("CPU_SCALING_THREADS", "")                         # Thread ladder, e.g. "1,2,4,8,16"; powers of 2 and the core counts if not set
+CPU_SCALING_RESOLUTION = int(os.getenv("CPU_SCALING_RESOLUTION", "25"))            # Resolution percentage of the renders, to keep the ladder short
+CPU_SCALING_SAMPLES = int(os.getenv("CPU_SCALING_SAMPLES", "16"))                  # Samples of the renders
+CPU_SCALING_OPTIMAL = float(os.getenv("CPU_SCALING_OPTIMAL", "0.95"))              # The optimal thread count is the lowest one reaching this fraction of the best throughput
+CPU_SCALING_MIN_EFFICIENCY = float(os.getenv("CPU_SCALING_MIN_EFFICIENCY", "0.8")) # The packing thread count is the highest one with at least this parallel efficiency
+
+SYS_CPU = "/sys/devices/system/cpu"
+SYS_NODE = "/sys/devices/system/node"
+CGROUP_V2 = "/sys/fs/cgroup"
+CGROUP_V1 = "/sys/fs/cgroup/cpu,cpuacct"
+
+
+# Measure how CPU rendering scales with the thread count, to tell real cores from SMT siblings and cgroup-throttled quotas, and to pack
+# several CPU render jobs per node without interference.
+#
+# Each step of the thread ladder renders a scene with 'blender -t N', pinned with 'taskset' to N CPUs of the container's affinity mask.
+# CPUs are placed physical cores first and compact: one CPU per core, filling a NUMA node (then a package) before the next one, and the SMT
+# siblings only once every core is used. So the ladder measures the real cores up to the core count, and the SMT gain beyond it.
+# The throughput of a step is the samples per minute of the sampling loop (render_log.py). Returns:
+#   steps                      threads, CPUs, samples/min, speedup over 1 thread, parallel efficiency (speedup / threads), cgroup throttling
+#   smt_gain                   throughput with all logical CPUs over the throughput with one CPU per core, minus 1
+#   optimal_threads            the lowest thread count reaching CPU_SCALING_OPTIMAL of the best throughput
+#   packing_threads            the highest thread count with a parallel efficiency of at least CPU_SCALING_MIN_EFFICIENCY, and packing_jobs,
+#                              the jobs of that size fitting the usable CPUs
+#   numa_spread_ratio          on NUMA nodes, the throughput of one node's worth of threads spread over all nodes over the same threads on one node
+# The cgroup CPU quota (cpu.max, or cpu.cfs_quota_us on cgroup v1) caps the usable CPUs: threads beyond it are throttled, not faster.
+
+
+# CPUs of a Linux CPU list, e.g. "0-3,8-11"
+def parse_cpu_list(text):
+    cpus = []
+    for part in text.strip().split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+# The CPUs this process may run on, with their core, package and NUMA node: [{"cpu", "core", "package", "node"}]
+def cpu_topology():
+    nodes = {}
+    for path in glob.glob(os.path.join(SYS_NODE, "node[0-9]*")):
+        for cpu in parse_cpu_list(_read(os.path.join(path, "cpulist")) or ""):
+            nodes[cpu] = int(os.path.basename(path)[4:])
+    topology = []
+    for cpu in sorted(os.sched_getaffinity(0)):
+        core = _read(os.path.join(SYS_CPU, f"cpu{cpu}", "topology", "core_id"))
+        package = _read(os.path.join(SYS_CPU, f"cpu{cpu}", "topology", "physical_package_id"))
+        topology.append({ "cpu": cpu, "core": int(core) if core is not None else cpu,
+                          "package": int(package) if package is not None else 0, "node": nodes.get(cpu, 0) })
+    return topology
+
+
+# The cgroup CPU quota in CPUs (e.g. 8.0 for "800000 100000"), or None if unlimited
+def cgroup_cpu_quota():
+    cpu_max = _read(os.path.join(CGROUP_V2, "cpu.max"))
+    if cpu_max is not None:
+        quota, period = cpu_max.split()
+        return None if quota == "max" else int(quota) / int(period)
+    quota, period = _read(os.path.join(CGROUP_V1, "cpu.cfs_quota_us")), _read(os.path.join(CGROUP_V1, "cpu.cfs_period_us"))
+    if quota is None or period is None or int(quota) < 0:
+        return None
+    return int(quota) / int(period)
+
+
+# Throttling counters of the cgroup: {"nr_throttled", "throttled_s"}, or None
+def cgroup_throttling():
+    for path, unit in ((os.path.join(CGROUP_V2, "cpu.stat"), 1e6), (os.path.join(CGROUP_V1, "cpu.stat"), 1e9)): # throttled_usec, throttled_time (ns)
+        text = _read(path)
+        if text is None:
+            continue
+        stat = dict(line.split() for line in text.splitlines() if len(line.split()) == 2)
+        throttled = stat.get("throttled_usec", stat.get("throttled_time"))
+        if "nr_throttled" in stat and throttled is not None:
+            return { "nr_throttled": int(stat["nr_throttled"]), "throttled_s": int(throttled) / unit }
+    return None
+
+
+# The CPUs of the logical CPUs grouped by physical core, in placement order: compact by NUMA node, package and core
+def _cores(topology):
+    cores = {}
+    for cpu in topology:
+        cores.setdefault((cpu["node"], cpu["package"], cpu["core"]), []).append(cpu["cpu"])
+    return [cores[key] for key in sorted(cores)]
+
+
+# The CPUs to pin 'threads' threads to: one CPU per core first, then the SMT siblings. With 'spread', the cores are taken from
+# the NUMA nodes in turn instead of filling one node first.
+def placement(topology, threads, spread=False):
+    cores = _cores(topology)
+    if spread:
+        by_node = {}
+        for core in cores:
+            by_node.setdefault(next(cpu["node"] for cpu in topology if cpu["cpu"] == core[0]), []).append(core)
+        cores = [core for group in zip(*by_node.values()) for core in group]
+    order = [cpu for level in range(max(map(len, cores))) for cpu in (core[level] for core in cores if level < len(core))]
+    return order[:threads]
+
+
+# Thread counts to measure: CPU_SCALING_THREADS, or the powers of 2, the core count, the quota and the logical CPU count
+def thread_ladder(topology, quota=None):
+    logical, physical = len(topology), len(_cores(topology))
+    if CPU_SCALING_THREADS:
+        return sorted({ min(int(threads), logical) for threads in CPU_SCALING_THREADS.split(",") if threads.strip() })
+    ladder = { 2 ** power for power in range(int(math.log2(logical)) + 1) } | { physical, logical }
+    if quota is not None and quota < logical:
+        ladder.add(max(math.ceil(quota), 1))
+    return sorted(ladder)
+
+
+# Run the thread ladder. 'render(threads, cpus)' renders the scene once pinned to 'cpus' and returns its phase breakdown
+# (render_log.py) with 'elapsed_s'; the samples of the renders are needed when the sampling loop can't be timed from the output.
+def run_scaling(render, samples=CPU_SCALING_SAMPLES, topology=None):
+    topology = topology or cpu_topology()
+    quota = cgroup_cpu_quota()
+    logical, physical = len(topology), len(_cores(topology))
+    numa_nodes = sorted({ cpu["node"] for cpu in topology })
+    usable = min(logical, quota) if quota is not None else logical
+    print(f"CPU topology: {logical} logical CPUs, {physical} cores, {len(numa_nodes)} NUMA nodes" +
+          (f", cgroup quota {quota:.2f} CPUs" if quota is not None else ""))
+
+    def measure(threads, spread=False):
+        cpus = placement(topology, threads, spread)
+        print(f"\n[CPU scaling] {threads} threads on CPUs {cpus}" + (" (spread)" if spread else ""))
+        before = cgroup_throttling()
+        phases = render(threads, cpus)
+        after = cgroup_throttling()
+        throughput = phases.get("samples_per_minute") or samples * 60 / phases["elapsed_s"]
+        step = { "threads": threads, "cpus": cpus, "samples_per_minute": throughput, "elapsed_s": phases["elapsed_s"] }
+        if before is not None and after is not None:
+            step["nr_throttled"] = after["nr_throttled"] - before["nr_throttled"]
+            step["throttled_s"] = round(after["throttled_s"] - before["throttled_s"], 3)
+        print(f"[CPU scaling] {threads} threads: {throughput:.2f} samples/min")
+        return step
+
+    steps = [measure(threads) for threads in thread_ladder(topology, quota)]
+    base = next((step for step in steps if step["threads"] == 1), steps[0])
+    for step in steps: # Relative to the lowest thread count, 1 by default
+        step["speedup"] = step["samples_per_minute"] / base["samples_per_minute"] * base["threads"]
+        step["efficiency"] = step["speedup"] / step["threads"]
+
+    best = max(step["samples_per_minute"] for step in steps)
+    optimal = next(step for step in steps if step["samples_per_minute"] >= CPU_SCALING_OPTIMAL * best)
+    packing = max((step for step in steps if step["efficiency"] >= CPU_SCALING_MIN_EFFICIENCY), key=lambda step: step["threads"], default=base)
+    result = { "logical_cpus": logical, "physical_cores": physical, "numa_nodes": len(numa_nodes), "cgroup_quota_cpus": quota,
+               "quota_limited": quota is not None and quota < logical, "steps": steps,
+               "optimal_threads": optimal["threads"], "optimal_efficiency": optimal["efficiency"],
+               "packing_threads": packing["threads"], "packing_jobs": max(int(usable // packing["threads"]), 1) }
+
+    by_threads = { step["threads"]: step for step in steps }
+    if logical > physical and physical in by_threads and logical in by_threads:
+        result["smt_gain"] = by_threads[logical]["samples_per_minute"] / by_threads[physical]["samples_per_minute"] - 1
+    if len(numa_nodes) > 1:
+        node_threads = physical // len(numa_nodes)
+        compact = by_threads.get(node_threads) or measure(node_threads)
+        result["numa_spread_ratio"] = measure(node_threads, spread=True)["samples_per_minute"] / compact["samples_per_minute"]
+
+    print(f"[CPU scaling] Optimal {result['optimal_threads']} threads (efficiency {result['optimal_efficiency']:.2f}), "
+          f"{result['packing_jobs']} jobs of {result['packing_threads']} threads per node" +
+          (f", SMT gain {100 * result['smt_gain']:.1f}%" if "smt_gain" in result else ""))
+    return result
@@ -0,0 +1,78 @@
+import os
+
+
+DEVICE_MIX = os.getenv("DEVICE_MIX", "0") == "1"                       # Benchmark the device configurations of the node after the custom benchmark
+DEVICE_CONFIGS = os.getenv("DEVICE_CONFIGS", "")                       # Configurations to benchmark, e.g. "CUDA;CUDA+CPU;OPTIX;CUDA@0"; all available ones if not set
+DEVICE_MIX_SCENES = os.getenv("DEVICE_MIX_SCENES", "")                 # Scenes to benchmark them on, e.g. "monster,junkshop"; all scenes if not set
+DEVICE_MIX_WARMUP_RUNS = int(os.getenv("DEVICE_MIX_WARMUP_RUNS", "1")) # Runs discarded per configuration, e.g. the first OptiX render compiles its kernels
+DEVICE_MIX_RUNS = int(os.getenv("DEVICE_MIX_RUNS", "1"))               # Measured runs per configuration and scene
+
+
+# Device configurations: which Cycles devices render a scene together, to find the fastest device mix of each node.
+#
+# A configuration is written "<device>[+CPU][@<GPU indices>]":
+#   CUDA        all visible CUDA GPUs           OPTIX       all visible GPUs with OptiX
+#   CUDA+CPU    the GPUs and the CPU together   OPTIX+CPU   the GPUs with OptiX and the CPU together
+#   CUDA@0      GPU 0 only                      CUDA@0,1    GPUs 0 and 1
+#   CPU         the CPU only
+# The device part is passed to Blender as '--cycles-device', which sets the compute device type in the Cycles preferences and enables
+# its devices ('+CPU' enables the CPU as well); the GPU indices select the GPUs with CUDA_VISIBLE_DEVICES (nvidia-smi order, by UUID).
+# A worker is started per configuration (worker.get_worker() keys them by device and CUDA_VISIBLE_DEVICES), and closed once it is measured.
+
+
+# {"name", "cycles_device", "gpus": [GPU indices] or None for all visible GPUs}
+def parse_config(name):
+    cycles_device, _, indices = name.strip().partition("@")
+    return { "name": name.strip(), "cycles_device": cycles_device.upper(),
+             "gpus": [int(index) for index in indices.split(",")] if indices else None }
+
+
+# The configurations the node offers, from the devices found by Cycles (helper.list_devices()) and the GPU list (init_check.Get_GPU_List()),
+# or DEVICE_CONFIGS if set
+def available_configs(devices, gpus):
+    if DEVICE_CONFIGS:
+        return [parse_config(name) for name in DEVICE_CONFIGS.split(";") if name.strip()]
+    names = ["CPU"]
+    for device_type in ("CUDA", "OPTIX"):
+        if devices.get(device_type):
+            names += [device_type, f"{device_type}+CPU"]
+    if devices.get("CUDA") and len(gpus) > 1: # A single GPU of a multi-GPU node, compared to all of them
+        names.append(f"CUDA@{gpus[0]['gpu_index']}")
+    return [parse_config(name) for name in names]
+
+
+# Environment of the Blender processes of a configuration, or None for the default (all visible GPUs)
+def config_env(config, gpus):
+    if config["gpus"] is None:
+        return None
+    uuids = [gpu['gpu_uuid'] for gpu in gpus if gpu['gpu_index'] in config["gpus"]]
+    if len(uuids) != len(config["gpus"]):
+        raise ValueError(f"{config['name']}: no such GPU in {[gpu['gpu_index'] for gpu in gpus]}")
+    return os.environ | { "CUDA_VISIBLE_DEVICES": ",".join(uuids), "CUDA_DEVICE_ORDER": "PCI_BUS_ID" }
+
+
+# Benchmark the configurations on a scene. 'render(config)' renders the scene with a configuration and returns the time per frame;
+# 'samples' are the samples of the scene. A configuration that fails (e.g. OptiX on an unsupported GPU) is recorded with its error.
+# Returns the samples per minute of each configuration, and the best one.
+def benchmark_configs(scene_name, samples, configs, render, default=None):
+    results = {}
+    for config in configs:
+        print(f"\n[{scene_name}] Device configuration {config['name']}")
+        try:
+            time_s_per_frame = render(config)
+        except Exception as e:
+            print(f"[{scene_name}] Device configuration {config['name']} failed: {e}")
+            results[config['name']] = { "error": str(e) }
+            continue
+        results[config['name']] = { "time_s_per_frame": time_s_per_frame, "samples_per_minute": samples * 60 / time_s_per_frame }
+        print(f"[{scene_name}] {config['name']}: {results[config['name']]['samples_per_minute']:.2f} samples/min")
+
+    measured = { name: result for name, result in results.items() if "samples_per_minute" in result }
+    if not measured:
+        raise RuntimeError(f"[{scene_name}] All device configurations failed")
+    best = max(measured, key=lambda name: measured[name]["samples_per_minute"])
+    result = { "configs": results, "best": best, "best_samples_per_minute": measured[best]["samples_per_minute"] }
+    if default in measured: # Gain of the best configuration over the one of the custom benchmark (DEVICE)
+        result["gain_over_default"] = measured[best]["samples_per_minute"] / measured[default]["samples_per_minute"] - 1
+    print(f"[{scene_name}] Best device configuration: {best}, {result['best_samples_per_minute']:.2f} samples/min")
+    return result
@@ -0,0 +1,73 @@
+import os
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+
+SLOW_GPU_TOLERANCE = float(os.getenv("SLOW_GPU_TOLERANCE", "0.15")) # A GPU is flagged as slow if it is more than 15% below the median of its identical siblings
+
+
+# Run benchmark jobs on every GPU of a node at the same time.
+#
+# Each job runs its Blender / benchmark-launcher-cli processes with CUDA_VISIBLE_DEVICES set to the UUID of one GPU, so every process is isolated
+# on its own card and sees it as device 0. UUIDs are used because the CUDA device order (fastest first by default) may differ from the nvidia-smi order.
+# The GPU list comes from init_check.Get_GPU_List().
+
+
+# The GPUs usable by this container: all of them, or those selected by CUDA_VISIBLE_DEVICES (indices or UUIDs)
+def visible_gpus(gpus):
+    visible = os.getenv("CUDA_VISIBLE_DEVICES")
+    if visible is None:
+        return gpus
+    selected = [item.strip() for item in visible.split(",") if item.strip()]
+    return [gpu for gpu in gpus if str(gpu['gpu_index']) in selected or gpu['gpu_uuid'] in selected]
+
+
+# Environment for the processes of a job running on one GPU
+def gpu_env(gpu):
+    return os.environ | { "CUDA_VISIBLE_DEVICES": gpu['gpu_uuid'], "CUDA_DEVICE_ORDER": "PCI_BUS_ID" }
+
+
+# Run job(gpu, env=...) on all GPUs concurrently.
+# Returns {gpu_index: {"result": ..., "time_s": ...}} or {"error": ...} if the job raised.
+def run_on_gpus(job, gpus):
+    def run(gpu):
+        start_time = time.perf_counter()
+        try:
+            return { "result": job(gpu, env=gpu_env(gpu)), "time_s": time.perf_counter() - start_time }
+        except Exception as e:
+            print(f"[GPU {gpu['gpu_index']}] Job failed: {e}")
+            return { "error": str(e), "time_s": time.perf_counter() - start_time }
+
+    print(f"\nRunning on {len(gpus)} GPUs concurrently: {[gpu['gpu_index'] for gpu in gpus]}")
+    with ThreadPoolExecutor(max_workers=max(len(gpus), 1)) as executor:
+        results = list(executor.map(run, gpus))
+    return { gpu['gpu_index']: result for gpu, result in zip(gpus, results) }
+
+
+# Flag GPUs much slower than the median of the identical GPUs (same model) on the node.
+# 'scores': {gpu_index: score}, higher is better. Returns the list of slow GPU indices.
+def detect_slow_gpus(scores, gpus, tolerance=SLOW_GPU_TOLERANCE):
+    by_type = {}
+    for gpu in gpus:
+        if gpu['gpu_index'] in scores:
+            by_type.setdefault(gpu['gpu_type'], []).append(gpu['gpu_index'])
+
+    slow = []
+    for gpu_type, indices in by_type.items():
+        if len(indices) < 2:
+            continue
+        median = statistics.median(scores[index] for index in indices)
+        for index in indices:
+            if scores[index] < (1 - tolerance) * median:
+                print(f"[GPU {index}] {gpu_type} is slow: {scores[index]:.2f} vs. median {median:.2f} of {len(indices)} identical GPUs")
+                slow.append(index)
+    return slow
+
+
+# Per-device scores and the aggregate node throughput (sum of the per-device scores)
+def summarize_gpu_scores(scores, gpus, name):
+    summary = { f"gpu{index}_{name}": score for index, score in scores.items() }
+    summary[f"node_{name}"] = sum(scores.values())
+    summary[f"slow_gpus_{name}"] = detect_slow_gpus(scores, gpus)
+    return summary
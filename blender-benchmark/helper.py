@@ -5,23 +5,36 @@ import json
 import re
 import time
 import math
+from worker import BLENDER_BIN, WorkerError, get_worker
+from blend_reader import BlendReadError, read_blend_settings
+from telemetry import render_sampler, TELEMETRY_SERIES
+from render_log import CyclesLogParser
+from run_stats import RunController
+from tracing import span, wait_child, track_process
 
 
 # List available devices for benchmarking and rendering
+# Returns the device names found by Cycles per device type: {"CPU": [...], "CUDA": [...], "OPTIX": [...]}, empty lists if Blender fails.
 def list_devices():
         cmd = [
-                "blender", "-b", "--python-expr",
-                "import bpy; prefs=bpy.context.preferences.addons['cycles'].preferences; "
-                "print('CPU:', [d.name for d in prefs.get_devices_for_type('CPU')], "
-                "'CUDA:', [d.name for d in prefs.get_devices_for_type('CUDA') if d.type=='CUDA'], "
-                "'OPTIX:', [d.name for d in prefs.get_devices_for_type('OPTIX') if d.type=='OPTIX'])"
+                BLENDER_BIN, "-b", "--python-expr",
+                "import bpy, json; prefs=bpy.context.preferences.addons['cycles'].preferences; "
+                "print('DEVICES', json.dumps({ 'CPU': [d.name for d in prefs.get_devices_for_type('CPU')], "
+                "'CUDA': [d.name for d in prefs.get_devices_for_type('CUDA') if d.type=='CUDA'], "
+                "'OPTIX': [d.name for d in prefs.get_devices_for_type('OPTIX') if d.type=='OPTIX'] }))"
         ]
         print(f"\nListig devices")
         print("Executing: " + ' '.join(cmd))
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        for line in result.stdout.splitlines():
-            if line.startswith("CPU:"):
-                print(line)
+        with span("blender", purpose="list_devices") as attributes:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            out = process.stdout.read()
+            wait_child(process, attributes)
+        devices = { "CPU": [], "CUDA": [], "OPTIX": [] }
+        for line in out.splitlines():
+            if line.startswith("DEVICES "):
+                devices |= json.loads(line[len("DEVICES "):])
+                print(devices)
+        return devices
 
 
 # Download scenes and run the Blender benchmark using 'benchmark-launcher-cli'.
@@ -52,7 +65,9 @@ def list_devices():
 
 # The Blender OpenData Score is the sum of the samples_per_minute values for all three scenes.
 # https://opendata.blender.org/about/#benchmark-score
-def run_blender_benchmark(blender_version="4.5.0", device_type="CUDA", scenes=None, output_file="benchmark_results.json") -> None:
+# 'env', if given, is the environment of the benchmark process (e.g. CUDA_VISIBLE_DEVICES to run on one GPU of a multi-GPU node).
+# 'report', if given, receives the GPU/CPU telemetry summary of the run ('telemetry'), and its time series ('telemetry_series') if TELEMETRY_SERIES is set.
+def run_blender_benchmark(blender_version="4.5.0", device_type="CUDA", scenes=None, output_file="benchmark_results.json", env=None, report=None) -> None:
   
     if scenes is None:
         scenes = ["monster", "junkshop", "classroom"]
@@ -79,8 +94,14 @@ def run_blender_benchmark(blender_version="4.5.0", device_type="CUDA", scenes=No
     ] + scenes
     print(f"\nRunning benchmark for scenes: {scenes}")
     print("Executing: " + ' '.join(benchmark_cmd))
-    with open(output_file, "w") as f:
-        subprocess.run(benchmark_cmd, stdout=f, check=True)
+    with span("benchmark_launcher", device=device_type, scenes=scenes) as attributes, open(output_file, "w") as f, render_sampler(device_type, env) as sampler:
+        process = subprocess.Popen(benchmark_cmd, stdout=f, env=env)
+        if wait_child(process, attributes) != 0:
+            raise subprocess.CalledProcessError(process.returncode, benchmark_cmd)
+    if report is not None and sampler.enabled:
+        report["telemetry"] = sampler.summary()
+        if TELEMETRY_SERIES:
+            report["telemetry_series"] = sampler.series()
     
     print(f"\nBenchmark complete. Results saved to {output_file}")
 
@@ -97,7 +118,8 @@ def compute_blender_score(json_file_path: str) -> float:
 
 # The scenes are downloaded to ~/.cache/blender-benchmark-launcher/scenes.
 # List all scenes with a main.blend file in the cache directory.
-def list_main_blend_with_folder(base_dir=None):
+# With 'with_settings', the scene settings are read directly from each .blend file (no Blender launch), fields that can't be resolved are None.
+def list_main_blend_with_folder(base_dir=None, with_settings=False):
 
     if base_dir is None:
         base_dir = os.path.expanduser("~/.cache/blender-benchmark-launcher/scenes")
@@ -117,11 +139,18 @@ def list_main_blend_with_folder(base_dir=None):
             scene_folder = os.path.join(hash_path, scene_name)
             main_blend = os.path.join(scene_folder, "main.blend")
             if os.path.isfile(main_blend):
-                result.append({
+                entry = {
                     "folder": hash_folder,
                     "scene": scene_name,
                     "main_blend_path": main_blend
-                })
+                }
+                if with_settings:
+                    try:
+                        entry["settings"] = read_blend_settings(main_blend)
+                    except BlendReadError as e:
+                        print(e)
+                        entry["settings"] = None
+                result.append(entry)
     
     return result
 
@@ -129,9 +158,51 @@ def list_main_blend_with_folder(base_dir=None):
 # Extract scene settings from a .blend file using Blender's Python API.
 # Returns a dictionary with keys: resolution_x, resolution_y, percentage, final_resolution, samples, time_limit
 # 'time_limit' means the maximum allowed time (in seconds) for the render loop specified in the .blend file, and 0 means no time limit.
-def get_blend_settings(blend_file: str):
+# The settings are read directly from the .blend file first (blend_reader.py). Only if some of them can't be resolved, Blender is used:
+# the persistent Blender worker of 'cycles_device' when available (so a following render_scene reuses the process), otherwise a one-shot Blender process.
+# Without 'use_worker', always a one-shot process, e.g. to read the settings of the next scene while the worker renders (pipeline.py).
+def get_blend_settings(blend_file: str, cycles_device="CUDA", use_worker=True):
+    with span("settings", blend_file=blend_file) as attributes:
+        try:
+            settings = read_blend_settings(blend_file)
+        except BlendReadError as e:
+            print(e)
+            settings = {}
+
+        if None in settings.values() or not settings:
+            print(f"Reading unresolved settings with Blender: {blend_file}")
+            attributes["blender"] = True
+            from_blender = None
+            worker = get_worker(cycles_device) if use_worker else None
+            if worker is not None:
+                try:
+                    worker.load(blend_file)
+                    from_blender = worker.query()
+                except WorkerError as e:
+                    print(f"Blender worker failed ({e}), using a one-shot Blender process")
+            if from_blender is None:
+                from_blender = _get_blend_settings_oneshot(blend_file)
+            settings = {key: from_blender[key] if value is None else value for key, value in (from_blender | settings).items()}
+
+    res_x, res_y, res_pct = settings["resolution_x"], settings["resolution_y"], settings["percentage"]
+
+    # Final effective resolution
+    final_x = int(res_x * res_pct / 100)
+    final_y = int(res_y * res_pct / 100)
+
+    return {
+        "resolution_x": res_x,
+        "resolution_y": res_y,
+        "percentage": res_pct,
+        "final_resolution": (final_x, final_y),
+        "samples": settings["samples"],
+        "time_limit": settings["time_limit"]
+    }
+
+
+def _get_blend_settings_oneshot(blend_file: str):
     cmd = [
-        "blender",
+        BLENDER_BIN,
         "-b", blend_file,
         "--python-expr",
         (
@@ -143,27 +214,18 @@ def get_blend_settings(blend_file: str):
             "print('TIME_LIMIT', bpy.context.scene.cycles.time_limit)"
         ),
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    out = result.stdout
+    with span("blender", purpose="settings") as attributes:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        out = process.stdout.read()
+        wait_child(process, attributes)
 
     # Regex parse values
-    res_x = int(re.search(r"RES_X (\d+)", out).group(1))
-    res_y = int(re.search(r"RES_Y (\d+)", out).group(1))
-    res_pct = int(re.search(r"RES_PCT (\d+)", out).group(1))
-    samples = int(re.search(r"SAMPLES (\d+)", out).group(1))
-    time_limit = int(re.search(r"TIME_LIMIT (\d+)", out).group(1))
-
-    # Final effective resolution
-    final_x = int(res_x * res_pct / 100)
-    final_y = int(res_y * res_pct / 100)
-
     return {
-        "resolution_x": res_x,
-        "resolution_y": res_y,
-        "percentage": res_pct,
-        "final_resolution": (final_x, final_y),
-        "samples": samples,
-        "time_limit": time_limit
+        "resolution_x": int(re.search(r"RES_X (\d+)", out).group(1)),
+        "resolution_y": int(re.search(r"RES_Y (\d+)", out).group(1)),
+        "percentage": int(re.search(r"RES_PCT (\d+)", out).group(1)),
+        "samples": int(re.search(r"SAMPLES (\d+)", out).group(1)),
+        "time_limit": int(re.search(r"TIME_LIMIT (\d+)", out).group(1))
     }
 
 
@@ -172,30 +234,233 @@ def get_blend_settings(blend_file: str):
 # Renders NUM_RUNS times and returns geometric mean of render times. The geometric mean is used because it fairly summarizes performance across tests of varying complexity, avoiding domination by outliers and reflecting relative speed differences.
 # The Open Data benchmark scenes (classroom, monster, junkshop) are static without animation, rendering multiple frames would give essentially the same result every time.
 # Even though the scenes are static, slight differences in file size occur due to random sampling, floating-point variations, and tile/thread ordering during rendering.
-def render_scene(scene_name, blend_file, output_dir, NUM_RUNS, cycles_device):
-    times = []
-    for i in range(NUM_RUNS):
-        start_time = time.time()
-        cmd = [
-            "blender",
-            "-b", blend_file,
-            "-o", os.path.join(output_dir, f"frame_#####"),
-            "-F", "PNG",
-            "-f", "1",
-            "--",
-            "--cycles-device", cycles_device
-        ]
-        print(f"\n[{scene_name}] Run {i+1}/{NUM_RUNS}...")
-        print("Executing: " + ' '.join(cmd))
+# NUM_RUNS is either a fixed number of runs or a run_stats.RunController, which discards warm-up runs, repeats until the confidence interval of the time per frame
+# is tight enough (or its time budget is spent) and rejects outliers; report['runs'] gets the run statistics (mean, geometric mean, stddev, CI, run count).
+# With the persistent Blender worker, each run reloads the .blend file and renders it in the already running process: the process startup is paid once,
+# and 'report' (if given) receives the mean scene load time and mean render time separately. Without a worker, each run is a one-shot 'blender -b' process.
+# 'env', if given, is the environment of the Blender process (e.g. CUDA_VISIBLE_DEVICES to render on one GPU of a multi-GPU node).
+# The GPU/CPU telemetry summary of all runs goes to report['telemetry'], the time series to report['telemetry_series'] if TELEMETRY_SERIES is set.
+# Blender's output is streamed and parsed as it arrives (render_log.py): report['phases'] gets the mean per-phase durations (kernels, sync, BVH, sampling, ...),
+# the time to first sample and the samples per minute of the sampling loop only.
+def render_scene(scene_name, blend_file, output_dir, NUM_RUNS, cycles_device, report=None, env=None):
+    controller = NUM_RUNS if isinstance(NUM_RUNS, RunController) else RunController.fixed(NUM_RUNS)
+    runs = [] # Measured runs, without warm-up runs
+    worker = get_worker(cycles_device, env=env)
+    sampler = render_sampler(cycles_device, env).start()
+    try:
+        while not controller.done():
+            warmup = controller.is_warmup()
+            label = "Warm-up run" if warmup else f"Run {len(controller.values) - controller.warmup + 1}/{controller.max_runs}"
+            print(f"\n[{scene_name}] {label}...")
+            run = _render_once(scene_name, blend_file, output_dir, cycles_device, env, worker)
+            if run["worker_failed"]:
+                worker = None
+            print(f"[{scene_name}] {label} completed in {run['elapsed']:.2f}s")
+            controller.add(run["elapsed"])
+            if not warmup:
+                runs.append(run)
+    finally:
+        sampler.stop()
 
-        # subprocess.run(cmd, check=True)
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # Return geometric mean of this scene’s runs
+    stats = controller.summary()
+    geom_mean = stats["geometric_mean"]
+    print(f"[{scene_name}] Geometric Mean Render Time: {geom_mean:.2f}s ({stats['runs']} runs, {stats['outliers']} outliers" +
+          (f", ±{100 * stats['relative_ci95']:.1f}%)" if "relative_ci95" in stats else ")"))
 
-        elapsed = time.time() - start_time
-        print(f"[{scene_name}] Run {i+1} completed in {elapsed:.2f}s")
-        times.append(elapsed)
+    if report is not None:
+        report["runs"] = stats
+        report["worker"] = all("load_time_s" in run for run in runs)
+        if report["worker"]:
+            report["load_time_s"] = sum(run["load_time_s"] for run in runs) / len(runs)
+            report["render_time_s"] = sum(run["render_time_s"] for run in runs) / len(runs)
+        if sampler.enabled:
+            report["telemetry"] = sampler.summary()
+            if TELEMETRY_SERIES:
+                report["telemetry_series"] = sampler.series()
+        report["phases"] = _mean_summary([run["phases"] for run in runs])
+    return geom_mean
 
-    # Return geometric mean of this scene’s runs
-    geom_mean = math.prod(times) ** (1/len(times))
-    print(f"[{scene_name}] Geometric Mean Render Time: {geom_mean:.2f}s")
-    return geom_mean
\ No newline at end of file
+
+# Compile the render kernels of a device with a tiny render (1% resolution, 1 sample) instead of a full benchmark run.
+# The scene is rendered twice: the first render compiles (or loads from the kernel cache) the kernels, the second one doesn't,
+# so the difference between both is the kernel compile time. Kernels are compiled for the features of the scene, so a benchmark scene is used.
+# The worker of the device is started on the way and reused by the following renders.
+def warm_up_kernels(blend_file, output_dir, cycles_device="CUDA", env=None):
+    overrides = { "resolution_percentage": 1, "samples": 1 }
+    worker = get_worker(cycles_device, env=env)
+    runs = []
+    for label in ("compile", "cached"):
+        print(f"\n[warm-up {cycles_device}] Tiny render ({label})...")
+        run = _render_once(f"warm-up {cycles_device}", blend_file, output_dir, cycles_device, env, worker, overrides)
+        if run["worker_failed"]:
+            worker = None
+        runs.append(run)
+
+    first, second = (run.get("render_time_s", run["elapsed"]) for run in runs) # Render only with the worker, the whole process otherwise
+    result = { "first_render_s": round(first, 3), "second_render_s": round(second, 3),
+               "kernel_compile_s": round(max(first - second, 0.0), 3) }
+    if "kernel_s" in runs[0]["phases"]: # 'Loading render kernels' as reported by Cycles
+        result["kernel_phase_s"] = runs[0]["phases"]["kernel_s"]
+    print(f"[warm-up {cycles_device}] Kernel compile time: {result['kernel_compile_s']:.2f}s")
+    return result
+
+
+# Render a scene once with a time limit on the render loop, e.g. for a quick throughput estimate (see prescreen.py).
+# Returns the phase breakdown of the render (render_log.py), including the samples per minute of the sampling loop, and the elapsed time.
+def render_time_boxed(scene_name, blend_file, output_dir, cycles_device, time_limit, env=None):
+    worker = get_worker(cycles_device, env=env)
+    print(f"\n[{scene_name}] Time-boxed render ({time_limit:.0f}s)...")
+    run = _render_once(scene_name, blend_file, output_dir, cycles_device, env, worker, { "time_limit": time_limit })
+    return run["phases"] | { "elapsed_s": round(run["elapsed"], 3) }
+
+
+# Render the frames 1 to 'frames' of a scene in a single Blender process ('-s 1 -e <frames> -a'), like production jobs rendering frame ranges.
+# With 'persistent_data', Cycles keeps the scene data (BVH, textures, shaders) between frames instead of synchronizing it again for every frame.
+# The completion time of every frame is taken from Blender's output as it is streamed ('Saved:' lines). Returns:
+#   first_frame_latency_s      from the start of Blender to the first saved frame, including the scene loading, kernels and BVH build
+#   steady_time_s_per_frame    the mean time between the following frames, and steady_frames_per_min
+#   amortized_time_s_per_frame the whole run divided by the number of frames
+def render_sequence(scene_name, blend_file, output_dir, cycles_device, frames, persistent_data=False, env=None):
+    overrides = { "use_persistent_data": True } if persistent_data else None
+    cmd = [
+        BLENDER_BIN,
+        "-b", blend_file
+    ] + (["--python-expr", _overrides_expr(overrides)] if overrides else []) + [
+        "-o", os.path.join(output_dir, f"frame_#####"),
+        "-F", "PNG",
+        "-s", "1",
+        "-e", str(frames),
+        "-a",
+        "--",
+        "--cycles-device", cycles_device
+    ]
+    print(f"\n[{scene_name}] Rendering {frames} frames" + (" with persistent data" if persistent_data else "") + "...")
+    print("Executing: " + ' '.join(cmd))
+
+    parser = CyclesLogParser()
+    with span("sequence", scene=scene_name, device=cycles_device, frames=frames, persistent_data=persistent_data) as attributes:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env)
+        for line in process.stdout:
+            parser.feed(line.rstrip("\n"))
+            if line.startswith("Saved:"):
+                print(f"[{scene_name}] Frame {len(parser.saved)}/{frames} saved at {parser.saved[-1][0] - parser.start_time:.2f}s")
+        if wait_child(process, attributes) != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+    parser.finish()
+    elapsed = time.perf_counter() - parser.start_time
+
+    result = parser.frame_summary() | { "persistent_data": persistent_data, "elapsed_s": round(elapsed, 3) }
+    if result["frames"] != frames:
+        raise RuntimeError(f"[{scene_name}] {result['frames']} of {frames} frames saved")
+    result["amortized_time_s_per_frame"] = elapsed / frames
+    print(f"[{scene_name}] First frame {result['first_frame_latency_s']:.2f}s, amortized {result['amortized_time_s_per_frame']:.2f}s per frame" +
+          (f", steady state {result['steady_frames_per_min']:.2f} frames/min" if "steady_frames_per_min" in result else ""))
+    return result
+
+
+# Render a scene with overrides, e.g. one point of a parameter sweep (sweep.py). The scene is loaded once by the worker and shared by
+# the following renders of the same file; the overrides are restored after each render. Returns the render time in seconds
+# (with a one-shot Blender process, the whole process).
+def render_with_overrides(scene_name, blend_file, output_dir, cycles_device, overrides, env=None):
+    worker = get_worker(cycles_device, env=env)
+    run = _render_once(scene_name, blend_file, output_dir, cycles_device, env, worker, overrides, reload=False)
+    return run.get("render_time_s", run["elapsed"])
+
+
+# Render a scene once in a one-shot Blender process with 'threads' render threads ('-t'), pinned to the CPUs 'cpus' (taskset),
+# e.g. one step of the CPU thread-scaling benchmark (cpu_scaling.py). Returns the phase breakdown of the render and the elapsed time.
+def render_pinned(scene_name, blend_file, output_dir, threads, cpus, overrides=None, env=None):
+    parser = CyclesLogParser()
+    elapsed = _render_scene_oneshot(blend_file, output_dir, "CPU", env, parser, overrides, threads=threads, cpus=cpus)
+    phases = parser.summary()
+    print(f"[{scene_name}] {threads} threads: {elapsed:.2f}s" +
+          (f", sampling {phases['samples_per_minute']:.2f} samples/min" if "samples_per_minute" in phases else ""))
+    return phases | { "elapsed_s": round(elapsed, 3) }
+
+
+# The version of the Blender binary, e.g. "4.5.0", or None
+def get_blender_version():
+    try:
+        result = subprocess.run([BLENDER_BIN, "--version"], capture_output=True, text=True, timeout=60)
+        match = re.search(r"Blender (\d+\.\d+\.\d+)", result.stdout)
+        return match.group(1) if match else None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+# Mean of the numeric values of several summaries
+def _mean_summary(summaries):
+    keys = [key for key in summaries[0] if all(isinstance(summary.get(key), (int, float)) for summary in summaries)]
+    return { key: sum(summary[key] for summary in summaries) / len(summaries) for key in keys }
+
+
+# Render a scene once, with the worker if given, otherwise (or if the worker fails) with a one-shot Blender process.
+# 'overrides', if given, temporarily changes scene settings for this render (see OVERRIDES in worker_script.py), e.g. resolution_percentage, samples.
+# Without 'reload', the worker renders the scene already loaded, if it is the same file.
+def _render_once(scene_name, blend_file, output_dir, cycles_device, env, worker, overrides=None, reload=True):
+    run = { "worker_failed": False }
+    with span("render", scene=scene_name, device=cycles_device, overrides=overrides) as attributes:
+        if worker is not None:
+            try:
+                start_time = time.time()
+                parser = CyclesLogParser() # Started before the load, like the one-shot process: the same phases either way
+                with track_process(worker.process.pid if worker.process else None, attributes):
+                    load = worker.load(blend_file, reload=reload)
+                    render = worker.render(os.path.join(output_dir, "frame_#####"), frame=1, on_line=parser.feed, **({"overrides": overrides} if overrides else {}))
+                parser.finish()
+                run["elapsed"] = time.time() - start_time
+                run["load_time_s"] = load["load_time_s"]
+                run["render_time_s"] = render["render_time_s"]
+                print(f"[{scene_name}] Load {load['load_time_s']:.2f}s, render {render['render_time_s']:.2f}s")
+            except WorkerError as e:
+                print(f"[{scene_name}] Blender worker failed ({e}), using a one-shot Blender process")
+                run["worker_failed"] = True
+        attributes["worker"] = "elapsed" in run
+        if "elapsed" not in run:
+            parser = CyclesLogParser()
+            run["elapsed"] = _render_scene_oneshot(blend_file, output_dir, cycles_device, env, parser, overrides)
+
+    run["phases"] = parser.summary()
+    if run["phases"].get("samples_per_minute"):
+        print(f"[{scene_name}] Time to first sample {run['phases']['time_to_first_sample_s']:.2f}s, sampling {run['phases']['samples_per_minute']:.2f} samples/min")
+    return run
+
+
+# Python expression applying render overrides in a one-shot Blender process, run before the frame is rendered
+def _overrides_expr(overrides):
+    owners = { "resolution_percentage": "render", "use_persistent_data": "render", "threads_mode": "render", "threads": "render",
+               "samples": "cycles", "time_limit": "cycles", "use_adaptive_sampling": "cycles", "use_denoising": "cycles",
+               "use_auto_tile": "cycles", "tile_size": "cycles" }
+    return "import bpy; s=bpy.context.scene; " + "; ".join(f"s.{owners[name]}.{name}={value!r}" for name, value in overrides.items())
+
+
+# Blender's output is fed line by line to 'parser' (a CyclesLogParser), if given.
+# 'threads', if given, sets the number of render threads ('-t', 0 for all CPUs); 'cpus' pins the process to these CPUs with 'taskset'
+# (util-linux), inherited by all threads of Blender: preexec_fn is not safe in this process, which runs several threads.
+def _render_scene_oneshot(blend_file, output_dir, cycles_device, env=None, parser=None, overrides=None, threads=None, cpus=None):
+    start_time = time.time()
+    cmd = (["taskset", "-c", ",".join(str(cpu) for cpu in sorted(cpus))] if cpus else []) + [
+        BLENDER_BIN,
+        "-b", blend_file
+    ] + (["--python-expr", _overrides_expr(overrides)] if overrides else []) + \
+        (["-t", str(threads)] if threads is not None else []) + [
+        "-o", os.path.join(output_dir, f"frame_#####"),
+        "-F", "PNG",
+        "-f", "1",
+        "--",
+        "--cycles-device", cycles_device
+    ]
+    print("Executing: " + ' '.join(cmd))
+
+    with span("blender", purpose="render", device=cycles_device, threads=threads) as attributes:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env)
+        for line in process.stdout:
+            if parser is not None:
+                parser.feed(line.rstrip("\n"))
+        if wait_child(process, attributes) != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+    if parser is not None:
+        parser.finish()
+
+    return time.time() - start_time
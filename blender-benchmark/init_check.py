@@ -2,10 +2,12 @@ import os
 import time
 import subprocess
 import sys
-import requests
 from pythonping import ping
 import speedtest
 from dotenv import load_dotenv
+from preflight import Probe, Preflight
+from reporting import create_session, post_json
+from tracing import tracer
 load_dotenv()
 
 
@@ -14,14 +16,27 @@ g_DLSPEED = int(os.getenv("DLSPEED", "50")) # Mbps
 g_ULSPEED = int(os.getenv("ULSPEED", "20")) # Mbps
 g_RTT     = int(os.getenv("RTT","499"))     # ms
 
+# Per-probe timeouts of the pre-flight checks, seconds
+g_NETWORK_TIMEOUT = int(os.getenv("NETWORK_TEST_TIMEOUT", "90"))
+g_PING_TIMEOUT    = int(os.getenv("PING_TEST_TIMEOUT", "30"))
+g_GPU_TIMEOUT     = int(os.getenv("GPU_QUERY_TIMEOUT", "15"))
+
+# Regions to measure the latency to: result key -> host
+PING_HOSTS = { "rtt_to_us_west1_ms": "ec2.us-west-1.amazonaws.com",
+               "rtt_to_us_east2_ms": "ec2.us-east-2.amazonaws.com",
+               "rtt_to_eu_cent1_ms": "ec2.eu-central-1.amazonaws.com" }
+
 
 # Test network bandwdith
-def network_test():
+# 'publish(metric, value)', if given, receives the download speed as soon as it is known, before the upload test.
+def network_test(publish=None):
     print("Test the network speed ....................", flush=True)
     try:
         speed_test = speedtest.Speedtest()
         bserver    = speed_test.get_best_server()
         dlspeed    = int(speed_test.download() / (1000 * 1000))  # Convert to Mbps, not Mib
+        if publish is not None:
+            publish("download_Mbps", dlspeed)
         ulspeed    = int(speed_test.upload() / (1000 * 1000))  # Convert to Mbps, not Mib
         latency    = bserver['latency'] # the RTT to the selected test server
         country    = bserver['country'] 
@@ -39,23 +54,21 @@ def ping_test(tCount=10):
     if tCount ==0:
         return g_RTT, g_RTT, g_RTT
     try:
-        print("To: ec2.us-west-1.amazonaws.com")
-        temp = ping('ec2.us-west-1.amazonaws.com', interval=1, count=tCount, verbose=True)
-        latency_uswest1 = temp.rtt_avg_ms # average of successful pings only     
-    
-        print("To: ec2.us-east-2.amazonaws.com")
-        temp = ping('ec2.us-east-2.amazonaws.com', interval=1, count=tCount, verbose=True)
-        latency_useast2 = temp.rtt_avg_ms # average of successful pings only     
-
-        print("To: ec2.eu-central-1.amazonaws.com")  
-        temp = ping('ec2.eu-central-1.amazonaws.com', interval=1, count=tCount,verbose=True)
-        latency_eucentral1 = temp.rtt_avg_ms # average of successful pings only.
+        latency_uswest1, latency_useast2, latency_eucentral1 = (ping_host(host, tCount) for host in PING_HOSTS.values())
     except Exception as e:  
         return g_RTT, g_RTT, g_RTT
     
     return latency_uswest1, latency_useast2, latency_eucentral1
 
 
+# Average RTT of successful pings to a host, ms
+# pythonping uses a distinct ICMP identifier per call, so several hosts can be pinged concurrently from different threads.
+def ping_host(host, tCount=10, verbose=True):
+    print(f"To: {host}")
+    temp = ping(host, interval=1, count=tCount, verbose=verbose)
+    return temp.rtt_avg_ms # average of successful pings only
+
+
 # Read the supported CUDA RT Version
 def Get_CUDA_Version():
     try:
@@ -69,17 +82,40 @@ def Get_CUDA_Version():
     return version 
 
 
-# Get the GPU info
-def Get_GPUs():
+# Read the NVIDIA driver version, e.g. "575.57.08"
+def Get_Driver_Version():
     try:
-        cmd = ('nvidia-smi --query-gpu=gpu_name,memory.total,memory.used,memory.free,'
+        cmd = 'nvidia-smi --query-gpu=driver_version --format=csv,noheader'
+        output = subprocess.check_output(cmd, shell=True, text=True)
+        return output.strip().split('\n')[0].strip()
+    except Exception as e:
+        return None
+
+
+# Read the CPU model, e.g. "AMD Ryzen 9 7950X 16-Core Processor"
+def Get_CPU_Model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except Exception as e:
+        pass
+    return None
+
+
+# Get the info of every GPU on the node (1 to 8, a few with 2), in nvidia-smi order
+def Get_GPU_List():
+    try:
+        cmd = ('nvidia-smi --query-gpu=index,uuid,gpu_name,memory.total,memory.used,memory.free,'
                'utilization.memory,temperature.gpu,utilization.gpu --format=csv,noheader,nounits')
         output = subprocess.check_output(cmd, shell=True, text=True)
-        lines = output.strip().split('\n')
-        for line in lines: # 1 and 8 ( few 2 )
-            gpu_name, vram_total, vram_used, vram_free, mem_util, temp, gpu_util = line.strip().split(', ')
-            result = {
-                'gpu_number': len(lines),
+        result = []
+        for line in output.strip().split('\n'):
+            index, uuid, gpu_name, vram_total, vram_used, vram_free, mem_util, temp, gpu_util = line.strip().split(', ')
+            result.append({
+                'gpu_index': int(index),
+                'gpu_uuid': uuid,
                 'gpu_type': gpu_name,
                 'vram_total': int(vram_total),
                 'vram_used': int(vram_used),
@@ -87,39 +123,87 @@ def Get_GPUs():
                 'vram_utilization': int(mem_util),
                 'gpu_temperature': int(temp),
                 'gpu_utilization': int(gpu_util)
-            }
-            break
+            })
         return result
     except Exception as e:
+        return []
+
+
+# Get the GPU info: the number of GPUs and the info of the first one
+def Get_GPUs():
+    gpus = Get_GPU_List()
+    if not gpus:
         return {}
+    result = { 'gpu_number': len(gpus) } | gpus[0]
+    del result['gpu_index'], result['gpu_uuid']
+    return result
 
 
-def Initial_Check():    
+# Pre-flight probes: bandwidth test, a ping per region and the GPU/CUDA queries, all run concurrently.
+# Failed or timed out network probes fall back to the default network performance for the node, like network_test() and ping_test().
+def Default_Probes(tCount=10):
+    def network_probe(publish):
+        result = network_test(publish)
+        publish("upload_Mbps", result[4])
+        return result
+
+    probes = [Probe("network", network_probe, timeout=g_NETWORK_TIMEOUT, default=("none", "none", g_RTT, g_DLSPEED, g_ULSPEED), gate=True)]
+    for key, host in PING_HOSTS.items():
+        probes.append(Probe(key, lambda publish, host=host: ping_host(host, tCount, verbose=False),
+                            timeout=g_PING_TIMEOUT, default=g_RTT, gate=True, metric=key))
+    probes.append(Probe("cuda_version", lambda publish: Get_CUDA_Version(), timeout=g_GPU_TIMEOUT, default=0))
+    probes.append(Probe("gpus", lambda publish: Get_GPUs(), timeout=g_GPU_TIMEOUT, default={}))
+    return probes
 
+
+# Thresholds of the pre-flight checks; the node fails as soon as one of them is missed.
+def Default_Checks():
+    return { "download_Mbps": lambda value: value >= g_DLSPEED,
+             "upload_Mbps":   lambda value: value >= g_ULSPEED } | \
+           { key: (lambda value: value <= g_RTT) for key in PING_HOSTS }
+
+
+# Start the pre-flight checks in the background, so that they can overlap with other work (e.g. the warm-up render).
+# Returns None if run locally (the checks are skipped).
+def Start_Initial_Check(probes=None, checks=None):
     if SALAD_MACHINE_ID == "LOCAL" or SALAD_MACHINE_ID == "local":       # Skip the initial checks if run locally    
+        return None
+    print("Start the pre-flight checks ....................", flush=True)
+    return Preflight(probes or Default_Probes(), Default_Checks() if checks is None else checks).start()
+
+
+# Wait for the pre-flight checks started by Start_Initial_Check() and return the environment info.
+def Finish_Initial_Check(preflight):
+
+    if preflight is None:
         environment= { "pass": str(True) }   
     else:
-        # Network test: bandwidth
-        country, location, latency, dlspeed, ulspeed = network_test() 
+        Pass = preflight.wait()
+        results = preflight.results
+
+        # Network test: bandwidth; the download speed is known even if the probe was abandoned after a missed threshold
+        country, location, latency, dlspeed, ulspeed = results["network"]
+        dlspeed = preflight.metrics.get("download_Mbps", dlspeed)
+        ulspeed = preflight.metrics.get("upload_Mbps", ulspeed)
         print(f"Networt: {country}, {location}, DL {dlspeed} Mbps, UL {ulspeed} Mbps")
     
         # Network test: latency to some locations; should reallocate if ping fails
-        latency_us_w, latency_us_e, latency_eu = ping_test(tCount = 10) 
+        latency_us_w, latency_us_e, latency_eu = (results[key] for key in PING_HOSTS)
         print(f"Latency: to US West {latency_us_w} ms, to US East {latency_us_e} ms, to EU Central {latency_eu} ms")
 
         if ulspeed < g_ULSPEED or dlspeed < g_DLSPEED or latency_us_w > g_RTT or latency_us_e > g_RTT or latency_eu > g_RTT:
             Pass = False
-        else:
-            Pass = True
 
         # CUDA Version
-        CUDA_version = Get_CUDA_Version()
+        CUDA_version = results["cuda_version"]
         print("CUDA Version:", CUDA_version)
 
         # GPU Info
-        GPUS = Get_GPUs()
+        GPUS = results["gpus"]
         print("GPU Info:", GPUS)
 
+        print(f"Pre-flight checks: {preflight.elapsed:.2f}s, {preflight.status}" + (f", failed: {preflight.failed_checks}" if preflight.failed_checks else ""))
+
         environment = { "salad_machine_id":   SALAD_MACHINE_ID,
                         "pass":               str(Pass),
                         "country":            country,
@@ -131,11 +215,16 @@ def Initial_Check():
                         "rtt_to_us_east2_ms": str(latency_us_e),
                         "rtt_to_eu_cent1_ms": str(latency_eu),
                         "cuda_version":       CUDA_version,
+                        "preflight_s":        "{:.3f}".format(preflight.elapsed),
                         } | GPUS
 
     return environment
 
 
+def Initial_Check():    
+    return Finish_Initial_Check(Start_Initial_Check())
+
+
 # Trigger node reallocation if a node is not suitable
 # https://docs.salad.com/products/sce/container-groups/imds/imds-reallocate
 def Reallocate(reason):
@@ -143,6 +232,9 @@ def Reallocate(reason):
     
     print(reason)
 
+    tracer.phase(None) # The trace of the run, completed or not
+    tracer.export()
+
     if (local_run):  # Run locally
         print("Call the exitl to restart ......", flush=True) 
         os.execl(sys.executable, sys.executable, *sys.argv)
@@ -152,6 +244,9 @@ def Reallocate(reason):
         headers = {'Content-Type': 'application/json',
                    'Metadata': 'true'}
         body = {"Reason": reason}
-        _ = requests.post(url, headers=headers, json=body)
+        try: # Bounded: a hung IMDS must not stall the node
+            post_json(create_session(), url, body, headers, timeout=10, retries=3)
+        except Exception as e:
+            print(f"IMDS reallocate failed: {e}")
         time.sleep(10)
 
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+
+
+USE_JOURNAL = os.getenv("JOURNAL", "1") == "1"                             # Resume completed phases after a restart
+JOURNAL_FILE = os.getenv("JOURNAL_FILE", "benchmark_journal.jsonl")        # Completed phases, one JSON line per phase
+JOURNAL_MAX_AGE_S = float(os.getenv("JOURNAL_MAX_AGE_S", "86400"))         # seconds, older phases are run again
+
+
+# Record completed benchmark phases, so that a restart (Reallocate() restarts benchmark.py with os.execl in local mode) resumes at
+# the first incomplete phase instead of starting over.
+#
+# Every completed phase is appended to the journal with its results and the parts of the node fingerprint it depends on.
+# A phase is resumed only if it was recorded on the same machine, is not older than JOURNAL_MAX_AGE_S, and the fingerprint fields of its
+# rule (PHASE_RULES) are unchanged; e.g. a new driver reruns the GPU phases but not the CPU benchmark. 'depends', if given, adds values
+# that must match as well, e.g. the size and modification time of a scene file. The journal is cleared once the benchmark completed, and
+# when the node is rejected (pre-screen, frame validation): a restart must measure again, not reject on the same journaled results.
+# The pre-screen, which only gates the node, is never journaled.
+#   journal = Journal(machine_id, fingerprint)
+#   result = journal.get("standard_cpu")
+#   if result is None:
+#       result = run the phase ...
+#       journal.record("standard_cpu", result)
+
+# Fingerprint fields each phase depends on; "scene:<name>" phases use the "scene" rule, "sweep:<name>" the "sweep" rule, and so on
+PHASE_RULES = {
+    "warmup":        ["blender_version", "driver_version", "gpu_types"],
+    "standard_cpu":  ["cpu_model"],
+    "standard_cuda": ["driver_version", "gpus", "multi_gpu"],
+    "scene":         ["blender_version", "driver_version", "gpus", "cpu_model", "device", "multi_gpu"],
+    "sweep":         ["blender_version", "driver_version", "gpus", "cpu_model", "device"],
+    "cpu_scaling":   ["blender_version", "cpu_model"],
+    "devices":       ["blender_version", "driver_version", "gpus", "cpu_model"],
+}
+
+
+class Journal:
+
+    def __init__(self, machine_id, fingerprint, path=JOURNAL_FILE, enabled=USE_JOURNAL):
+        self.machine_id = machine_id
+        self.fingerprint = fingerprint
+        self.path = path
+        self.enabled = enabled
+        self.resumed = [] # Phases resumed from the journal
+        self._entries = self._load() if enabled else {}
+
+    def _load(self):
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError: # A line cut short by a crash
+                    continue
+                entries[entry["phase"]] = entry # The latest record of a phase wins
+        return entries
+
+    def _key(self, phase, depends=None):
+        rule = PHASE_RULES.get(phase.split(":")[0], list(self.fingerprint))
+        return { field: self.fingerprint.get(field) for field in rule } | { "depends": depends }
+
+    # The result of a completed phase, or None if it has to be run (again)
+    def get(self, phase, depends=None):
+        entry = self._entries.get(phase)
+        if entry is None:
+            return None
+        if entry["machine_id"] != self.machine_id:
+            reason = "another machine"
+        elif time.time() - entry["time"] > JOURNAL_MAX_AGE_S:
+            reason = "too old"
+        elif entry["key"] != self._key(phase, depends):
+            changed = [field for field, value in self._key(phase, depends).items() if entry["key"].get(field) != value]
+            reason = f"changed {', '.join(changed)}"
+        else:
+            print(f"Resuming '{phase}' from the journal")
+            self.resumed.append(phase)
+            return entry["result"]
+        print(f"Journal entry of '{phase}' invalid ({reason}), running it again")
+        return None
+
+    def record(self, phase, result, depends=None):
+        if not self.enabled:
+            return
+        entry = { "phase": phase, "machine_id": self.machine_id, "time": time.time(), "key": self._key(phase, depends), "result": result }
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._entries[phase] = entry
+
+    # Start over next time, e.g. once the benchmark completed
+    def clear(self):
+        self._entries = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# The keys of 'after' that are new or changed compared to 'before', e.g. the results a phase added to g_Result
+def result_delta(before, after):
+    return { key: value for key, value in after.items() if key not in before or before[key] != value }
+
+
+# Contents of result files, to be saved with a phase and written back when it is resumed
+def read_files(paths):
+    files = {}
+    for path in paths:
+        with open(path) as f:
+            files[path] = f.read()
+    return files
+
+
+def write_files(files):
+    for path, content in files.items():
+        with open(path, "w") as f:
+            f.write(content)
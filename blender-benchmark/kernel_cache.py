@@ -0,0 +1,68 @@
+import os
+import re
+import json
+import time
+
+
+KERNEL_CACHE_DIR = os.getenv("KERNEL_CACHE_DIR", os.path.expanduser("~/.cache/blender-benchmark-kernels")) # Persistent kernel caches, one folder per cache key
+KERNEL_CACHE_SIZE = os.getenv("KERNEL_CACHE_SIZE", "4294967296")   # bytes, CUDA_CACHE_MAXSIZE (the CUDA default of 256 MB is too small for Cycles)
+FORCE_WARMUP = os.getenv("FORCE_WARMUP", "0") == "1"               # Warm up even if the kernel cache is valid
+
+MARKER_FILE = "warmup.json"
+
+
+# Persist the compiled render kernels between runs, so that the warm-up (kernel compilation) is paid once per machine configuration.
+#
+# Cycles kernels are compiled or JIT-compiled by the driver (PTX to the GPU architecture) for CUDA, and by OptiX for OPTIX; both drivers keep
+# a disk cache whose location is set with CUDA_CACHE_PATH and OPTIX_CACHE_PATH. The cache is only valid for the same Blender version (kernels),
+# driver version (compiler) and GPU model (architecture), so these make up the cache key and each key gets its own folder:
+#   ~/.cache/blender-benchmark-kernels/blender-4.5.0_driver-575.57.08_NVIDIA-GeForce-RTX-4090/{cuda,optix,warmup.json}
+# 'warmup.json' is written after a successful warm-up of a device; a later run with the same key finds it and skips the warm-up.
+#   cache = KernelCache(blender_version, driver_version, gpu_type)
+#   os.environ.update(cache.env())   # Before any Blender process is started
+#   if not cache.valid("CUDA"):
+#       warm up ...
+#       cache.mark("CUDA", warm-up result)
+
+
+def cache_key(blender_version, driver_version, gpu_type):
+    key = f"blender-{blender_version or 'unknown'}_driver-{driver_version or 'none'}_{gpu_type or 'cpu'}"
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", key)
+
+
+class KernelCache:
+
+    def __init__(self, blender_version, driver_version, gpu_type, base_dir=None):
+        self.key = cache_key(blender_version, driver_version, gpu_type)
+        self.path = os.path.join(base_dir or KERNEL_CACHE_DIR, self.key)
+        self.marker_file = os.path.join(self.path, MARKER_FILE)
+
+    # Environment variables pointing the CUDA/OptiX kernel caches to the folder of this key
+    def env(self):
+        cuda_path, optix_path = os.path.join(self.path, "cuda"), os.path.join(self.path, "optix")
+        os.makedirs(cuda_path, exist_ok=True)
+        os.makedirs(optix_path, exist_ok=True)
+        return { "CUDA_CACHE_PATH": cuda_path, "CUDA_CACHE_MAXSIZE": KERNEL_CACHE_SIZE, "CUDA_CACHE_DISABLE": "0", "OPTIX_CACHE_PATH": optix_path }
+
+    def _read_marker(self):
+        try:
+            with open(self.marker_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    # The warm-up results of the devices already warmed up with this key
+    def devices(self):
+        return self._read_marker().get("devices", {})
+
+    def valid(self, cycles_device):
+        return not FORCE_WARMUP and cycles_device in self.devices()
+
+    def mark(self, cycles_device, result):
+        marker = self._read_marker()
+        marker["key"] = self.key
+        marker.setdefault("devices", {})[cycles_device] = result | { "timestamp": time.time() }
+        temp_file = self.marker_file + ".tmp"
+        with open(temp_file, "w") as f:
+            json.dump(marker, f, indent=4)
+        os.replace(temp_file, self.marker_file)
@@ -0,0 +1,98 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from tracing import span
+
+
+PIPELINE = os.getenv("PIPELINE", "1") == "1"                     # Prepare the next scene while the current one renders; "0" for the serial path
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "2"))       # Threads running the preparation tasks
+
+
+# A small DAG scheduler to overlap the CPU-side preparation of the next scene (settings extraction, output directory cleanup,
+# asset staging and page-cache pre-warming of the .blend file and its textures, see staging.py) with the render of the current scene,
+# outside the timed region.
+#
+# Tasks run on a thread pool once their dependencies are done; dependencies must be added before the tasks depending on them.
+# Work done by the caller itself (e.g. the renders, on the main thread) is timed with span(), so that the summary compares
+# the serial path (the sum of all task and span durations) with the actual wall-clock time from the first start to the last end:
+#   pipeline = Pipeline()
+#   pipeline.add("stage:monster", lambda: stage_scene(scene))
+#   pipeline.add("settings:monster", lambda: get_blend_settings(blend_file), depends=["stage:monster"])
+#   settings = pipeline.result("settings:monster")
+#   with pipeline.span("render:monster"):
+#       render ...
+#   pipeline.summary()   # -> {"serial_s": ..., "wall_s": ..., "saved_s": ...}
+# Disabled, a task runs in the caller when its result is asked for: the serial path, with the same timings.
+
+class Pipeline:
+
+    def __init__(self, workers=PIPELINE_WORKERS, enabled=PIPELINE):
+        self.enabled = enabled
+        self.executor = ThreadPoolExecutor(max_workers=max(workers, 1)) if enabled else None
+        self.tasks = {}   # name -> Future, or (fn, depends) when disabled
+        self.times = {}   # name -> (start, end), perf_counter
+        self._lock = threading.Lock()
+
+    def _timed(self, name, fn):
+        start_time = time.perf_counter()
+        try:
+            with span(name.split(":")[0], task=name): # e.g. "stage", task="stage:monster"
+                return fn()
+        finally:
+            with self._lock:
+                self.times[name] = (start_time, time.perf_counter())
+
+    def add(self, name, fn, depends=()):
+        missing = [depend for depend in depends if depend not in self.tasks]
+        if missing:
+            raise KeyError(f"Pipeline task '{name}' depends on unknown tasks: {missing}")
+        if not self.enabled:
+            self.tasks[name] = (fn, list(depends))
+            return name
+        futures = [self.tasks[depend] for depend in depends]
+        def run():
+            for future in futures: # Queued before this task, so never blocked behind it
+                future.result()
+            return self._timed(name, fn)
+        self.tasks[name] = self.executor.submit(run)
+        return name
+
+    # Wait for a task and return its result; raises the exception of the task, or of a failed dependency
+    def result(self, name):
+        task = self.tasks[name]
+        if self.enabled:
+            return task.result()
+        if isinstance(task, tuple): # Serial path: run the dependencies, then the task
+            fn, depends = task
+            for depend in depends:
+                self.result(depend)
+            self.tasks[name] = { "result": self._timed(name, fn) }
+        return self.tasks[name]["result"]
+
+    # Time work done by the caller as part of the pipeline, e.g. a render
+    @contextmanager
+    def span(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.times[name] = (start_time, time.perf_counter())
+
+    # Wall-clock time saved compared to running every task and span one after the other
+    def summary(self):
+        with self._lock:
+            times = dict(self.times)
+        if not times:
+            return { "enabled": self.enabled, "tasks": 0, "serial_s": 0.0, "wall_s": 0.0, "saved_s": 0.0 }
+        serial = sum(end - start for start, end in times.values())
+        wall = max(end for _, end in times.values()) - min(start for start, _ in times.values())
+        return { "enabled": self.enabled, "tasks": len(times), "serial_s": round(serial, 3), "wall_s": round(wall, 3),
+                 "saved_s": round(serial - wall, 3), "durations_s": { name: round(end - start, 3) for name, (start, end) in times.items() } }
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
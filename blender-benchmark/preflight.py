@@ -0,0 +1,125 @@
+import time
+import queue
+import threading
+from tracing import span
+
+
+# A small engine to run pre-flight probes (network bandwidth, pings, GPU queries) concurrently.
+#
+# Each probe runs in its own daemon thread with its own timeout, so a hung probe can neither delay the others nor keep the process alive.
+# Probes publish metrics as soon as they are known (e.g. the download speed before the upload test finishes), and every published metric
+# is compared against its threshold. Once any threshold is missed, the node can't pass anymore: probes marked as 'gate' (those only needed
+# to decide pass/fail, like the network tests) are abandoned, and only the remaining informational probes (GPU/CUDA) are waited for.
+#
+# A probe is a plain function taking a 'publish(metric, value)' callback and returning its result, so tests can use local stand-ins.
+
+
+class Probe:
+
+    def __init__(self, name, fn, timeout=60, default=None, gate=False, metric=None):
+        self.name = name
+        self.fn = fn
+        self.metric = metric     # If set, the result of the probe is published as this metric
+        self.timeout = timeout   # seconds, from the start of the probe
+        self.default = default   # The result used if the probe fails, times out or is abandoned
+        self.gate = gate         # Only needed for pass/fail; abandoned once a threshold is missed
+
+
+class Preflight:
+
+    # 'checks': {metric: predicate}; a metric passes if predicate(value) is True
+    def __init__(self, probes, checks=None):
+        self.probes = probes
+        self.checks = checks or {}
+        self.metrics = {}
+        self.failed_checks = []
+        self.results = {}
+        self.status = {}        # probe name -> "ok", "error", "timeout" or "skipped"
+        self.durations = {}     # probe name -> seconds
+        self._events = queue.Queue()
+        self._failed = threading.Event() # Set by the probe threads as soon as a threshold is missed
+        self._start = None
+        self._done = False
+
+    def start(self):
+        self._start = time.perf_counter()
+        for probe in self.probes:
+            threading.Thread(target=self._run_probe, args=(probe,), daemon=True).start()
+        return self
+
+    def _run_probe(self, probe):
+        def publish(metric, value):
+            self._flag(metric, value)
+            self._events.put(("metric", probe.name, (metric, value)))
+        try:
+            with span(f"probe:{probe.name}", timeout=probe.timeout):
+                result = probe.fn(publish)
+            if probe.metric is not None:
+                self._flag(probe.metric, result)
+            self._events.put(("done", probe.name, result))
+        except Exception as e:
+            self._events.put(("error", probe.name, e))
+
+    def _flag(self, metric, value):
+        predicate = self.checks.get(metric)
+        if predicate is not None and not predicate(value):
+            self._failed.set()
+
+    # True once a published metric missed its threshold: the node can't pass anymore. Doesn't wait for the probes, unlike wait().
+    def failed(self):
+        return self._failed.is_set() or bool(self.failed_checks)
+
+    def _check(self, metric, value):
+        self.metrics[metric] = value
+        predicate = self.checks.get(metric)
+        if predicate is not None and not predicate(value):
+            self.failed_checks.append(metric)
+
+    # Wait for the probes and return True if all thresholds are met.
+    # Results are in 'results' (the probe default for failed, timed out or abandoned probes), published metrics in 'metrics'.
+    def wait(self):
+        if self._done:
+            return not self.failed_checks
+        if self._start is None:
+            self.start()
+
+        deadlines = {probe.name: self._start + probe.timeout for probe in self.probes}
+        pending = {probe.name: probe for probe in self.probes}
+        while pending:
+            if self.failed_checks:
+                for name in [name for name, probe in pending.items() if probe.gate]:
+                    self.status[name] = "skipped"
+                    del pending[name]
+                if not pending:
+                    break
+
+            timeout = min(deadlines[name] for name in pending) - time.perf_counter()
+            try:
+                kind, name, value = self._events.get(timeout=max(timeout, 0))
+            except queue.Empty:
+                now = time.perf_counter()
+                for name in [name for name in pending if deadlines[name] <= now]:
+                    print(f"Pre-flight probe '{name}' timed out")
+                    self.status[name] = "timeout"
+                    del pending[name]
+                continue
+
+            if kind == "metric":
+                self._check(*value)
+            elif name in pending:
+                self.durations[name] = time.perf_counter() - self._start
+                if kind == "done":
+                    self.status[name] = "ok"
+                    self.results[name] = value
+                    if pending[name].metric is not None:
+                        self._check(pending[name].metric, value)
+                else:
+                    print(f"Pre-flight probe '{name}' failed: {value}")
+                    self.status[name] = "error"
+                del pending[name]
+
+        for probe in self.probes:
+            self.results.setdefault(probe.name, probe.default)
+        self.elapsed = time.perf_counter() - self._start
+        self._done = True
+        return not self.failed_checks
@@ -0,0 +1,71 @@
+import os
+import glob
+import json
+import fnmatch
+
+
+PRESCREEN = os.getenv("PRESCREEN", "1") == "1"                                       # Pre-screen the node before the full benchmark
+PRESCREEN_SCENE = os.getenv("PRESCREEN_SCENE", "monster")                            # The scene rendered to predict the score
+PRESCREEN_TIME_LIMIT = float(os.getenv("PRESCREEN_TIME_LIMIT", "10"))                # seconds, time limit of the pre-screen render
+MIN_PREDICTED_SCORE = float(os.getenv("MIN_PREDICTED_SCORE", "0"))                   # Reallocate if the predicted OpenData score is lower; 0 skips the pre-screen render
+PRESCREEN_CALIBRATION = os.getenv("PRESCREEN_CALIBRATION", "calibration/*.json")      # 'benchmark-launcher-cli' results of known GPUs to learn the prediction from
+
+
+# Predict the Blender OpenData Score of a node from a short, time-boxed render of one scene, to reject weak nodes in seconds instead of
+# after the full benchmark.
+#
+# The OpenData Score is the sum of the samples per minute of monster, junkshop and classroom; across GPUs, it is close to proportional to
+# the samples per minute of any one of them. The ratio is learned from past results files of 'benchmark-launcher-cli' (one point per file
+# with all scenes: x = samples/min of PRESCREEN_SCENE, y = the score) by least squares through the origin: ratio = Σxy / Σx².
+# The pre-screen render measures the samples per minute of the sampling loop only (render_log.py), comparable to 'stats.samples_per_minute'.
+# The calibration set is shipped in the image (calibration/, one results file per GPU model); add the results of more GPUs there to
+# improve the fit. The results files written by the node itself (RUN_OUTPUT) are never used: they would calibrate it against itself.
+
+RUN_OUTPUT = "benchmark_results_*.json" # Results files of this node, e.g. benchmark_results_cuda.json, benchmark_results_cuda_gpu1.json
+
+
+# (samples/min of 'scene', score) of every results file of 'device_type' that has all the scenes
+def load_calibration_points(pattern=PRESCREEN_CALIBRATION, scene=PRESCREEN_SCENE, device_type="CUDA"):
+    points = []
+    for path in sorted(glob.glob(pattern)):
+        if fnmatch.fnmatch(os.path.basename(path), RUN_OUTPUT):
+            continue
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if any(item["device_info"]["device_type"] != device_type for item in data):
+                continue
+            by_scene = { item["scene"]["label"]: item["stats"]["samples_per_minute"] for item in data }
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Calibration file skipped: {path}: {e}")
+            continue
+        if scene in by_scene and len(by_scene) == 3:
+            points.append((by_scene[scene], sum(by_scene.values())))
+    return points
+
+
+# The score-to-scene ratio, or None without calibration points
+def fit_calibration(points):
+    sum_xx = sum(x * x for x, _ in points)
+    if sum_xx == 0:
+        return None
+    return sum(x * y for x, y in points) / sum_xx
+
+
+# Decide whether the node qualifies: 'network_pass' is the result of the pre-flight checks ("True"/"False"),
+# 'samples_per_minute' the throughput of the pre-screen render (None if it couldn't be measured).
+# Returns the pre-screen report; 'rejected' is the reason if the node should be reallocated, otherwise None.
+def evaluate(network_pass, samples_per_minute, points, min_score=MIN_PREDICTED_SCORE):
+    ratio = fit_calibration(points)
+    result = { "samples_per_minute": samples_per_minute,
+               "calibration_points": len(points),
+               "calibration_ratio": ratio,
+               "predicted_score": samples_per_minute * ratio if samples_per_minute and ratio else None,
+               "min_predicted_score": min_score,
+               "rejected": None }
+
+    if network_pass == "False":
+        result["rejected"] = "Pre-screen: the network checks failed"
+    elif min_score > 0 and result["predicted_score"] is not None and result["predicted_score"] < min_score:
+        result["rejected"] = f"Pre-screen: predicted score {result['predicted_score']:.2f} is below {min_score:.2f}"
+    return result
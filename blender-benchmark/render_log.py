@@ -0,0 +1,167 @@
+import re
+import sys
+import time
+
+
+# Parse Blender/Cycles render output incrementally, line by line as it is printed, to split a render into phases.
+#
+# Example lines of 'blender -b main.blend -f 1' (Cycles):
+#   Read blend: "/root/.cache/blender-benchmark-launcher/scenes/.../monster/main.blend"
+#   Fra:1 Mem:180.16M (Peak 180.16M) | Time:00:00.43 | Mem:0.00M, Peak:0.00M | Scene, ViewLayer | Synchronizing object | Cube
+#   Fra:1 Mem:512.02M (Peak 530.76M) | Time:00:01.87 | Mem:85.13M, Peak:85.13M | Scene, ViewLayer | Updating Scene BVH | Building BVH
+#   Fra:1 Mem:512.02M (Peak 530.76M) | Time:00:02.04 | Mem:85.13M, Peak:85.13M | Scene, ViewLayer | Loading render kernels (may take a few minutes the first time)
+#   Fra:1 Mem:640.55M (Peak 640.55M) | Time:00:05.12 | Remaining:00:30.10 | Mem:954.84M, Peak:954.84M | Scene, ViewLayer | Sample 1/256
+#   Fra:1 Mem:640.55M (Peak 640.55M) | Time:00:35.88 | Mem:954.84M, Peak:954.84M | Scene, ViewLayer | Sample 256/256
+#   Fra:1 Mem:640.55M (Peak 640.55M) | Time:00:36.02 | Mem:954.84M, Peak:954.84M | Scene, ViewLayer | Finished
+#   Saved: 'output/monster/frame_00001.png'
+#    Time: 00:36.85 (Saving: 00:00.14)
+#
+# Phases: "load" (until the first render line), "kernel" (kernel loading/compilation), "sync" (scene/object/shader/image updates),
+# "bvh" (BVH build), "sampling" (the render loop), "denoise", "save" (from the end of the render to 'Saved:').
+# Every line is timestamped on arrival; Blender's own 'Time:' stamps are preferred for the sampling throughput when present, and its
+# '(Saving: ...)' time for the save phase ('Saved:' lines carry no time stamp, so a recorded log can't time the save otherwise).
+# When a frame range is rendered ('-s 1 -e 10 -a'), the phases add up over the frames and each 'Saved:' line marks the completion of a frame.
+# The throughput is measured over the sampling loop only, comparable to 'stats.samples_per_minute' of benchmark-launcher-cli.
+
+PHASE_PATTERNS = [
+    ("kernel",   re.compile(r"kernel", re.IGNORECASE)),
+    ("bvh",      re.compile(r"BVH")),
+    ("sampling", re.compile(r"\| (?:Rendered \d+/\d+ Tiles, )?Sample (\d+)/(\d+)")),
+    ("denoise",  re.compile(r"\| Denoising")),
+    ("finished", re.compile(r"\| Finished")),
+    ("sync",     re.compile(r"Synchronizing|Updating|Initializing|Loading|Waiting for render")),
+]
+RENDER_LINE = re.compile(r"^Fra:(\d+)\b")
+BLENDER_TIME = re.compile(r"\| Time:(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)")
+SAVED = re.compile(r"^Saved: '(.*)'")
+SAVING_TIME = re.compile(r"^\s*Time: \S+ \(Saving: (?:(\d+):)?(\d+):(\d+(?:\.\d+)?)\)")
+
+
+def _blender_seconds(match):
+    hours, minutes, seconds = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+class CyclesLogParser:
+
+    def __init__(self, start_time=None):
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.phases = {}              # phase -> seconds
+        self.phase = "load"
+        self.phase_start = self.start_time
+        self.last_time = self.start_time
+        self.first_sample = None      # (host time, blender time, sample)
+        self.last_sample = None
+        self.total_samples = None
+        self.saved = []               # (host time, path)
+        self.saving_time = None       # seconds, Blender's own '(Saving: ...)' times, added up over the frames
+        self.lines = 0
+
+    def _enter(self, phase, now):
+        if phase != self.phase:
+            self.phases[self.phase] = self.phases.get(self.phase, 0.0) + now - self.phase_start
+            self.phase, self.phase_start = phase, now
+
+    # Feed one line of output; 'now' is its arrival time (time.perf_counter()), by default the current time.
+    def feed(self, line, now=None):
+        now = time.perf_counter() if now is None else now
+        self.last_time = now
+        self.lines += 1
+
+        saved = SAVED.match(line)
+        if saved:
+            self.saved.append((now, saved.group(1)))
+            self._enter("done", now)
+            return
+        saving = SAVING_TIME.match(line)
+        if saving:
+            self.saving_time = (self.saving_time or 0.0) + _blender_seconds(saving)
+            return
+        if not RENDER_LINE.match(line):
+            return
+
+        blender_time = BLENDER_TIME.search(line)
+        blender_time = _blender_seconds(blender_time) if blender_time else None
+        for phase, pattern in PHASE_PATTERNS:
+            match = pattern.search(line)
+            if not match:
+                continue
+            if phase == "sampling":
+                sample = (now, blender_time, int(match.group(1)))
+                if self.first_sample is None:
+                    self.first_sample = sample
+                self.last_sample = sample
+                self.total_samples = int(match.group(2))
+            self._enter("save" if phase == "finished" else phase, now)
+            return
+
+    # Per-frame completion times of a frame range, from the 'Saved:' lines: the first frame includes the scene loading and preparation,
+    # the following ones are the steady state (with persistent data, the scene is not synchronized again between frames).
+    def frame_summary(self):
+        times = [saved_time - self.start_time for saved_time, _ in self.saved]
+        result = { "frames": len(times), "frame_completion_s": [round(t, 3) for t in times] }
+        if times:
+            result["first_frame_latency_s"] = round(times[0], 3)
+        if len(times) > 1 and times[-1] > times[0]:
+            result["steady_time_s_per_frame"] = (times[-1] - times[0]) / (len(times) - 1)
+            result["steady_frames_per_min"] = 60 / result["steady_time_s_per_frame"]
+        return result
+
+    # Close the current phase, e.g. when the process exits.
+    def finish(self, now=None):
+        self._enter("done", time.perf_counter() if now is None else now)
+
+    # Samples per minute over the sampling loop only (between the first and the last 'Sample N/M' lines)
+    def samples_per_minute(self):
+        if self.first_sample is None or self.last_sample is self.first_sample:
+            return None
+        samples = self.last_sample[2] - self.first_sample[2]
+        if self.first_sample[1] is not None and self.last_sample[1] is not None:
+            duration = self.last_sample[1] - self.first_sample[1]
+        else:
+            duration = self.last_sample[0] - self.first_sample[0]
+        return samples * 60 / duration if duration > 0 and samples > 0 else None
+
+    def summary(self):
+        result = { f"{phase}_s": round(seconds, 3) for phase, seconds in self.phases.items() if phase != "done" }
+        if self.saving_time is not None:
+            result["save_s"] = round(self.saving_time, 3)
+        if self.first_sample is not None:
+            result["time_to_first_sample_s"] = round(self.first_sample[0] - self.start_time, 3)
+            result["samples_rendered"] = self.last_sample[2]
+            result["samples_total"] = self.total_samples
+        samples_per_minute = self.samples_per_minute()
+        if samples_per_minute is not None:
+            result["samples_per_minute"] = samples_per_minute
+        if self.saved:
+            result["time_to_saved_s"] = round(self.saved[-1][0] - self.start_time, 3)
+        return result
+
+
+# Parse a recorded log, e.g. a test fixture. 'lines' are strings or (arrival time, line) tuples;
+# without arrival times, Blender's 'Time:' stamps are used as arrival times.
+def parse_log(lines):
+    parser = None
+    last_time = 0.0
+    for item in lines:
+        if isinstance(item, tuple):
+            now, line = item
+        else:
+            line = item.rstrip("\n")
+            match = BLENDER_TIME.search(line)
+            now = _blender_seconds(match) if match else last_time
+        if parser is None:
+            parser = CyclesLogParser(start_time=now if isinstance(item, tuple) else 0.0)
+        parser.feed(line, now)
+        last_time = now
+    if parser is None:
+        parser = CyclesLogParser(start_time=0.0)
+    parser.finish(last_time)
+    return parser
+
+
+# Check the parser against recorded logs, e.g. the fixtures: python3 render_log.py fixtures/*.log
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        with open(path) as f:
+            print(path, parse_log(f).summary())
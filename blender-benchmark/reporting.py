@@ -0,0 +1,185 @@
+import os
+import gzip
+import json
+import time
+import uuid
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from tracing import span
+
+
+REPORT_SPOOL_FILE = os.getenv("REPORT_SPOOL_FILE", "report_spool.jsonl") # Reports not delivered yet; kept across restarts (os.execl)
+REPORT_TIMEOUT = float(os.getenv("REPORT_TIMEOUT", "10"))                # seconds, per request
+REPORT_RETRIES = int(os.getenv("REPORT_RETRIES", "5"))                   # Attempts per request
+REPORT_BACKOFF = float(os.getenv("REPORT_BACKOFF", "1"))                 # seconds, doubled after each failed attempt
+REPORT_FLUSH_INTERVAL = float(os.getenv("REPORT_FLUSH_INTERVAL", "30"))  # seconds, between background flushes of the spool
+REPORT_GZIP = os.getenv("REPORT_GZIP", "0") == "1"                       # gzip the request bodies (Content-Encoding: gzip)
+REPORT_BATCH = int(os.getenv("REPORT_BATCH", "1"))                       # Reports per request to the same URL; > 1 sends JSON arrays
+
+
+# Deliver results to the Job Reporting System without losing them.
+#
+# Every report is first appended to an on-disk spool (one JSON line per report), then sent with a pooled HTTP session, timeouts and
+# exponential-backoff retries. Delivered reports are removed from the spool; the others stay there and are retried by a background thread,
+# or by the next process after a restart (Reallocate() restarts benchmark.py with os.execl in local mode).
+#   reporter = Reporter(headers).start()
+#   reporter.post(url, payload)     # blocks until delivered or all attempts failed, returns True if delivered
+#   reporter.submit(url, payload)   # returns at once, delivered in the background
+
+
+# Errors worth retrying: connection errors, timeouts, throttling and server errors
+class RetryableError(requests.RequestException):
+    pass
+
+
+def create_session(pool_size=4):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# POST a JSON payload with timeouts and exponential-backoff retries. Raises the last error if all attempts failed.
+def post_json(session, url, payload, headers=None, timeout=REPORT_TIMEOUT, retries=REPORT_RETRIES, backoff=REPORT_BACKOFF, compress=False):
+    body = json.dumps(payload).encode("utf-8")
+    headers = { "Content-Type": "application/json" } | (headers or {})
+    if compress:
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+
+    for attempt in range(retries):
+        try:
+            response = session.post(url, data=body, headers=headers, timeout=timeout)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise RetryableError(f"HTTP {response.status_code}")
+            response.raise_for_status()
+            return response
+        except (requests.ConnectionError, requests.Timeout, RetryableError) as e:
+            if attempt == retries - 1:
+                raise
+            delay = backoff * 2 ** attempt * (0.5 + random.random()) # Jitter, so that nodes don't retry in lockstep
+            print(f"Report to {url} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class Reporter:
+
+    def __init__(self, headers=None, spool_file=REPORT_SPOOL_FILE, timeout=REPORT_TIMEOUT, retries=REPORT_RETRIES, backoff=REPORT_BACKOFF,
+                 compress=REPORT_GZIP, batch=REPORT_BATCH, flush_interval=REPORT_FLUSH_INTERVAL):
+        self.headers = { name: value for name, value in (headers or {}).items() if name } # REPORTING_AUTH_HEADER may be unset
+        self.spool_file = spool_file
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.compress = compress
+        self.batch = max(batch, 1)
+        self.flush_interval = flush_interval
+        self.session = create_session()
+        self._lock = threading.Lock()        # Spool file
+        self._flush_lock = threading.Lock()  # One flush at a time
+        self._wake = threading.Event()
+        self._thread = None
+
+    # Start the background flusher; it first delivers what previous processes left in the spool.
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Report spool flush failed: {e}")
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+    def _append(self, url, payload):
+        entry = { "id": uuid.uuid4().hex, "url": url, "time": time.time(), "payload": payload }
+        with self._lock, open(self.spool_file, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return entry["id"]
+
+    def pending(self):
+        with self._lock:
+            if not os.path.exists(self.spool_file):
+                return []
+            entries = []
+            with open(self.spool_file) as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError: # A line cut short by a crash
+                        pass
+            return entries
+
+    def _remove(self, ids):
+        with self._lock:
+            if not os.path.exists(self.spool_file):
+                return
+            with open(self.spool_file) as f:
+                lines = [line for line in f if line.strip()]
+            kept = []
+            for line in lines:
+                try:
+                    if json.loads(line)["id"] in ids:
+                        continue
+                except ValueError:
+                    continue
+                kept.append(line)
+            temp_file = self.spool_file + ".tmp"
+            with open(temp_file, "w") as f:
+                f.writelines(kept)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.spool_file)
+
+    # Send every spooled report, in order, in batches of up to 'batch' reports to the same URL.
+    # Returns True if the spool is empty afterwards.
+    def flush(self):
+        with self._flush_lock:
+            entries = self.pending()
+            delivered = set()
+            failed_urls = set()
+            i = 0
+            while i < len(entries):
+                url = entries[i]["url"]
+                group = [entries[i]]
+                while len(group) < self.batch and i + len(group) < len(entries) and entries[i + len(group)]["url"] == url:
+                    group.append(entries[i + len(group)])
+                i += len(group)
+                if url in failed_urls: # Keep the order of the reports to a URL
+                    continue
+                payload = group[0]["payload"] if self.batch == 1 else [entry["payload"] for entry in group]
+                try:
+                    with span("report_post", url=url, reports=len(group)):
+                        post_json(self.session, url, payload, self.headers, self.timeout, self.retries, self.backoff, self.compress)
+                    delivered.update(entry["id"] for entry in group)
+                except requests.HTTPError as e: # Rejected (4xx): retrying would not help, drop it
+                    print(f"Report to {url} rejected, dropped: {e}")
+                    delivered.update(entry["id"] for entry in group)
+                except requests.RequestException as e:
+                    print(f"Report to {url} not delivered, kept in {self.spool_file}: {e}")
+                    failed_urls.add(url)
+            if delivered:
+                self._remove(delivered)
+            return len(delivered) == len(entries)
+
+    # Spool a report and deliver it now. Returns True if it was delivered.
+    def post(self, url, payload):
+        report_id = self._append(url, payload)
+        self.flush()
+        return all(entry["id"] != report_id for entry in self.pending())
+
+    # Spool a report and let the background flusher deliver it.
+    def submit(self, url, payload):
+        self._append(url, payload)
+        self._wake.set()
+        self.start()
@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+
+
+RESULTS_DB = os.getenv("RESULTS_DB", "benchmark_results.sqlite")   # Local results store; mount it or import collected results to compare against the fleet
+RESULTS_TTL_S = float(os.getenv("RESULTS_TTL_S", "0"))            # seconds, reuse a stored result of the same machine and configuration that is fresher; 0 always reruns
+UNDERPERFORMING_PERCENTILE = float(os.getenv("UNDERPERFORMING_PERCENTILE", "10")) # A node ranking below it among its GPU model is flagged
+MIN_PEER_RUNS = int(os.getenv("MIN_PEER_RUNS", "5"))               # Runs of the same GPU model needed to rank a node
+
+
+# Store benchmark results (g_Result and the 'benchmark-launcher-cli' results files) in SQLite, to reuse fresh results and to rank a node
+# against the other runs of the same GPU model.
+#
+# One row per completed benchmark. The columns used for lookups are indexed: the machine ID, the GPU model, the CUDA and driver versions,
+# the Blender version, the render device, multi-GPU mode, a hash of the run settings (settings_hash()) and the checksums of the Blender
+# build, the launcher and the scenes reported by 'benchmark-launcher-cli'.
+# The scores are columns too, so that a percentile rank is a single COUNT query on an index:
+#   store = ResultsStore()
+#   store.percentile("NVIDIA RTX A2000", "standard_score_cuda", 812.4)   # -> {"percentile": 37.5, "runs": 48}
+#   store.add(g_Result, ["benchmark_results_cuda.json", "benchmark_results_cpu.json"])
+# Results collected from other nodes (the final g_Result JSON, one object per file or a list) can be imported:
+#   python results_store.py import results/*.json
+#   python results_store.py percentile "NVIDIA RTX A2000" standard_score_cuda 812.4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id                  INTEGER PRIMARY KEY,
+    timestamp           REAL NOT NULL,
+    salad_machine_id    TEXT,
+    gpu_type            TEXT,
+    gpu_number          INTEGER,
+    cuda_version        REAL,
+    driver_version      TEXT,
+    blender_version     TEXT,
+    blender_checksum    TEXT,
+    launcher_checksum   TEXT,
+    scene_checksums     TEXT,
+    device              TEXT,
+    multi_gpu           INTEGER,
+    settings_hash       TEXT,
+    standard_score_cuda REAL,
+    standard_score_cpu  REAL,
+    custom_score        REAL,
+    result              TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_machine   ON runs (salad_machine_id, timestamp);
+CREATE INDEX IF NOT EXISTS runs_cuda      ON runs (gpu_type, standard_score_cuda);
+CREATE INDEX IF NOT EXISTS runs_custom    ON runs (gpu_type, custom_score);
+CREATE INDEX IF NOT EXISTS runs_cpu       ON runs (gpu_type, standard_score_cpu);
+CREATE INDEX IF NOT EXISTS runs_software  ON runs (cuda_version, driver_version, blender_version);
+CREATE INDEX IF NOT EXISTS runs_checksums ON runs (blender_checksum, launcher_checksum);
+"""
+
+# Columns added after the first release, added to an existing store on open
+ADDED_COLUMNS = { "multi_gpu": "INTEGER", "settings_hash": "TEXT" }
+
+# g_Result keys of the score columns
+SCORES = { "standard_score_cuda": "standard_blender_opendata_score_cuda",
+           "standard_score_cpu":  "standard_blender_opendata_score_cpu",
+           "custom_score":        "custom_blender_opendata_score" }
+
+
+# Hash of the settings a result depends on besides the node identity, e.g. the scenes, run counts and enabled phases
+def settings_hash(settings):
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+# Blender build, launcher and scene checksums from 'benchmark-launcher-cli' results files
+def read_checksums(results_files):
+    checksums = { "blender_checksum": None, "launcher_checksum": None, "scene_checksums": {} }
+    for path in results_files:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for item in data:
+            checksums["blender_checksum"] = item.get("blender_version", {}).get("checksum", checksums["blender_checksum"])
+            checksums["launcher_checksum"] = item.get("benchmark_launcher", {}).get("checksum", checksums["launcher_checksum"])
+            if "scene" in item:
+                checksums["scene_checksums"][item["scene"]["label"]] = item["scene"]["checksum"]
+    return checksums
+
+
+class ResultsStore:
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        columns = { row["name"] for row in self.db.execute("PRAGMA table_info(runs)") }
+        with self.db:
+            for column, kind in ADDED_COLUMNS.items():
+                if column not in columns:
+                    self.db.execute(f"ALTER TABLE runs ADD COLUMN {column} {kind}")
+
+    def close(self):
+        self.db.close()
+
+    # Store a completed benchmark; 'info' overrides or completes the identification taken from the result
+    # (e.g. the GPU model and driver version of a local run, where g_Result has no pre-flight info).
+    def add(self, result, results_files=(), timestamp=None, **info):
+        checksums = read_checksums(results_files)
+        row = { "timestamp": timestamp or time.time(),
+                "salad_machine_id": result.get("salad_machine_id"),
+                "gpu_type": result.get("gpu_type"),
+                "gpu_number": result.get("gpu_number"),
+                "cuda_version": result.get("cuda_version"),
+                "driver_version": result.get("driver_version"),
+                "blender_version": result.get("blender_version"),
+                "blender_checksum": checksums["blender_checksum"] or result.get("blender_checksum"),
+                "launcher_checksum": checksums["launcher_checksum"] or result.get("launcher_checksum"),
+                "scene_checksums": json.dumps(checksums["scene_checksums"] or result.get("scene_checksums") or {}, sort_keys=True),
+                "device": result.get("custom_benchmark_device"),
+                "multi_gpu": result.get("multi_gpu"),
+                "settings_hash": result.get("settings_hash") } | info
+        for column, key in SCORES.items():
+            row[column] = result.get(key)
+        row["result"] = json.dumps(result)
+        with self.db:
+            self.db.execute(f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})", list(row.values()))
+
+    # The latest result of the same machine, configuration and run settings not older than 'ttl_s', or None.
+    # NULL matches NULL (e.g. no CUDA version on a local run).
+    def fresh(self, ttl_s, salad_machine_id, gpu_type, cuda_version, driver_version, blender_version, device, multi_gpu, settings_hash):
+        row = self.db.execute("SELECT timestamp, result FROM runs WHERE salad_machine_id IS ? AND gpu_type IS ? AND cuda_version IS ? "
+                              "AND driver_version IS ? AND blender_version IS ? AND device IS ? AND multi_gpu IS ? AND settings_hash IS ? "
+                              "AND timestamp >= ? ORDER BY timestamp DESC LIMIT 1",
+                              (salad_machine_id, gpu_type, cuda_version, driver_version, blender_version, device, multi_gpu, settings_hash,
+                               time.time() - ttl_s)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row["result"]) | { "reused_result_age_s": round(time.time() - row["timestamp"], 1) }
+
+    # Percentile rank of 'value' among the stored runs of a GPU model: the percentage of runs scoring lower (ties count half)
+    def percentile(self, gpu_type, score, value):
+        if score not in SCORES:
+            raise ValueError(f"Unknown score: {score}")
+        runs, lower, equal = self.db.execute(f"SELECT COUNT({score}), COUNT(CASE WHEN {score} < ? THEN 1 END), COUNT(CASE WHEN {score} = ? THEN 1 END) "
+                                             f"FROM runs WHERE gpu_type IS ? AND {score} IS NOT NULL", (value, value, gpu_type)).fetchone()
+        return { "percentile": round(100 * (lower + equal / 2) / runs, 1) if runs else None, "runs": runs }
+
+    # Rank the scores of a result among the stored runs of its GPU model; a node is underperforming if any of its scores ranks
+    # below UNDERPERFORMING_PERCENTILE among at least MIN_PEER_RUNS runs.
+    def rank(self, result, gpu_type):
+        ranks = {}
+        for score, key in SCORES.items():
+            if isinstance(result.get(key), (int, float)):
+                ranks[f"{key}_percentile"] = self.percentile(gpu_type, score, result[key])
+        ranks["underperforming"] = any(rank["runs"] >= MIN_PEER_RUNS and rank["percentile"] < UNDERPERFORMING_PERCENTILE for rank in ranks.values())
+        return ranks
+
+    # Score distribution of a GPU model, e.g. {"p10": ..., "p50": ..., "p90": ...} (nearest rank)
+    def quantiles(self, gpu_type, score, percents=(10, 50, 90)):
+        if score not in SCORES:
+            raise ValueError(f"Unknown score: {score}")
+        runs = self.db.execute(f"SELECT COUNT({score}) FROM runs WHERE gpu_type IS ?", (gpu_type,)).fetchone()[0]
+        result = {}
+        for percent in percents:
+            if runs == 0:
+                result[f"p{percent}"] = None
+                continue
+            offset = min(max(round(percent / 100 * runs + 0.5) - 1, 0), runs - 1)
+            result[f"p{percent}"] = self.db.execute(f"SELECT {score} FROM runs WHERE gpu_type IS ? AND {score} IS NOT NULL ORDER BY {score} LIMIT 1 OFFSET ?",
+                                                    (gpu_type, offset)).fetchone()[0]
+        return result
+
+    # Import final results (g_Result JSON) collected from other nodes
+    def import_files(self, paths):
+        count = 0
+        for path in paths:
+            with open(path) as f:
+                data = json.load(f)
+            for result in data if isinstance(data, list) else [data]:
+                self.add(result, timestamp=os.path.getmtime(path))
+                count += 1
+        return count
+
+
+if __name__ == "__main__":
+    store = ResultsStore()
+    if len(sys.argv) > 2 and sys.argv[1] == "import":
+        print(f"Imported {store.import_files(sys.argv[2:])} results into {store.path}")
+    elif len(sys.argv) == 5 and sys.argv[1] == "percentile":
+        gpu_type, score, value = sys.argv[2], sys.argv[3], float(sys.argv[4])
+        print(store.percentile(gpu_type, score, value) | store.quantiles(gpu_type, score))
+    else:
+        print("Usage: python results_store.py import <results.json> ... | percentile <gpu_type> <score> <value>")
@@ -0,0 +1,109 @@
+import os
+import math
+import time
+import statistics
+
+
+WARMUP_RUNS = int(os.getenv("WARMUP_RUNS", "0"))              # Runs discarded before measuring
+MIN_RUNS = int(os.getenv("MIN_RUNS", "3"))                    # Measured runs, at least
+MAX_RUNS = int(os.getenv("MAX_RUNS", "10"))                   # Measured runs, at most
+TARGET_REL_CI = float(os.getenv("TARGET_REL_CI", "0.05"))     # Stop once the 95% confidence interval half-width is within 5% of the mean
+RUN_TIME_BUDGET_S = float(os.getenv("RUN_TIME_BUDGET_S", "600")) # Stop once the runs of a scene took that long, seconds
+
+OUTLIER_THRESHOLD = 3.5 # Modified z-score above which a run is an outlier (Iglewicz and Hoaglin)
+
+
+# Two-sided 95% critical values of Student's t distribution, by degrees of freedom
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def t_critical_95(df):
+    return T_95[df - 1] if df <= len(T_95) else 1.96
+
+
+# Indices of the outliers, by the modified z-score based on the median absolute deviation (MAD); at least 4 values are needed
+def mad_outliers(values, threshold=OUTLIER_THRESHOLD):
+    if len(values) < 4:
+        return []
+    median = statistics.median(values)
+    mad = statistics.median(abs(value - median) for value in values)
+    if mad == 0:
+        return []
+    return [i for i, value in enumerate(values) if 0.6745 * abs(value - median) / mad > threshold]
+
+
+# Decide how many times a scene is rendered: repeat until the relative confidence interval of the time per frame is below the target,
+# the maximum number of runs is reached or the time budget is spent. The first 'warmup' runs are discarded, outliers are rejected.
+#   controller = RunController.from_env()
+#   while not controller.done():
+#       controller.add(render once ...)
+#   print(controller.summary())
+class RunController:
+
+    def __init__(self, warmup=0, min_runs=1, max_runs=1, target_rel_ci=0.0, time_budget_s=math.inf):
+        self.warmup = warmup
+        self.min_runs = max(min_runs, 1)
+        self.max_runs = max(max_runs, self.min_runs)
+        self.target_rel_ci = target_rel_ci
+        self.time_budget_s = time_budget_s
+        self.values = []        # All runs, including the warm-up ones
+        self.start_time = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(WARMUP_RUNS, MIN_RUNS, MAX_RUNS, TARGET_REL_CI, RUN_TIME_BUDGET_S)
+
+    # A fixed number of runs, no warm-up
+    @classmethod
+    def fixed(cls, runs):
+        return cls(0, runs, runs)
+
+    def add(self, value):
+        self.values.append(value)
+
+    def is_warmup(self):
+        return len(self.values) < self.warmup
+
+    # The measured runs without warm-up runs and outliers
+    def kept(self):
+        measured = self.values[self.warmup:]
+        outliers = set(mad_outliers(measured))
+        return [value for i, value in enumerate(measured) if i not in outliers]
+
+    def relative_ci(self):
+        kept = self.kept()
+        if len(kept) < 2:
+            return math.inf
+        mean = statistics.fmean(kept)
+        return t_critical_95(len(kept) - 1) * statistics.stdev(kept) / math.sqrt(len(kept)) / mean
+
+    def budget_exhausted(self):
+        return self.start_time is not None and time.perf_counter() - self.start_time >= self.time_budget_s
+
+    def done(self):
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+            return False
+        measured = len(self.values) - self.warmup
+        if measured >= self.max_runs or (measured > 0 and self.budget_exhausted()):
+            return True
+        if measured < self.min_runs:
+            return False
+        return self.relative_ci() <= self.target_rel_ci
+
+    def summary(self):
+        kept = self.kept()
+        result = { "runs": len(self.values) - self.warmup,
+                   "warmup_runs": min(len(self.values), self.warmup),
+                   "outliers": len(self.values) - self.warmup - len(kept) }
+        if kept:
+            result["mean"] = statistics.fmean(kept)
+            result["geometric_mean"] = math.prod(kept) ** (1 / len(kept))
+        if len(kept) > 1:
+            result["stddev"] = statistics.stdev(kept)
+            result["ci95"] = t_critical_95(len(kept) - 1) * result["stddev"] / math.sqrt(len(kept))
+            result["relative_ci95"] = result["ci95"] / result["mean"]
+        result["budget_exhausted"] = self.budget_exhausted()
+        return result
@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import mmap
+import shutil
+import hashlib
+import threading
+
+
+STAGING_VERIFY = os.getenv("STAGING_VERIFY", "1") == "1"       # Verify the scene files against the manifest of their hash folder
+STAGING_IO = os.getenv("STAGING_IO", "1") == "1"               # Measure the cold and warm read throughput of the scene files
+STAGING_TMPFS = os.getenv("STAGING_TMPFS", "0") == "1"         # Copy the scenes to tmpfs and render them from there
+STAGING_TMPFS_DIR = os.getenv("STAGING_TMPFS_DIR", "/dev/shm/blender-benchmark-scenes")
+STAGING_MANIFEST = os.getenv("STAGING_MANIFEST", "scene_manifest.json")  # Checksums of the scene folders, generated when the image is built
+PREWARM = os.getenv("PREWARM", "1") == "1"                     # Read the scene files once before rendering, to load them into the page cache
+
+READ_CHUNK = 1024 * 1024
+
+
+# Stage the scene assets before they are rendered, so that disk cost is reported separately from render cost.
+#
+# The scenes are cached by 'benchmark-launcher-cli' in ~/.cache/blender-benchmark-launcher/scenes/<hash>/<scene> (list_main_blend_with_folder()).
+# The hash identifies a scene version, but it is the checksum of the download, not of the extracted files; so the files of each
+# "<hash>/<scene>" folder are hashed (SHA-256 over the relative paths and contents) and checked against the manifest (STAGING_MANIFEST).
+# The manifest is generated from the scenes shipped in the image when it is built ('python3 staging.py manifest', see the Dockerfile);
+# a mismatch (a truncated or modified scene) fails the staging. A scene missing from the manifest (a run outside the image, or a custom
+# scene added after the build) is rendered unverified ("verified": False).
+# The checksum is computed during the cold read, so verifying costs no extra pass over the files.
+#
+# The cold read throughput is measured by dropping the scene files from the page cache (posix_fadvise DONTNEED) and reading them once,
+# the warm read throughput by reading them again through mmap, which also leaves them in the page cache for the render (pre-warming).
+# With STAGING_TMPFS, the scenes are copied to /dev/shm and rendered from there: slow disks don't matter at all.
+#   manifest = Manifest()
+#   staged = stage_scene(scene, manifest)   # scene: an entry of list_main_blend_with_folder()
+#   staged["main_blend_path"]               # where to render the scene from
+#   staged["staging"]                       # checksum, verified, cold_read_MBps, warm_read_MBps, ...
+
+
+class StagingError(Exception):
+    pass
+
+
+# Checksums of the scene folders, by "<hash>/<scene>"; read-only while benchmarking
+class Manifest:
+
+    def __init__(self, path=STAGING_MANIFEST):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Scene manifest {path} not loaded: {e}")
+            self.entries = {}
+
+    # True if the checksum matches, False if the folder is not in the manifest; raises StagingError on a mismatch
+    def verify(self, key, checksum, size):
+        entry = self.entries.get(key)
+        if entry is None:
+            print(f"Scene {key}: not in the manifest {self.path}, the scene files are not verified")
+            return False
+        if entry["checksum"] != checksum or entry["bytes"] != size:
+            raise StagingError(f"Scene {key}: checksum {checksum[:12]} does not match the manifest ({entry['checksum'][:12]}), the scene files are corrupted")
+        return True
+
+    # Record the checksum of a folder, when the manifest is generated
+    def record(self, key, checksum, size):
+        with self._lock:
+            self.entries[key] = { "checksum": checksum, "bytes": size, "time": time.time() }
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp = self.path + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temp, self.path)
+
+
+# The files of a scene folder (the .blend file and its textures), sorted by relative path
+def scene_files(folder):
+    files = []
+    for root, _, names in os.walk(folder):
+        files.extend(os.path.relpath(os.path.join(root, name), folder) for name in names)
+    return sorted(files)
+
+
+# Drop the pages of a file from the page cache; unmodified pages only, advisory
+def drop_page_cache(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+# Read the files of a folder once, hashing them unless 'hashed' is False; only the reads are timed.
+# Returns (checksum or None, bytes, read seconds).
+def hash_folder(folder, files, hashed=True):
+    digest = hashlib.sha256() if hashed else None
+    total, read_time = 0, 0.0
+    for name in files:
+        if digest is not None:
+            digest.update(name.encode() + b"\0")
+        with open(os.path.join(folder, name), "rb", buffering=0) as f:
+            while True:
+                start_time = time.perf_counter()
+                chunk = f.read(READ_CHUNK)
+                read_time += time.perf_counter() - start_time
+                if not chunk:
+                    break
+                if digest is not None:
+                    digest.update(chunk)
+                total += len(chunk)
+    return digest.hexdigest() if digest is not None else None, total, read_time
+
+
+# Read every page of the files of a folder through mmap, loading them into the page cache. Returns the bytes read and the time taken.
+def prewarm_page_cache(folder, files=None):
+    start_time = time.perf_counter()
+    total = 0
+    for name in files if files is not None else scene_files(folder):
+        path = os.path.join(folder, name)
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as pages:
+                    if hasattr(pages, "madvise"):
+                        pages.madvise(mmap.MADV_WILLNEED)
+                    for offset in range(0, size, mmap.PAGESIZE): # Touch one byte per page
+                        pages[offset]
+                total += size
+        except (OSError, ValueError) as e:
+            print(f"Pre-warming {path} failed: {e}")
+    return { "bytes": total, "time_s": round(time.perf_counter() - start_time, 3) }
+
+
+# Copy a scene folder to tmpfs, unless it is already there with the same files; returns the folder on tmpfs
+def copy_to_tmpfs(folder, key, files, size):
+    target = os.path.join(STAGING_TMPFS_DIR, key)
+    if all(os.path.exists(os.path.join(target, name)) and
+           os.path.getsize(os.path.join(target, name)) == os.path.getsize(os.path.join(folder, name)) for name in files):
+        return target
+    os.makedirs(STAGING_TMPFS_DIR, exist_ok=True)
+    free = shutil.disk_usage(STAGING_TMPFS_DIR).free
+    if free < 2 * size: # Keep room for the renders and everything else in shared memory
+        raise StagingError(f"Scene {key}: {size / 2**20:.0f} MB does not fit in {STAGING_TMPFS_DIR} ({free / 2**20:.0f} MB free)")
+    shutil.copytree(folder, target, dirs_exist_ok=True)
+    return target
+
+
+def _MBps(size, seconds):
+    return round(size / 2**20 / seconds, 1) if seconds > 0 else None
+
+
+# Stage a scene (an entry of list_main_blend_with_folder()): verify its files, measure the cold and warm read throughput,
+# copy it to tmpfs and pre-warm the page cache, as configured. Returns the entry with the 'main_blend_path' to render and a 'staging' report.
+def stage_scene(scene, manifest=None):
+    folder = os.path.dirname(scene['main_blend_path'])
+    key = f"{scene['folder']}/{scene['scene']}"
+    files = scene_files(folder)
+    report = { "files": len(files) }
+
+    if STAGING_IO:
+        for name in files:
+            drop_page_cache(os.path.join(folder, name))
+    if STAGING_IO or STAGING_VERIFY:
+        checksum, size, read_time = hash_folder(folder, files, hashed=STAGING_VERIFY)
+        report["bytes"] = size
+        if STAGING_IO:
+            report |= { "cold_read_s": round(read_time, 3), "cold_read_MBps": _MBps(size, read_time) }
+        if STAGING_VERIFY:
+            report["checksum"] = checksum
+            if manifest is not None:
+                report["verified"] = manifest.verify(key, checksum, size)
+    else:
+        size = sum(os.path.getsize(os.path.join(folder, name)) for name in files)
+        report["bytes"] = size
+
+    if STAGING_TMPFS:
+        start_time = time.perf_counter()
+        folder = copy_to_tmpfs(folder, key, files, size)
+        report |= { "tmpfs": folder, "tmpfs_copy_s": round(time.perf_counter() - start_time, 3) }
+
+    if STAGING_IO or PREWARM:
+        start_time = time.perf_counter()
+        warm = prewarm_page_cache(folder, files)
+        warm_time = time.perf_counter() - start_time
+        report |= { "warm_read_s": round(warm_time, 3), "warm_read_MBps": _MBps(warm["bytes"], warm_time) }
+
+    print(f"[{scene['scene']}] Staged {len(files)} files, {size / 2**20:.1f} MB" +
+          (f", cold read {report['cold_read_MBps']} MB/s" if "cold_read_MBps" in report else "") +
+          (f", warm read {report['warm_read_MBps']} MB/s" if "warm_read_MBps" in report else "") +
+          (", verified" if report.get("verified") else ""))
+    return scene | { "main_blend_path": os.path.join(folder, os.path.basename(scene['main_blend_path'])), "staging": report }
+
+
+# Generate the manifest of the scenes in the cache, when the image is built: python3 staging.py manifest
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == "manifest":
+        from helper import list_main_blend_with_folder
+        manifest = Manifest()
+        for scene in list_main_blend_with_folder():
+            folder = os.path.dirname(scene['main_blend_path'])
+            checksum, size, _ = hash_folder(folder, scene_files(folder))
+            manifest.record(f"{scene['folder']}/{scene['scene']}", checksum, size)
+            print(f"{scene['folder']}/{scene['scene']}: {checksum}, {size / 2**20:.1f} MB")
+        manifest.save()
+        print(f"Manifest of {len(manifest.entries)} scenes written to {manifest.path}")
+    else:
+        print("Usage: python3 staging.py manifest")
@@ -0,0 +1,131 @@
+import os
+import json
+import itertools
+
+
+SWEEP = os.getenv("SWEEP", "0") == "1"                         # Run the parameter sweep after the custom benchmark
+SWEEP_FILE = os.getenv("SWEEP_FILE", "")                       # JSON file with the sweep matrix; DEFAULT_MATRIX if not set
+SWEEP_LINEAR_R2 = float(os.getenv("SWEEP_LINEAR_R2", "0.995")) # Stop a curve once a linear fit of its points is that good
+SWEEP_MIN_POINTS = int(os.getenv("SWEEP_MIN_POINTS", "3"))     # Points rendered on a curve before it may be stopped
+
+
+# Measure how the render time scales with the render settings, to size jobs on each GPU class.
+#
+# The sweep matrix is declarative:
+#   "scenes": the scenes to sweep (null for all)
+#   "base":   the overrides of every render; the time limit, adaptive sampling and denoising are off so that the work is known
+#   "axes":   the values of each setting; with "mode": "axes", one curve per axis around the base (cheap, the default),
+#             with "mode": "grid", every combination of the axis values
+# Any setting of OVERRIDES in worker_script.py can be an axis. The renders of a scene share the scene load (the worker keeps it loaded),
+# the base point is rendered once for all curves, and the curves of LINEAR_AXES are stopped early once they are linear
+# (the remaining points are predicted). All renders that only differ in resolution and samples are fitted to
+#   time ≈ a + b · pixels · samples
+# where 'a' is the fixed cost of a render (sync, BVH, kernels) and 'b' the cost of one sample of one pixel.
+
+DEFAULT_MATRIX = {
+    "scenes": ["monster"],
+    "base": { "resolution_percentage": 50, "samples": 64, "time_limit": 0, "use_adaptive_sampling": False, "use_denoising": False },
+    "axes": { "resolution_percentage": [25, 50, 75, 100],
+              "samples": [16, 32, 64, 128, 256],
+              "use_adaptive_sampling": [False, True],
+              "use_denoising": [False, True],
+              "tile_size": [256, 1024, 2048] },
+    "mode": "axes"
+}
+
+LINEAR_AXES = ["resolution_percentage", "samples"] # The work is proportional to pixels · samples along these axes
+
+
+def load_matrix(path=SWEEP_FILE):
+    if not path:
+        return DEFAULT_MATRIX
+    with open(path) as f:
+        return DEFAULT_MATRIX | json.load(f)
+
+
+# The work of a render: pixels · samples, from the scene settings (get_blend_settings()) and the overrides
+def work(settings, overrides):
+    percentage = overrides.get("resolution_percentage", settings["percentage"])
+    pixels = int(settings["resolution_x"] * percentage / 100) * int(settings["resolution_y"] * percentage / 100)
+    return pixels * overrides.get("samples", settings["samples"])
+
+
+# Least squares fit of y = a + b·x; returns (a, b, r2)
+def fit_linear(xs, ys):
+    n = len(xs)
+    if n < 2:
+        return (ys[0] if ys else 0.0), 0.0, 0.0
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return mean_y, 0.0, 0.0
+    b = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+    a = mean_y - b * mean_x
+    ss_tot = sum((y - mean_y) ** 2 for y in ys)
+    ss_res = sum((y - a - b * x) ** 2 for x, y in zip(xs, ys))
+    if ss_tot <= 1e-12 * mean_y ** 2: # Constant times: a flat line fits
+        return a, b, 1.0
+    return a, b, 1 - ss_res / ss_tot
+
+
+# The curves of the sweep: [(axis or None, [overrides, ...])]; a grid is a single curve without an axis.
+def plan(matrix):
+    base, axes = matrix["base"], matrix["axes"]
+    if matrix.get("mode") == "grid":
+        names = list(axes)
+        return [(None, [base | dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))])]
+    curves = []
+    for axis, values in axes.items():
+        values = sorted(values) if axis in LINEAR_AXES else values
+        curves.append((axis, [base | { axis: value } for value in values]))
+    return curves
+
+
+def _key(overrides):
+    return json.dumps(overrides, sort_keys=True)
+
+
+# Sweep a scene. 'render(overrides)' renders it once and returns the render time in seconds;
+# 'settings' are the scene settings from get_blend_settings().
+def run_sweep(scene_name, settings, render, matrix=None):
+    matrix = matrix or load_matrix()
+    measured = {} # Renders shared by the curves, by overrides
+    curves = {}
+    stopped = []
+
+    for axis, points in plan(matrix):
+        curve = []
+        for overrides in points:
+            if "threads" in overrides: # A thread count only applies with a fixed thread mode
+                overrides = { "threads_mode": "FIXED" } | overrides
+            key = _key(overrides)
+            predicted = False
+            if key not in measured and axis in LINEAR_AXES and len(curve) >= SWEEP_MIN_POINTS:
+                a, b, r2 = fit_linear([point["work"] for point in curve], [point["time_s"] for point in curve])
+                if r2 >= SWEEP_LINEAR_R2:
+                    if axis not in stopped:
+                        print(f"[{scene_name}] Sweep of {axis} is linear (R² {r2:.4f}), the remaining points are predicted")
+                        stopped.append(axis)
+                    measured_time, predicted = a + b * work(settings, overrides), True
+            if not predicted:
+                if key not in measured:
+                    print(f"[{scene_name}] Sweep {len(measured) + 1}: {overrides}")
+                    measured[key] = (overrides, render(overrides))
+                measured_time = measured[key][1]
+            curve.append({ "overrides": overrides, "work": work(settings, overrides), "time_s": measured_time, "predicted": predicted })
+        curves[axis or "grid"] = [{ "value": point["overrides"].get(axis) if axis else point["overrides"], "time_s": round(point["time_s"], 3),
+                                    "predicted": point["predicted"] } for point in curve]
+
+    # Fit the scaling model on the measured renders that only differ from the base in resolution and samples
+    base = matrix["base"]
+    def pixels_samples_only(overrides):
+        return set(overrides) <= set(base) | set(LINEAR_AXES) and \
+               all(overrides.get(name) == value for name, value in base.items() if name not in LINEAR_AXES)
+    model_points = [(work(settings, overrides), time_s) for overrides, time_s in measured.values() if pixels_samples_only(overrides)]
+    result = { "renders": len(measured), "predicted_points": sum(point["predicted"] for curve in curves.values() for point in curve),
+               "stopped_early": stopped, "curves": curves }
+    if len(model_points) >= 2:
+        a, b, r2 = fit_linear(*zip(*model_points))
+        result["model"] = { "a_s": a, "b_s_per_pixel_sample": b, "r2": r2, "points": len(model_points) }
+        print(f"[{scene_name}] Scaling model: time = {a:.3f}s + {b:.3e}s · pixels · samples (R² {r2:.4f}, {len(model_points)} renders)")
+    return result
@@ -0,0 +1,233 @@
+import os
+import math
+import time
+import threading
+import subprocess
+from array import array
+from datetime import datetime
+
+
+USE_TELEMETRY = os.getenv("TELEMETRY", "1") == "1"                        # Sample GPU/CPU state during every render and benchmark
+TELEMETRY_INTERVAL_MS = int(os.getenv("TELEMETRY_INTERVAL_MS", "500"))    # Sampling interval
+TEMPERATURE_LIMIT = int(os.getenv("TEMPERATURE_LIMIT", "83"))             # °C, the time spent above it is reported
+TELEMETRY_SERIES = os.getenv("TELEMETRY_SERIES", "0") == "1"              # Also report the full time series, not only the summaries
+
+
+# Sample GPU and CPU state in the background for the duration of a render or benchmark.
+#
+# GPU: 'nvidia-smi --query-gpu=... --loop-ms=<interval>' runs as a child process and its CSV lines are parsed as they arrive.
+# CPU: /proc/stat (utilization, steal time from other tenants of a VM) and /proc/meminfo (memory used) are read at the same interval.
+# Samples are kept as compact arrays (one per metric and GPU), summarized by summary() once the sampler is stopped:
+#   with TelemetrySampler(gpu=True) as sampler:
+#       render ...
+#   print(sampler.summary())
+# 'nvidia-smi' is looked up on PATH, so a fake one can stand in for testing.
+
+GPU_FIELDS = ["timestamp", "uuid", "utilization.gpu", "memory.used", "temperature.gpu", "power.draw", "power.limit",
+              "clocks.sm", "clocks_throttle_reasons.active"]
+GPU_METRICS = ["utilization", "vram_used", "temperature", "power_draw", "power_limit", "sm_clock", "throttle_reasons"]
+
+# Clock throttle reasons (nvml.h) that mean lost performance: SW power cap, HW slowdown, SW/HW thermal slowdown, HW power brake.
+# Idle, application clocks, sync boost and display clock settings are not counted.
+THROTTLE_MASK = 0x4 | 0x8 | 0x40 | 0x80 | 0x100
+THERMAL_MASK = 0x40 | 0x80
+
+
+def _parse_number(value):
+    value = value.strip()
+    try:
+        return float(int(value, 16)) if value.startswith("0x") else float(value)
+    except ValueError: # [N/A], [Not Supported]
+        return math.nan
+
+
+class GPUSeries:
+
+    def __init__(self):
+        self.time = array("d")
+        self.metrics = { name: array("f") for name in GPU_METRICS }
+
+
+class TelemetrySampler:
+
+    # 'gpu_ids': limit the GPU sampling to some GPUs (indices or UUIDs), e.g. the one in CUDA_VISIBLE_DEVICES
+    def __init__(self, gpu=True, cpu=True, gpu_ids=None, interval_ms=None):
+        self.gpu = gpu
+        self.cpu = cpu
+        self.gpu_ids = gpu_ids
+        self.interval_ms = interval_ms or TELEMETRY_INTERVAL_MS
+        self.gpus = {}                         # uuid -> GPUSeries
+        self.cpu_time = array("d")
+        self.cpu_utilization = array("f")      # %
+        self.cpu_steal = array("f")            # %
+        self.mem_used = array("f")             # MB
+        self.start_time = None
+        self.end_time = None
+        self._process = None
+        self._threads = []
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self):
+        return self.gpu or self.cpu
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self.start_time = time.time()
+        if self.gpu:
+            cmd = ["nvidia-smi", f"--query-gpu={','.join(GPU_FIELDS)}", "--format=csv,noheader,nounits", f"--loop-ms={self.interval_ms}"]
+            if self.gpu_ids:
+                cmd.append(f"--id={','.join(str(gpu_id) for gpu_id in self.gpu_ids)}")
+            try:
+                self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+                self._threads.append(threading.Thread(target=self._read_gpu, daemon=True))
+            except OSError as e:
+                print(f"GPU telemetry unavailable: {e}")
+        if self.cpu and os.path.exists("/proc/stat"):
+            self._threads.append(threading.Thread(target=self._sample_cpu, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.end_time = time.time()
+        self._stop.set()
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def _read_gpu(self):
+        for line in self._process.stdout:
+            fields = line.strip().split(", ")
+            if len(fields) != len(GPU_FIELDS):
+                continue
+            try:
+                timestamp = datetime.strptime(fields[0], "%Y/%m/%d %H:%M:%S.%f").timestamp()
+            except ValueError:
+                timestamp = time.time()
+            series = self.gpus.setdefault(fields[1], GPUSeries())
+            series.time.append(timestamp)
+            for name, value in zip(GPU_METRICS, fields[2:]):
+                series.metrics[name].append(_parse_number(value))
+
+    @staticmethod
+    def _read_proc_stat():
+        with open("/proc/stat") as f:
+            values = [int(value) for value in f.readline().split()[1:]]
+        idle = values[3] + (values[4] if len(values) > 4 else 0) # idle + iowait
+        steal = values[7] if len(values) > 7 else 0
+        return sum(values[:8]), idle, steal
+
+    @staticmethod
+    def _read_mem_used():
+        meminfo = {}
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                meminfo[key] = int(value.split()[0]) # kB
+        return (meminfo["MemTotal"] - meminfo.get("MemAvailable", meminfo["MemFree"])) / 1024
+
+    def _sample_cpu(self):
+        previous = self._read_proc_stat()
+        while not self._stop.wait(self.interval_ms / 1000):
+            current = self._read_proc_stat()
+            total = current[0] - previous[0]
+            if total > 0:
+                self.cpu_time.append(time.time())
+                self.cpu_utilization.append(100 * (1 - (current[1] - previous[1]) / total))
+                self.cpu_steal.append(100 * (current[2] - previous[2]) / total)
+                self.mem_used.append(self._read_mem_used())
+            previous = current
+
+    # Time series as plain lists, e.g. for reporting
+    def series(self):
+        result = {}
+        for uuid, gpu in self.gpus.items():
+            result[uuid] = { "time": gpu.time.tolist() } | { name: values.tolist() for name, values in gpu.metrics.items() }
+        if self.cpu_time:
+            result["cpu"] = { "time": self.cpu_time.tolist(), "utilization": self.cpu_utilization.tolist(),
+                              "steal": self.cpu_steal.tolist(), "mem_used": self.mem_used.tolist() }
+        return result
+
+    # Peak/mean utilization, peak VRAM, throttle events and time above TEMPERATURE_LIMIT over the sampled GPUs, plus CPU/memory stats
+    def summary(self):
+        if not self.enabled:
+            return {}
+        result = { "duration_s": round((self.end_time or time.time()) - self.start_time, 3) }
+        if self.gpus:
+            stats = [self._gpu_summary(gpu) for gpu in self.gpus.values() if gpu.time]
+            if stats:
+                result["gpu_samples"] = sum(stat["samples"] for stat in stats)
+                for key in ("gpu_utilization_peak", "vram_peak_mb", "temperature_peak_c", "power_peak_w", "sm_clock_max_mhz"):
+                    result[key] = max(stat[key] for stat in stats)
+                for key in ("throttle_events", "throttle_time_s", "time_above_temperature_limit_s"):
+                    result[key] = round(sum(stat[key] for stat in stats), 3)
+                result["gpu_utilization_mean"] = round(sum(stat["gpu_utilization_mean"] for stat in stats) / len(stats), 1)
+                result["sm_clock_min_mhz"] = min(stat["sm_clock_min_mhz"] for stat in stats)
+                result["vram_baseline_mb"] = max(stat["vram_baseline_mb"] for stat in stats) # VRAM already used by others when the sampling started
+                result["power_limit_w"] = max(stat["power_limit_w"] for stat in stats)
+                result["thermal_throttling"] = any(stat["thermal_throttling"] for stat in stats)
+        if self.cpu_time:
+            result["cpu_samples"] = len(self.cpu_time)
+            result["cpu_utilization_peak"] = round(max(self.cpu_utilization), 1)
+            result["cpu_utilization_mean"] = round(sum(self.cpu_utilization) / len(self.cpu_utilization), 1)
+            result["cpu_steal_mean"] = round(sum(self.cpu_steal) / len(self.cpu_steal), 1)
+            result["mem_used_peak_mb"] = round(max(self.mem_used))
+        return result
+
+    @staticmethod
+    def _gpu_summary(gpu):
+        def valid(name):
+            return [value for value in gpu.metrics[name] if not math.isnan(value)] or [0.0]
+
+        # Each sample stands for the interval until the next one
+        intervals = [later - earlier for earlier, later in zip(gpu.time, gpu.time[1:])]
+        intervals.append(intervals[-1] if intervals else 0.0)
+
+        throttle_events, throttle_time, thermal, above_limit, previous = 0, 0.0, False, 0.0, False
+        for reasons, temperature, interval in zip(gpu.metrics["throttle_reasons"], gpu.metrics["temperature"], intervals):
+            throttled = not math.isnan(reasons) and int(reasons) & THROTTLE_MASK != 0
+            if throttled:
+                throttle_time += interval
+                thermal = thermal or int(reasons) & THERMAL_MASK != 0
+                if not previous:
+                    throttle_events += 1
+            previous = throttled
+            if temperature > TEMPERATURE_LIMIT:
+                above_limit += interval
+
+        utilization = valid("utilization")
+        return { "samples": len(gpu.time),
+                 "gpu_utilization_peak": max(utilization),
+                 "gpu_utilization_mean": sum(utilization) / len(utilization),
+                 "vram_peak_mb": max(valid("vram_used")),
+                 "vram_baseline_mb": valid("vram_used")[0],
+                 "temperature_peak_c": max(valid("temperature")),
+                 "power_peak_w": max(valid("power_draw")),
+                 "power_limit_w": max(valid("power_limit")),
+                 "sm_clock_max_mhz": max(valid("sm_clock")),
+                 "sm_clock_min_mhz": min(valid("sm_clock")),
+                 "throttle_events": throttle_events,
+                 "throttle_time_s": throttle_time,
+                 "thermal_throttling": thermal,
+                 "time_above_temperature_limit_s": above_limit }
+
+
+# A sampler for a render on 'cycles_device', limited to the GPU selected by CUDA_VISIBLE_DEVICES in 'env' if any.
+# If telemetry is disabled, the sampler samples nothing and its summary is empty.
+def render_sampler(cycles_device, env=None):
+    if not USE_TELEMETRY:
+        return TelemetrySampler(gpu=False, cpu=False)
+    visible = (env or os.environ).get("CUDA_VISIBLE_DEVICES")
+    gpu_ids = [item.strip() for item in visible.split(",") if item.strip()] if visible else None
+    return TelemetrySampler(gpu=cycles_device != "CPU", gpu_ids=gpu_ids)
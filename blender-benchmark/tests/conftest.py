@@ -0,0 +1,6 @@
+import os
+import sys
+
+
+# The modules of blender-benchmark are imported by name, as benchmark.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,74 @@
+import time
+import threading
+from preflight import Probe, Preflight
+
+
+# Local stand-ins for the network and GPU probes of init_check.py
+
+
+def test_early_failure_skips_gate_probes():
+    release = threading.Event()
+    def download(publish):
+        publish("dl_speed", 5.0)
+        return 5.0
+    def upload(publish): # Would take long; abandoned once the download speed misses its threshold
+        release.wait(10)
+        return 100.0
+    def gpus(publish):
+        time.sleep(0.2)
+        return { "0": "NVIDIA RTX A2000" }
+
+    preflight = Preflight([Probe("download", download, timeout=10, default=0.0, gate=True),
+                           Probe("upload", upload, timeout=10, default=0.0, gate=True, metric="ul_speed"),
+                           Probe("gpus", gpus, timeout=10, default={})],
+                          { "dl_speed": lambda value: value >= 50, "ul_speed": lambda value: value >= 20 }).start()
+    start_time = time.perf_counter()
+    try:
+        assert preflight.wait() is False
+    finally:
+        release.set()
+    assert time.perf_counter() - start_time < 5
+    assert preflight.failed()
+    assert preflight.failed_checks == ["dl_speed"]
+    assert preflight.status["upload"] == "skipped"
+    assert preflight.status["gpus"] == "ok"
+    assert preflight.results["upload"] == 0.0                          # The default of an abandoned probe
+    assert preflight.results["gpus"] == { "0": "NVIDIA RTX A2000" }    # Informational probes are still waited for
+
+
+def test_failed_before_wait():
+    preflight = Preflight([Probe("rtt", lambda publish: 250.0, timeout=10, metric="rtt")], { "rtt": lambda value: value <= 100 }).start()
+    deadline = time.perf_counter() + 5
+    while not preflight.failed() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert preflight.failed() # Set by the probe thread, without waiting for the probes
+    assert preflight.wait() is False
+    assert preflight.metrics == { "rtt": 250.0 }
+
+
+def test_timeout_falls_back_to_default():
+    release = threading.Event()
+    preflight = Preflight([Probe("cuda_version", lambda publish: release.wait(10) and 12.4, timeout=0.2, default=0),
+                           Probe("gpus", lambda publish: { "0": "NVIDIA RTX A2000" }, timeout=10, default={})]).start()
+    start_time = time.perf_counter()
+    try:
+        assert preflight.wait() is True
+    finally:
+        release.set()
+    assert time.perf_counter() - start_time < 5
+    assert preflight.status["cuda_version"] == "timeout"
+    assert preflight.results["cuda_version"] == 0
+    assert preflight.status["gpus"] == "ok"
+
+
+def test_exception_sets_error_status():
+    def ping(publish):
+        raise OSError("Network is unreachable")
+
+    preflight = Preflight([Probe("ping", ping, timeout=10, default=("none", 999.0), gate=True, metric="rtt")],
+                          { "rtt": lambda value: value[1] <= 100 }).start()
+    assert preflight.wait() is True # A failed probe counts as its default, without checking it
+    assert preflight.status["ping"] == "error"
+    assert preflight.results["ping"] == ("none", 999.0)
+    assert "ping" in preflight.durations
+    assert not preflight.failed()
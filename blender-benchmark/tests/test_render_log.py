@@ -0,0 +1,42 @@
+import os
+import glob
+import pytest
+from render_log import parse_log
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+# Expected phase breakdown of each fixture log, from Blender's 'Time:' stamps
+EXPECTED = {
+    "cycles_4.5_monster.log": { "load_s": 0.43, "sync_s": 1.95, "bvh_s": 0.17, "kernel_s": 2.57, "sampling_s": 30.79, "denoise_s": 0.11,
+                                "save_s": 0.14, "time_to_first_sample_s": 5.12, "samples_rendered": 256, "samples_total": 256,
+                                "samples_per_minute": 497.4, "time_to_saved_s": 36.02 },
+}
+
+
+def test_every_fixture_has_expectations():
+    assert sorted(os.path.basename(path) for path in glob.glob(os.path.join(FIXTURES_DIR, "*.log"))) == sorted(EXPECTED)
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_fixture_phases(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        summary = parse_log(f).summary()
+    assert summary.keys() == EXPECTED[name].keys()
+    for key, value in EXPECTED[name].items():
+        assert summary[key] == pytest.approx(value, abs=0.05), key
+
+
+# A frame range rendered in one process, with arrival times: the first 'Saved:' line is the first-frame latency, the following ones the steady state
+def test_frame_range():
+    lines = [(0.0, 'Read blend: "/scenes/monster/main.blend"')]
+    for frame, start in ((1, 1.0), (2, 9.0), (3, 13.0)):
+        lines += [(start, f"Fra:{frame} Mem:512.02M (Peak 530.76M) | Time:00:00.10 | Mem:85.13M, Peak:85.13M | Scene, ViewLayer | Synchronizing object | Cube"),
+                  (start + 1.0, f"Fra:{frame} Mem:640.55M (Peak 640.55M) | Mem:954.84M, Peak:954.84M | Scene, ViewLayer | Sample 1/64"),
+                  (start + 3.0, f"Fra:{frame} Mem:640.55M (Peak 640.55M) | Mem:954.84M, Peak:954.84M | Scene, ViewLayer | Sample 64/64"),
+                  (start + 3.5, f"Saved: 'output/monster_sequence/frame_{frame:05d}.png'")]
+    frames = parse_log(lines).frame_summary()
+    assert frames["frames"] == 3
+    assert frames["first_frame_latency_s"] == 4.5
+    assert frames["frame_completion_s"] == [4.5, 12.5, 16.5]
+    assert frames["steady_time_s_per_frame"] == pytest.approx(6.0)
@@ -0,0 +1,110 @@
+import gzip
+import json
+import socket
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from reporting import Reporter
+
+
+# A local Job Reporting System: answers with the queued status codes (then 200), and records every request it received
+class ReportServer(ThreadingHTTPServer):
+
+    def __init__(self, port=0, statuses=()):
+        super().__init__(("127.0.0.1", port), ReportHandler)
+        self.statuses = list(statuses)
+        self.requests = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def bodies(self):
+        return [json.loads(gzip.decompress(body) if headers.get("Content-Encoding") == "gzip" else body) for _, headers, body in self.requests]
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((self.path, dict(self.headers), body))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ReportServer()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def reporter(tmp_path, **kwargs):
+    return Reporter({ "Salad-Api-Key": "secret" }, spool_file=str(tmp_path / "report_spool.jsonl"), timeout=2, retries=3, backoff=0.01, **kwargs)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_503_is_retried_then_delivered(tmp_path, server):
+    server.statuses = [503, 503]
+    assert reporter(tmp_path).post(f"{server.url}/bench-1", { "score": 812.4 }) is True
+    assert len(server.requests) == 3
+    assert server.bodies() == [{ "score": 812.4 }] * 3
+    assert server.requests[-1][1]["Salad-Api-Key"] == "secret"
+    assert reporter(tmp_path).pending() == []
+
+
+def test_rejected_report_is_dropped(tmp_path, server):
+    server.statuses = [400]
+    assert reporter(tmp_path).post(f"{server.url}/bench-1", { "score": 812.4 }) is True # Not retried, not kept
+    assert len(server.requests) == 1
+    assert reporter(tmp_path).pending() == []
+
+
+def test_dead_endpoint_spools_then_flushes(tmp_path):
+    port = free_port() # Nothing listening yet: connection refused
+    first = reporter(tmp_path)
+    assert first.post(f"http://127.0.0.1:{port}/bench-1", { "score": 812.4 }) is False
+    assert first.post(f"http://127.0.0.1:{port}/bench-1-sl", { "error": "timeout" }) is False
+    with open(tmp_path / "report_spool.jsonl") as f:
+        spooled = [json.loads(line) for line in f]
+    assert [(entry["url"], entry["payload"]) for entry in spooled] == [(f"http://127.0.0.1:{port}/bench-1", { "score": 812.4 }),
+                                                                       (f"http://127.0.0.1:{port}/bench-1-sl", { "error": "timeout" })]
+
+    server = ReportServer(port) # The endpoint is back; a later process flushes the spool left behind
+    try:
+        assert reporter(tmp_path).flush() is True
+        assert [path for path, _, _ in server.requests] == ["/bench-1", "/bench-1-sl"]
+        assert server.bodies() == [{ "score": 812.4 }, { "error": "timeout" }]
+        assert reporter(tmp_path).pending() == []
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_gzip_body(tmp_path, server):
+    assert reporter(tmp_path, compress=True).post(f"{server.url}/bench-1", { "score": 812.4, "gpu_type": "NVIDIA RTX A2000" }) is True
+    _, headers, body = server.requests[0]
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Content-Type"] == "application/json"
+    assert body[:2] == b"\x1f\x8b"
+    assert json.loads(gzip.decompress(body)) == { "score": 812.4, "gpu_type": "NVIDIA RTX A2000" }
+
+
+def test_batch(tmp_path, server):
+    batched = reporter(tmp_path, batch=10)
+    for index in range(3):
+        batched._append(f"{server.url}/bench-1", { "run": index })
+    assert batched.flush() is True
+    assert server.bodies() == [[{ "run": 0 }, { "run": 1 }, { "run": 2 }]]
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import pytest
+import telemetry
+from telemetry import TelemetrySampler, render_sampler
+
+
+# A fake 'nvidia-smi' on PATH: prints the samples of SAMPLES for the GPUs selected by '--id' (all without it) in the format of
+# '--query-gpu=... --format=csv,noheader,nounits', records its arguments, and keeps running like '--loop-ms' until terminated.
+# Fields: timestamp, uuid, utilization, memory.used, temperature, power.draw, power.limit, clocks.sm, clocks_throttle_reasons.active
+FAKE_NVIDIA_SMI = """
+import sys, time
+SAMPLES = {
+    "GPU-aaaa": [("2026/10/18 12:00:00.000", 10, 1200, 70, 60.5, 70.0, 1800, "0x0000000000000000"),
+                 ("2026/10/18 12:00:01.000", 98, 5200, 80, 69.8, 70.0, 1500, "0x0000000000000004"),  # SW power cap
+                 ("2026/10/18 12:00:02.000", 99, 5300, 85, 69.9, 70.0, 1450, "0x0000000000000004"),
+                 ("2026/10/18 12:00:03.000", 97, 5300, 86, 65.0, 70.0, 1700, "0x0000000000000000"),
+                 ("2026/10/18 12:00:04.000", 99, 5400, 84, 66.0, 70.0, 1300, "0x0000000000000040"),  # HW thermal slowdown
+                 ("2026/10/18 12:00:05.000", 5, 1300, 60, 20.0, 70.0, 210, "0x0000000000000001")],   # Idle, not counted
+    "GPU-bbbb": [("2026/10/18 12:00:00.000", 50, 800, 50, "[N/A]", 70.0, 1800, "0x0000000000000000"),
+                 ("2026/10/18 12:00:01.000", 60, 900, 52, 40.0, 70.0, 1800, "0x0000000000000000")],
+}
+with open(sys.argv[0] + ".args", "w") as f:
+    f.write(" ".join(sys.argv[1:]))
+ids = next((arg.split("=", 1)[1].split(",") for arg in sys.argv[1:] if arg.startswith("--id=")), list(SAMPLES))
+for uuid in ids:
+    for sample in SAMPLES[uuid]:
+        print(", ".join(str(value) for value in (sample[0], uuid) + sample[1:]), flush=True)
+time.sleep(60)
+"""
+
+
+@pytest.fixture
+def fake_nvidia_smi(tmp_path, monkeypatch):
+    path = tmp_path / "nvidia-smi"
+    path.write_text(f"#!{sys.executable}\n" + FAKE_NVIDIA_SMI)
+    path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(telemetry, "TEMPERATURE_LIMIT", 83)
+    monkeypatch.setattr(telemetry, "USE_TELEMETRY", True)
+    return path
+
+
+def sample(sampler, samples):
+    with sampler:
+        deadline = time.time() + 10
+        while sum(len(gpu.time) for gpu in sampler.gpus.values()) < samples and time.time() < deadline:
+            time.sleep(0.01)
+    return sampler.summary()
+
+
+def test_throttling_and_temperature(fake_nvidia_smi):
+    summary = sample(TelemetrySampler(cpu=False, gpu_ids=["GPU-aaaa"]), 6)
+    assert summary["gpu_samples"] == 6
+    assert summary["throttle_events"] == 2                  # Samples 1-2 (power cap) and 4 (thermal); the idle reason doesn't count
+    assert summary["throttle_time_s"] == 3.0                # Each sample stands for the 1s until the next one
+    assert summary["thermal_throttling"] is True
+    assert summary["time_above_temperature_limit_s"] == 3.0 # 85, 86 and 84 °C
+    assert summary["temperature_peak_c"] == 86
+    assert summary["vram_peak_mb"] == 5400
+    assert summary["vram_baseline_mb"] == 1200
+    assert summary["sm_clock_min_mhz"] == 210
+
+
+def test_all_gpus(fake_nvidia_smi):
+    sampler = TelemetrySampler(cpu=False)
+    summary = sample(sampler, 8)
+    assert set(sampler.gpus) == { "GPU-aaaa", "GPU-bbbb" }
+    assert "--id=" not in (fake_nvidia_smi.parent / "nvidia-smi.args").read_text()
+    assert summary["gpu_samples"] == 8
+    assert summary["throttle_events"] == 2
+    assert summary["power_peak_w"] == pytest.approx(69.9)
+    assert sampler.series()["GPU-bbbb"]["utilization"] == [50, 60]
+
+
+def test_cuda_visible_devices(fake_nvidia_smi):
+    sampler = render_sampler("CUDA", env={ "CUDA_VISIBLE_DEVICES": "GPU-bbbb" })
+    summary = sample(sampler, 2)
+    assert (fake_nvidia_smi.parent / "nvidia-smi.args").read_text().endswith("--id=GPU-bbbb")
+    assert set(sampler.gpus) == { "GPU-bbbb" }
+    assert summary["gpu_samples"] == 2
+    assert summary["throttle_events"] == 0
+    assert summary["time_above_temperature_limit_s"] == 0.0
+    assert summary["power_peak_w"] == 40.0                  # [N/A] is ignored
+
+    assert render_sampler("CPU", env={ "CUDA_VISIBLE_DEVICES": "GPU-bbbb" }).gpu is False
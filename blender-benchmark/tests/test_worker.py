@@ -0,0 +1,113 @@
+import os
+import sys
+import pytest
+import worker
+from worker import BlenderWorker, WorkerError, get_worker, close_workers
+
+
+# A stand-in for 'blender -b --python worker_script.py': speaks the same JSON-lines protocol on stdin/stdout, and prints
+# Blender-like log lines while rendering. A .blend path containing "missing" fails the load, "crash" kills the worker.
+STUB_WORKER = """
+import sys, json
+
+def reply(message):
+    sys.stdout.write("@@WORKER " + json.dumps(message) + "\\n")
+    sys.stdout.flush()
+
+reply({"ok": True, "event": "ready", "blender_version": "4.5.0"})
+for line in sys.stdin:
+    request = json.loads(line)
+    cmd = request["cmd"]
+    if cmd == "quit":
+        reply({"ok": True, "cmd": cmd})
+        break
+    if cmd == "load" and "crash" in request["blend_file"]:
+        sys.exit(3)
+    if cmd == "load" and "missing" in request["blend_file"]:
+        reply({"ok": False, "cmd": cmd, "error": "RuntimeError: Cannot read file"})
+    elif cmd == "load":
+        reply({"ok": True, "cmd": cmd, "load_time_s": 0.25})
+    elif cmd == "render":
+        print("Fra:1 Mem:12.00M | Time:00:00.10 | Sample 1/4", flush=True)
+        print("Saved: '" + request["output"].replace("#####", "%05d" % request["frame"]) + "'", flush=True)
+        reply({"ok": True, "cmd": cmd, "render_time_s": 1.5, "overrides": request.get("overrides", {})})
+    elif cmd == "query":
+        reply({"ok": True, "cmd": cmd, "resolution_x": 1920, "resolution_y": 1080, "percentage": 100, "samples": 128, "time_limit": 0})
+    else:
+        reply({"ok": False, "cmd": cmd, "error": "ValueError: Unknown command: " + cmd})
+"""
+
+
+@pytest.fixture
+def stub_blender(tmp_path, monkeypatch):
+    path = tmp_path / "blender"
+    path.write_text(f"#!{sys.executable}\n" + STUB_WORKER)
+    path.chmod(0o755)
+    monkeypatch.setattr(worker, "BLENDER_BIN", str(path))
+    monkeypatch.setattr(worker, "USE_WORKER", True)
+    monkeypatch.setattr(worker, "_failed", set())
+    yield str(path)
+    close_workers()
+
+
+def test_load_render_query(stub_blender, tmp_path):
+    blender = BlenderWorker("CUDA").start()
+    try:
+        assert blender.blender_version == "4.5.0"
+        assert blender.load("/scenes/monster/main.blend")["load_time_s"] == 0.25
+        assert blender.load("/scenes/monster/main.blend")["load_time_s"] == 0.0 # Already loaded, no request
+        assert blender.load("/scenes/monster/main.blend", reload=True)["load_time_s"] == 0.25
+
+        lines = []
+        reply = blender.render(str(tmp_path / "frame_#####"), frame=1, on_line=lines.append, overrides={ "samples": 1 })
+        assert reply["render_time_s"] == 1.5
+        assert reply["overrides"] == { "samples": 1 }
+        assert lines == ["Fra:1 Mem:12.00M | Time:00:00.10 | Sample 1/4", f"Saved: '{tmp_path / 'frame_00001'}'"]
+
+        assert blender.query()["samples"] == 128
+    finally:
+        blender.close()
+    assert not blender.alive()
+
+
+def test_error_reply(stub_blender):
+    blender = BlenderWorker("CUDA").start()
+    try:
+        with pytest.raises(WorkerError, match="failed on 'load': RuntimeError: Cannot read file"):
+            blender.load("/scenes/missing/main.blend")
+        assert blender.loaded_file is None
+        with pytest.raises(WorkerError, match="Unknown command: bake"):
+            blender.request("bake")
+        assert blender.alive() # An error reply doesn't stop the worker
+        assert blender.load("/scenes/monster/main.blend")["load_time_s"] == 0.25
+    finally:
+        blender.close()
+
+
+def test_crash_and_restart(stub_blender):
+    first = get_worker("CUDA")
+    assert get_worker("CUDA") is first
+    with pytest.raises(WorkerError, match="exited with code 3"):
+        first.load("/scenes/crash/main.blend")
+    assert not first.alive()
+    with pytest.raises(WorkerError, match="not running"):
+        first.query()
+
+    second = get_worker("CUDA") # A dead worker is replaced
+    assert second is not first and second.alive()
+    assert second.load("/scenes/monster/main.blend")["load_time_s"] == 0.25
+
+
+def test_per_gpu_workers_and_close(stub_blender):
+    gpu0 = get_worker("CUDA", env=os.environ | { "CUDA_VISIBLE_DEVICES": "GPU-0" })
+    gpu1 = get_worker("CUDA", env=os.environ | { "CUDA_VISIBLE_DEVICES": "GPU-1" })
+    assert gpu0 is not gpu1
+    worker.close_worker("CUDA", env={ "CUDA_VISIBLE_DEVICES": "GPU-0" })
+    assert not gpu0.alive() and gpu1.alive()
+    assert get_worker("CUDA", env=os.environ | { "CUDA_VISIBLE_DEVICES": "GPU-1" }) is gpu1
+
+
+def test_unavailable_worker_falls_back(stub_blender, monkeypatch):
+    monkeypatch.setattr(worker, "BLENDER_BIN", "/nonexistent/blender")
+    assert get_worker("OPTIX") is None
+    assert get_worker("OPTIX") is None # Not retried
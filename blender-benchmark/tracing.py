@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+TRACE = os.getenv("TRACE", "1") == "1"                             # Record spans of the benchmark phases, probes, renders and reports
+TRACE_FILE = os.getenv("TRACE_FILE", "benchmark_trace.json")       # Chrome trace-event JSON (chrome://tracing, ui.perfetto.dev), written at the end
+
+CHILD_KEYS = ("child_user_s", "child_sys_s", "child_max_rss_mb")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+# Lightweight tracing of the benchmark run, to see which phase is to blame when a node takes much longer than usual.
+#
+# A span records its start and end (perf_counter, relative to the start of the tracer), the CPU time of its thread (thread_time),
+# and free-form attributes (scene, device, URL, ...).
+# The resource usage of a child process (Blender, benchmark-launcher-cli) is measured per child, by the span that runs it, so that
+# overlapping spans (concurrent GPUs, pipeline tasks) never count the same child twice:
+#   one-shot processes    wait_child(): user and system time and peak RSS from os.wait4() (including the children it waited for)
+#   the Blender worker    track_process(): user and system time from /proc/<pid>/stat, and the peak RSS of the span from /proc/<pid>/status
+#                         (VmHWM, reset at the start of the span through /proc/<pid>/clear_refs)
+#   with span("render", scene="monster", device="CUDA") as attributes:
+#       process = subprocess.Popen(...)
+#       returncode = wait_child(process, attributes)
+# The flat benchmark script marks its top-level phases with phase(): each one lasts until the next one starts.
+# export() writes the spans as Chrome trace events; summary() adds up the spans by name for g_Result, with the measured tracing overhead.
+
+
+class Tracer:
+
+    def __init__(self, enabled=TRACE):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._phase = None
+
+    @contextmanager
+    def span(self, name, **attributes):
+        if not self.enabled:
+            yield attributes
+            return
+        cpu_start = time.thread_time()
+        start_time = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._record(name, start_time, cpu_start, attributes)
+
+    def _record(self, name, start_time, cpu_start, attributes):
+        end_time = time.perf_counter()
+        cpu = time.thread_time() - cpu_start
+        record = { "name": name, "start": start_time - self.origin, "end": end_time - self.origin, "cpu_s": cpu,
+                   "thread": threading.get_ident(), "attributes": attributes }
+        for key in CHILD_KEYS: # Measured by wait_child() or track_process()
+            if key in attributes:
+                record[key] = attributes.pop(key)
+        with self._lock:
+            self.spans.append(record)
+
+    # Start a top-level phase of the benchmark script, ending the previous one; None only ends it
+    def phase(self, name, **attributes):
+        if not self.enabled:
+            return
+        if self._phase is not None:
+            self._phase.__exit__(None, None, None)
+            self._phase = None
+        if name is not None:
+            self._phase = self.span(name, phase=True, **attributes)
+            self._phase.__enter__()
+
+    # Chrome trace-event format: complete events ("ph": "X") in microseconds, one track per thread
+    def trace_events(self):
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        events = []
+        for record in spans:
+            args = dict(record["attributes"]) | { key: value for key, value in record.items()
+                                                   if key not in ("name", "start", "end", "thread", "attributes") }
+            events.append({ "name": record["name"], "cat": "phase" if record["attributes"].get("phase") else "span", "ph": "X",
+                            "ts": round(record["start"] * 1e6, 1), "dur": round((record["end"] - record["start"]) * 1e6, 1),
+                            "pid": pid, "tid": record["thread"], "args": args })
+        return { "traceEvents": events, "displayTimeUnit": "ms" }
+
+    def export(self, path=TRACE_FILE):
+        if not self.enabled:
+            return
+        with open(path, "w") as f:
+            json.dump(self.trace_events(), f, default=str)
+
+    # Cost of one span: the mean of 'count' empty spans on a scratch tracer, seconds
+    def overhead(self, count=1000):
+        scratch = Tracer(enabled=True)
+        start_time = time.perf_counter()
+        for _ in range(count):
+            with scratch.span("overhead"):
+                pass
+        return (time.perf_counter() - start_time) / count
+
+    # Spans added up by name: count, wall-clock and CPU time, child usage; and the tracing overhead of the run
+    def summary(self):
+        if not self.enabled:
+            return { "enabled": False }
+        with self._lock:
+            spans = list(self.spans)
+        by_name = {}
+        for record in spans:
+            entry = by_name.setdefault(record["name"], { "count": 0, "wall_s": 0.0, "cpu_s": 0.0 })
+            entry["count"] += 1
+            entry["wall_s"] += record["end"] - record["start"]
+            entry["cpu_s"] += record["cpu_s"]
+            for key in ("child_user_s", "child_sys_s"):
+                if key in record:
+                    entry[key] = entry.get(key, 0.0) + record[key]
+            if "child_max_rss_mb" in record:
+                entry["child_max_rss_mb"] = max(entry.get("child_max_rss_mb", 0.0), record["child_max_rss_mb"])
+        per_span = self.overhead()
+        elapsed = time.perf_counter() - self.origin
+        return { "enabled": True, "spans": len(spans),
+                 "by_name": { name: { key: round(value, 3) if isinstance(value, float) else value for key, value in entry.items() }
+                              for name, entry in by_name.items() },
+                 "overhead_us_per_span": round(per_span * 1e6, 2), "overhead_s": round(per_span * len(spans), 6),
+                 "overhead_fraction": per_span * len(spans) / elapsed if elapsed > 0 else 0.0 }
+
+
+tracer = Tracer() # The tracer of the process
+
+
+def span(name, **attributes):
+    return tracer.span(name, **attributes)
+
+
+# Wait for a child process started with subprocess.Popen and return its exit code. Its resource usage goes to 'attributes' (those of
+# the span it runs in): os.wait4() reaps the child, so the usage is that of this child alone, including the children it waited for.
+def wait_child(process, attributes=None):
+    if process.returncode is None:
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if attributes is not None:
+            attributes |= { "child_user_s": usage.ru_utime, "child_sys_s": usage.ru_stime, "child_max_rss_mb": usage.ru_maxrss / 1024 } # KB on Linux
+    return process.returncode
+
+
+# CPU time (user, system, seconds) and peak RSS (MB) of a live process, from /proc
+def process_usage(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rpartition(")")[2].split() # The command name may contain spaces
+    max_rss = None
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                max_rss = int(line.split()[1]) / 1024
+    return int(fields[11]) / CLOCK_TICKS, int(fields[12]) / CLOCK_TICKS, max_rss
+
+
+# Resource usage of a long-lived child process (the Blender worker) during a span, into 'attributes'
+@contextmanager
+def track_process(pid, attributes):
+    if not tracer.enabled or pid is None:
+        yield
+        return
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f: # Reset the peak RSS, so that VmHWM is the peak of this span
+            f.write("5")
+        peak_reset = True
+    except OSError:
+        peak_reset = False
+    try:
+        before = process_usage(pid)
+    except OSError:
+        before = None
+    try:
+        yield
+    finally:
+        try:
+            after = process_usage(pid) if before is not None else None
+        except OSError: # The process exited during the span
+            after = None
+        if after is not None:
+            attributes |= { "child_user_s": after[0] - before[0], "child_sys_s": after[1] - before[1] }
+            if peak_reset and after[2] is not None:
+                attributes["child_max_rss_mb"] = after[2]
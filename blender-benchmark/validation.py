@@ -0,0 +1,174 @@
+import os
+import sys
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+from tracing import span
+
+
+VALIDATE = os.getenv("VALIDATE", "1") == "1"                                   # Validate the rendered frames; a failed frame rejects the node
+REFERENCE_DIR = os.getenv("REFERENCE_DIR", "reference")                        # Reference frames, <scene>.png
+MIN_PSNR = float(os.getenv("MIN_PSNR", "30"))                                  # dB, against the reference
+MIN_SSIM = float(os.getenv("MIN_SSIM", "0.85"))                                # against the reference; Gaussian noise of sigma 4/255 scores 0.92-0.95
+MAX_BLACK_EXCESS = float(os.getenv("MAX_BLACK_EXCESS", "0.05"))                # Black pixels, as a fraction of the frame, above those of the reference
+MAX_FIREFLY_EXCESS = float(os.getenv("MAX_FIREFLY_EXCESS", "0.001"))           # Fireflies, as a fraction of the frame, above those of the reference
+VALIDATE_WITHOUT_REFERENCE = os.getenv("VALIDATE_WITHOUT_REFERENCE", "0") == "1" # Accept frames of scenes without a reference frame, checked for NaN and black pixels only
+MAX_BLACK_FRACTION = float(os.getenv("MAX_BLACK_FRACTION", "0.95"))            # Without a reference: black pixels, as a fraction of the frame
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", "1"))                 # Processes validating frames while the next scene renders
+
+BLACK_LEVEL = 1 / 255  # Luminance at or below which a pixel is black
+FIREFLY_LEVEL = 0.5    # Luminance above the mean of the 8 neighbours at which a pixel is a firefly
+SSIM_WINDOW = 8
+
+
+# Validate rendered frames, so that a node with a faulty GPU or driver that quickly renders black, NaN-speckled or corrupted images
+# doesn't get a great score.
+#
+# A frame is decoded to floating point RGB in [0, 1] and compared with the reference frame of its scene (REFERENCE_DIR/<scene>.png),
+# with vectorized NumPy metrics over the whole frame:
+#   psnr_db, ssim     similarity to the reference; the sampling noise of a correct render on another device or driver (about sigma 4/255:
+#                     36 dB, SSIM 0.92-0.95 on the shipped references) stays above MIN_PSNR and MIN_SSIM, a wrong image falls well below
+#   nan_pixels        pixels with a non-finite channel (float images only; 8-bit PNGs can't hold NaN, Cycles writes them black)
+#   black_fraction    pixels at or below BLACK_LEVEL, compared to the reference: dropped tiles or objects show up here
+#   firefly_fraction  isolated pixels much brighter than their neighbours, compared to the reference
+# A scene without a reference frame fails, unless VALIDATE_WITHOUT_REFERENCE is set: then only NaN pixels and an almost entirely black frame fail it.
+# Reference frames missing from REFERENCE_DIR are rendered on the CPU when the image is built ('python3 validation.py references').
+# The frames are validated in worker processes (Validator) while the next scene renders.
+
+
+def load_frame(path):
+    with Image.open(path) as image:
+        frame = np.asarray(image.convert("RGB"))
+    return frame.astype(np.float32) / 255
+
+
+def luminance(frame):
+    return frame @ np.array([0.2126, 0.7152, 0.0722], dtype=np.float32) # Rec. 709
+
+
+def psnr(frame, reference):
+    mse = float(np.mean((frame - reference) ** 2))
+    return float("inf") if mse == 0 else float(10 * np.log10(1 / mse))
+
+
+# Mean over size x size windows of a 2D array ('valid' windows only), from the summed-area table
+def _box_mean(a, size):
+    table = np.pad(a, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    sums = table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+    return sums / (size * size)
+
+
+# Mean structural similarity of the luminance, over SSIM_WINDOW x SSIM_WINDOW windows
+def ssim(frame, reference, window=SSIM_WINDOW):
+    x, y = luminance(frame).astype(np.float64), luminance(reference).astype(np.float64)
+    c1, c2 = 0.01 ** 2, 0.03 ** 2
+    mu_x, mu_y = _box_mean(x, window), _box_mean(y, window)
+    var_x = _box_mean(x * x, window) - mu_x ** 2
+    var_y = _box_mean(y * y, window) - mu_y ** 2
+    cov = _box_mean(x * y, window) - mu_x * mu_y
+    return float(np.mean(((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))))
+
+
+# Fraction of the pixels much brighter than the mean of their 8 neighbours
+def firefly_fraction(frame):
+    lum = luminance(np.nan_to_num(frame))
+    neighbours = (_box_mean(np.pad(lum, 1, mode="edge"), 3) * 9 - lum) / 8
+    return float(np.mean(lum - neighbours > FIREFLY_LEVEL))
+
+
+def frame_metrics(frame):
+    finite = np.isfinite(frame).all(axis=-1)
+    return { "nan_pixels": int(np.count_nonzero(~finite)),
+             "black_fraction": float(np.mean(luminance(np.nan_to_num(frame)) <= BLACK_LEVEL)),
+             "firefly_fraction": firefly_fraction(frame) }
+
+
+# Validate a frame against the reference of its scene; returns the metrics, 'passed' and the failed checks
+def validate_frame(frame_path, reference_path=None):
+    if not os.path.exists(frame_path):
+        return { "frame": frame_path, "passed": False, "failed": ["missing frame"] }
+    frame = load_frame(frame_path)
+    result = { "frame": frame_path } | frame_metrics(frame)
+    failed = []
+    if result["nan_pixels"] > 0:
+        failed.append(f"{result['nan_pixels']} NaN pixels")
+
+    if reference_path is not None and os.path.exists(reference_path):
+        reference = load_frame(reference_path)
+        if reference.shape != frame.shape:
+            failed.append(f"size {frame.shape[1]}x{frame.shape[0]} instead of {reference.shape[1]}x{reference.shape[0]}")
+        else:
+            expected = frame_metrics(reference)
+            result |= { "reference": reference_path, "psnr_db": psnr(np.nan_to_num(frame), reference), "ssim": ssim(np.nan_to_num(frame), reference) }
+            if result["psnr_db"] < MIN_PSNR:
+                failed.append(f"PSNR {result['psnr_db']:.1f} dB < {MIN_PSNR} dB")
+            if result["ssim"] < MIN_SSIM:
+                failed.append(f"SSIM {result['ssim']:.3f} < {MIN_SSIM}")
+            if result["black_fraction"] > expected["black_fraction"] + MAX_BLACK_EXCESS:
+                failed.append(f"black {100 * result['black_fraction']:.1f}% vs. {100 * expected['black_fraction']:.1f}% of the reference")
+            if result["firefly_fraction"] > expected["firefly_fraction"] + MAX_FIREFLY_EXCESS:
+                failed.append(f"fireflies {100 * result['firefly_fraction']:.2f}% vs. {100 * expected['firefly_fraction']:.2f}% of the reference")
+    elif not VALIDATE_WITHOUT_REFERENCE:
+        failed.append(f"no reference frame {reference_path}")
+    elif result["black_fraction"] > MAX_BLACK_FRACTION:
+        failed.append(f"black {100 * result['black_fraction']:.1f}%")
+
+    if result.get("psnr_db") == float("inf"):
+        result["psnr_db"] = None # Identical to the reference; JSON has no infinity
+    return result | { "passed": not failed, "failed": failed }
+
+
+# Validate frames in worker processes, overlapped with the following renders:
+#   validator = Validator()
+#   validator.submit("monster", "output/monster/frame_00001.png")   # right after the render, returns immediately
+#   ... render the next scene ...
+#   validator.results()   # -> {"monster": {"psnr_db": ..., "passed": True, ...}}
+# The workers are forked: benchmark.py is a script, so a spawned process would run it again. Forking a process with running threads
+# is unsafe, so the Validator must be created before any thread or child process is started (reporter, pre-flight probes, Blender worker):
+# the pool forks all its workers right away, with a no-op task.
+class Validator:
+
+    def __init__(self, reference_dir=REFERENCE_DIR, workers=VALIDATION_WORKERS):
+        self.reference_dir = reference_dir
+        self.executor = ProcessPoolExecutor(max_workers=max(workers, 1), mp_context=multiprocessing.get_context("fork"))
+        self.executor.submit(int).result() # Fork the workers now
+        self.futures = {}
+
+    # 'name' is the frame's name in the results, e.g. "monster" or "monster_gpu1"; 'scene' selects the reference frame
+    def submit(self, name, frame_path, scene=None):
+        reference_path = os.path.join(self.reference_dir, f"{scene or name}.png")
+        self.futures[name] = self.executor.submit(validate_frame, frame_path, reference_path)
+
+    def results(self):
+        results = {}
+        for name, future in self.futures.items():
+            try:
+                with span("validation_wait", frame=name): # Only the time the validation was not overlapped with the renders
+                    results[name] = future.result()
+            except Exception as e: # An undecodable frame is a failed frame
+                results[name] = { "passed": False, "failed": [f"{type(e).__name__}: {e}"] }
+            print(f"[{name}] Frame validation " + ("passed" if results[name]["passed"] else f"failed: {', '.join(results[name]['failed'])}"))
+        self.executor.shutdown()
+        return results
+
+
+# Render the missing reference frames, when the image is built: python3 validation.py references
+# The scenes are rendered with their own settings on the CPU; a correct GPU render differs from it by sampling noise only.
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == "references":
+        from worker import BLENDER_BIN
+        from helper import list_main_blend_with_folder
+        os.makedirs(REFERENCE_DIR, exist_ok=True)
+        for scene in list_main_blend_with_folder():
+            reference_path = os.path.join(REFERENCE_DIR, f"{scene['scene']}.png")
+            if os.path.exists(reference_path):
+                continue
+            print(f"Rendering the reference frame of {scene['scene']} on the CPU ...", flush=True)
+            output = os.path.join(REFERENCE_DIR, f"{scene['scene']}_#")
+            subprocess.run([BLENDER_BIN, "-b", scene['main_blend_path'], "-o", output, "-F", "PNG", "-x", "1", "-f", "1", "--", "--cycles-device", "CPU"],
+                           check=True)
+            os.replace(os.path.join(REFERENCE_DIR, f"{scene['scene']}_1.png"), reference_path)
+    else:
+        print("Usage: python3 validation.py references")
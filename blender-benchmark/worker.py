@@ -0,0 +1,171 @@
+import os
+import json
+import queue
+import atexit
+import threading
+import subprocess
+import time
+
+
+BLENDER_BIN = os.getenv("BLENDER_BIN", "blender")         # The Blender binary; a stub script speaking the same protocol can be used instead for testing.
+USE_WORKER = os.getenv("BLENDER_WORKER", "1") == "1"      # Use a persistent Blender worker per device; "0" falls back to one-shot 'blender -b' processes.
+WORKER_STARTUP_TIMEOUT = float(os.getenv("WORKER_STARTUP_TIMEOUT", "120")) # seconds
+WORKER_TIMEOUT = float(os.getenv("WORKER_TIMEOUT", "3600"))                # seconds, per command
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker_script.py")
+REPLY_PREFIX = "@@WORKER " # Must match worker_script.py
+
+
+class WorkerError(Exception):
+    pass
+
+
+# A long-lived Blender process that loads, renders and queries scenes on request.
+# Binary startup and add-on initialization are paid once per device instead of once per render.
+# Lines printed by Blender itself (render progress, warnings) are passed to 'on_line' if given, otherwise discarded.
+class BlenderWorker:
+
+    def __init__(self, cycles_device="CUDA", env=None, blender_bin=None):
+        self.cycles_device = cycles_device
+        self.env = env
+        self.blender_bin = blender_bin or BLENDER_BIN
+        self.process = None
+        self.loaded_file = None
+        self.startup_time_s = None
+        self.blender_version = None
+        self.on_line = None
+        self._replies = queue.Queue()
+        self._lock = threading.Lock()
+
+    def start(self):
+        cmd = [self.blender_bin, "-b", "--python", WORKER_SCRIPT, "--", "--cycles-device", self.cycles_device]
+        print("Starting Blender worker: " + ' '.join(cmd))
+        start_time = time.perf_counter()
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        text=True, bufsize=1, env=self.env)
+        threading.Thread(target=self._read_output, daemon=True).start()
+
+        ready = self._wait_reply(WORKER_STARTUP_TIMEOUT)
+        self.startup_time_s = time.perf_counter() - start_time
+        self.blender_version = ready.get("blender_version")
+        print(f"Blender worker ready in {self.startup_time_s:.2f}s (Blender {self.blender_version})")
+        return self
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    # Send one command and wait for its reply; raises WorkerError on failure, timeout or worker exit.
+    def request(self, cmd, timeout=None, on_line=None, **args):
+        with self._lock:
+            if not self.alive():
+                raise WorkerError("Blender worker is not running")
+            self.on_line = on_line
+            try:
+                self.process.stdin.write(json.dumps({"cmd": cmd} | args) + "\n")
+                self.process.stdin.flush()
+                reply = self._wait_reply(WORKER_TIMEOUT if timeout is None else timeout)
+            except (BrokenPipeError, OSError) as e:
+                raise WorkerError(f"Blender worker pipe closed: {e}")
+            finally:
+                self.on_line = None
+        if not reply.get("ok"):
+            raise WorkerError(f"Blender worker failed on '{cmd}': {reply.get('error')}")
+        return reply
+
+    # Returns {"load_time_s": ...}; 'load_time_s' is 0 if the file is already loaded and 'reload' is False.
+    def load(self, blend_file, reload=False, **kwargs):
+        if not reload and self.loaded_file == blend_file:
+            return {"ok": True, "cmd": "load", "load_time_s": 0.0}
+        self.loaded_file = None
+        reply = self.request("load", blend_file=blend_file, **kwargs)
+        self.loaded_file = blend_file
+        return reply
+
+    # Returns {"render_time_s": ...}
+    def render(self, output, frame=1, file_format="PNG", **kwargs):
+        return self.request("render", output=os.path.abspath(output), frame=frame, file_format=file_format, **kwargs)
+
+    # Returns {"resolution_x", "resolution_y", "percentage", "samples", "time_limit"} of the loaded scene
+    def query(self, **kwargs):
+        return self.request("query", **kwargs)
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            if self.alive():
+                self.request("quit", timeout=10)
+                self.process.wait(timeout=10)
+        except (WorkerError, subprocess.TimeoutExpired):
+            self.process.kill()
+        self.process = None
+
+    def _read_output(self):
+        for line in self.process.stdout:
+            if line.startswith(REPLY_PREFIX):
+                try:
+                    self._replies.put(json.loads(line[len(REPLY_PREFIX):]))
+                except ValueError:
+                    self._replies.put({"ok": False, "error": f"Malformed reply: {line.strip()}"})
+            elif self.on_line is not None:
+                self.on_line(line.rstrip("\n"))
+        self._replies.put(None) # EOF: the worker exited
+
+    def _wait_reply(self, timeout):
+        try:
+            reply = self._replies.get(timeout=timeout)
+        except queue.Empty:
+            self.process.kill()
+            raise WorkerError(f"No reply from Blender worker within {timeout}s")
+        if reply is None:
+            raise WorkerError(f"Blender worker exited with code {self.process.wait()}")
+        return reply
+
+
+# One worker per device, reused across scenes and runs. Each keeps a scene loaded and its CUDA contexts: close the workers of a phase
+# (close_worker(), close_workers()) once it is done, so that idle workers don't hold RAM and VRAM during the following phases.
+_workers = {}
+_failed = set() # Devices whose worker could not be started; not retried
+
+
+# Get the running worker for a device, starting it if needed.
+# Workers started with a different CUDA_VISIBLE_DEVICES in 'env' (one per GPU) are distinct workers.
+# Returns None if workers are disabled or the worker can't be started, so that callers fall back to one-shot Blender processes.
+def get_worker(cycles_device="CUDA", env=None, key=None):
+    if not USE_WORKER:
+        return None
+    if key is None:
+        key = worker_key(cycles_device, env)
+    if key in _failed:
+        return None
+    worker = _workers.get(key)
+    if worker is not None and worker.alive():
+        return worker
+    try:
+        worker = BlenderWorker(cycles_device, env=env).start()
+    except (WorkerError, OSError) as e:
+        print(f"Blender worker unavailable ({e}), using one-shot Blender processes")
+        _failed.add(key)
+        return None
+    _workers[key] = worker
+    return worker
+
+
+def worker_key(cycles_device, env=None):
+    return cycles_device if env is None else f"{cycles_device}:{env.get('CUDA_VISIBLE_DEVICES', '')}"
+
+
+# Close the worker of a device, if running; the next get_worker() starts a new one
+def close_worker(cycles_device="CUDA", env=None, key=None):
+    worker = _workers.pop(worker_key(cycles_device, env) if key is None else key, None)
+    if worker is not None:
+        worker.close()
+
+
+def close_workers():
+    for worker in _workers.values():
+        worker.close()
+    _workers.clear()
+
+
+atexit.register(close_workers)
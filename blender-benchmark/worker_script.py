@@ -0,0 +1,107 @@
+import sys
+import json
+import time
+import bpy
+
+
+# This script runs inside Blender and turns it into a long-lived render worker:
+#   blender -b --python worker_script.py -- --cycles-device CUDA
+# The Blender binary, add-ons and the Cycles device are initialized once, then commands are read from stdin, one JSON object per line.
+# Every reply is a single JSON line on stdout prefixed with REPLY_PREFIX, so that it can be told apart from Blender's own log output.
+#   {"cmd": "load",   "blend_file": "/path/main.blend"}
+#   {"cmd": "render", "output": "/path/frame_#####", "frame": 1, "file_format": "PNG"}
+#   {"cmd": "render", "output": "/path/frame_#####", "overrides": {"resolution_percentage": 1, "samples": 1}}
+#   {"cmd": "query"}
+#   {"cmd": "quit"}
+REPLY_PREFIX = "@@WORKER "
+
+
+def reply(message):
+    sys.stdout.write(REPLY_PREFIX + json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def cmd_load(request):
+    start_time = time.perf_counter()
+    bpy.ops.wm.open_mainfile(filepath=request["blend_file"])
+    return {"load_time_s": time.perf_counter() - start_time}
+
+
+# Scene settings that a render can override; the original values are restored after the render.
+OVERRIDES = {
+    "resolution_percentage": lambda scene: scene.render,
+    "use_persistent_data": lambda scene: scene.render,
+    "threads_mode": lambda scene: scene.render,
+    "threads": lambda scene: scene.render,
+    "samples": lambda scene: scene.cycles,
+    "time_limit": lambda scene: scene.cycles,
+    "use_adaptive_sampling": lambda scene: scene.cycles,
+    "use_denoising": lambda scene: scene.cycles,
+    "use_auto_tile": lambda scene: scene.cycles,
+    "tile_size": lambda scene: scene.cycles
+}
+
+
+def cmd_render(request):
+    scene = bpy.context.scene
+    scene.render.filepath = request["output"]
+    scene.render.image_settings.file_format = request.get("file_format", "PNG")
+    scene.frame_set(int(request.get("frame", 1)))
+
+    saved = {}
+    try:
+        for name, value in request.get("overrides", {}).items():
+            if name not in OVERRIDES:
+                raise ValueError(f"Unknown override: {name}")
+            owner = OVERRIDES[name](scene)
+            saved[name] = getattr(owner, name)
+            setattr(owner, name, value)
+
+        start_time = time.perf_counter()
+        bpy.ops.render.render(write_still=True)
+        return {"render_time_s": time.perf_counter() - start_time}
+    finally:
+        for name, value in saved.items():
+            setattr(OVERRIDES[name](scene), name, value)
+
+
+def cmd_query(request):
+    scene = bpy.context.scene
+    return {
+        "resolution_x": scene.render.resolution_x,
+        "resolution_y": scene.render.resolution_y,
+        "percentage": scene.render.resolution_percentage,
+        "samples": scene.cycles.samples,
+        "time_limit": int(scene.cycles.time_limit)
+    }
+
+
+COMMANDS = {
+    "load": cmd_load,
+    "render": cmd_render,
+    "query": cmd_query
+}
+
+
+def main():
+    reply({"ok": True, "event": "ready", "blender_version": bpy.app.version_string})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request = None
+        try:
+            request = json.loads(line)
+            cmd = request.get("cmd")
+            if cmd == "quit":
+                reply({"ok": True, "cmd": cmd})
+                break
+            if cmd not in COMMANDS:
+                raise ValueError(f"Unknown command: {cmd}")
+            reply({"ok": True, "cmd": cmd} | COMMANDS[cmd](request))
+        except Exception as e:
+            reply({"ok": False, "cmd": request.get("cmd") if isinstance(request, dict) else None, "error": f"{type(e).__name__}: {e}"})
+
+
+main()